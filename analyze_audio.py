@@ -0,0 +1,557 @@
+# =============================================================================
+# PURPOSE
+#   Encoding audit of public/data/audio/ (the bulk of the deploy and of what
+#   the app downloads). check_audio.py answers "does every file exist"; this
+#   answers "what is in them": bitrate, sample rate, channel mode, duration
+#   and leading / trailing silence of every mp3, per card and per deck, and
+#   how much re-encoding the speech clips would save.
+#
+#   Pure Python, no ffmpeg: each file is memory-mapped and only the 4-byte
+#   MPEG frame headers are walked, plus the Layer III side info (a few bytes
+#   per frame) and the ID3v2 / ID3v1 / Xing / Info / LAME / VBRI tags. The
+#   audio itself is never decoded. A frame whose side info carries no
+#   Huffman data at all (part2_3_length == 0 in every granule / channel) is
+#   digital silence; runs of them at the start / end are the silence padding.
+#   Files are analysed in a process pool.
+#
+# USAGE
+#   py analyze_audio.py                         -> every audio folder
+#   py analyze_audio.py common_meeting dummy    -> only these folders
+#   py analyze_audio.py --json audio_report.json
+#   py analyze_audio.py --target-kbps 32 --top 40
+#   py analyze_audio.py --jobs 8
+#
+# WHAT IT REPORTS (per folder, then the worst files)
+#   [STEREO]   a stereo / joint-stereo clip: speech needs one channel
+#   [BITRATE]  average bitrate above --max-kbps (default 64)
+#   [RATE]     sample rate above --max-rate (default 24000 Hz)
+#   [LONG]     much longer than its text: seconds per character more than
+#              --long-factor (default 2.5) x the median of its folder
+#   [SILENCE]  leading + trailing silence above --max-silence-ms (600)
+#   [DAMAGED]  not an MPEG audio stream, or frames that had to be re-synced
+#   Estimated savings: re-encoding every clip to mono at --target-kbps (only
+#   clips above it) and trimming silence down to --keep-silence-ms per end.
+#
+# EXIT CODE
+#   0 = every file parsed (flags are warnings).  1 = [DAMAGED] files found.
+#
+# JSON REPORT (same layout as public/data/audio/<folder>/, like the
+# audio_manifest.json of check_audio.py)
+#   {"format": "smartdeck-audio-stats/1", "targetKbps": 48, "totals": {...},
+#    "folders": {"<folder>": {"base": "public/data/audio/<folder>/",
+#       "deckFile": "dummy.json", "files": N, "bytes": N, "seconds": S,
+#       "savingsBytes": N, "bitrates": {"64": N}, "sampleRates": {...},
+#       "channels": {"mono": N}, "flags": {"SILENCE": N},
+#       "cards": {"<cardId>": {"<file>.mp3": {"bytes", "seconds", "kbps",
+#           "sampleRate", "channels", "leadMs", "trailMs", "chars",
+#           "savingsBytes", "flags": [...]}}}}}}
+#   Files named after no card are listed under the cardId "" .
+# =============================================================================
+
+import argparse
+import json
+import mmap
+import os
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from check_audio import AUDIO_DIR, AUDIO_NAME_RE, iter_audio_refs, rel_src, scan_audio_tree
+from check_deck_ids import BASE_DIR, load_deck, resolve_targets
+
+REPORT_FORMAT = 'smartdeck-audio-stats/1'
+DEFAULT_TARGET_KBPS = 48
+DEFAULT_MAX_KBPS = 64
+DEFAULT_MAX_RATE = 24000
+DEFAULT_LONG_FACTOR = 2.5
+DEFAULT_MAX_SILENCE_MS = 600
+DEFAULT_KEEP_SILENCE_MS = 100
+# A [LONG] clip must also be at least this long, so short words with a
+# breath of padding are not flagged.
+LONG_MIN_SECONDS = 2.0
+# Frames searched for the first sync word after the tags; junk beyond that
+# means the file is not an mp3.
+SYNC_SEARCH_BYTES = 64 * 1024
+BATCH_SIZE = 64
+
+# --- MPEG audio frame header tables (ISO 11172-3 / 13818-3) ---
+
+VERSIONS = {3: '1', 2: '2', 0: '2.5'}      # 1 is reserved
+LAYERS = {3: 1, 2: 2, 1: 3}                # 0 is reserved
+BITRATES = {
+    ('1', 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    ('1', 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    ('1', 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    ('2', 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    ('2', 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    ('2', 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = {'1': (44100, 48000, 32000), '2': (22050, 24000, 16000), '2.5': (11025, 12000, 8000)}
+CHANNEL_MODES = ('stereo', 'joint', 'dual', 'mono')
+# Layer III side info: (bytes for mono, bytes for 2 channels)
+SIDE_INFO = {'1': (17, 32), '2': (9, 17)}
+
+_header_cache = {}
+
+
+def parse_header(h):
+    """Decode a 32-bit frame header into a dict, or None if it isn't one.
+    Results are cached: a file repeats the same few headers thousands of times."""
+    key = h & 0xFFFFFFC0  # channel mode kept; mode extension / flags dropped
+    if key in _header_cache:
+        return _header_cache[key]
+    info = None
+    if (h >> 21) == 0x7FF:
+        version = VERSIONS.get((h >> 19) & 3)
+        layer = LAYERS.get((h >> 17) & 3)
+        bitrate_index = (h >> 12) & 0xF
+        rate_index = (h >> 10) & 3
+        # Free-format (bitrate 0) frames have no computable length: unsupported.
+        if version and layer and 0 < bitrate_index < 15 and rate_index < 3:
+            table = BITRATES[('1' if version == '1' else '2', layer)]
+            kbps = table[bitrate_index]
+            rate = SAMPLE_RATES[version][rate_index]
+            padding = (h >> 9) & 1
+            if layer == 1:
+                length, samples = (12 * kbps * 1000 // rate + padding) * 4, 384
+            elif layer == 2 or version == '1':
+                length, samples = 144 * kbps * 1000 // rate + padding, 1152
+            else:
+                length, samples = 72 * kbps * 1000 // rate + padding, 576
+            mode = CHANNEL_MODES[(h >> 6) & 3]
+            info = {'version': version, 'layer': layer, 'kbps': kbps, 'rate': rate,
+                    'length': length, 'samples': samples, 'mode': mode,
+                    'channels': 1 if mode == 'mono' else 2, 'crc': not (h >> 16) & 1}
+    _header_cache[key] = info
+    return info
+
+
+def id3v2_size(mm):
+    """Bytes taken by a leading ID3v2 tag (0 if there is none)."""
+    if mm[:3] != b'ID3' or len(mm) < 10:
+        return 0
+    size = 0
+    for byte in mm[6:10]:  # syncsafe integer: 7 bits per byte
+        size = (size << 7) | (byte & 0x7F)
+    return 10 + size + (10 if mm[5] & 0x10 else 0)
+
+
+def tail_tags_size(mm):
+    """Bytes taken by trailing ID3v1 / APEv2 tags."""
+    end = len(mm)
+    if end >= 128 and mm[end - 128:end - 125] == b'TAG':
+        end -= 128
+    if end >= 32 and mm[end - 32:end - 24] == b'APETAGEX':
+        size = int.from_bytes(mm[end - 20:end - 16], 'little')
+        flags = int.from_bytes(mm[end - 12:end - 8], 'little')
+        end -= size + (32 if flags & 0x80000000 else 0)
+    return len(mm) - max(end, 0)
+
+
+def side_info_offset(info):
+    return 4 + (2 if info['crc'] else 0)
+
+
+def read_vbr_tag(mm, pos, info):
+    """Xing / Info (+ LAME) or VBRI tag in the first frame, as a dict or None.
+    Such a frame holds no audio."""
+    if info['layer'] == 3:
+        side = SIDE_INFO['1' if info['version'] == '1' else '2'][info['channels'] - 1]
+        at = pos + side_info_offset(info) + side
+        tag = mm[at:at + 4]
+        if tag in (b'Xing', b'Info'):
+            flags = int.from_bytes(mm[at + 4:at + 8], 'big')
+            cursor, found = at + 8, {'kind': tag.decode(), 'frames': None, 'bytes': None}
+            if flags & 1:
+                found['frames'] = int.from_bytes(mm[cursor:cursor + 4], 'big')
+                cursor += 4
+            if flags & 2:
+                found['bytes'] = int.from_bytes(mm[cursor:cursor + 4], 'big')
+                cursor += 4
+            cursor += (100 if flags & 4 else 0) + (4 if flags & 8 else 0)
+            if mm[cursor:cursor + 4] in (b'LAME', b'Lavf', b'Lavc', b'L3.9'):
+                # 12 bits encoder delay + 12 bits end padding, in samples
+                gap = int.from_bytes(mm[cursor + 21:cursor + 24], 'big')
+                found['encoder'] = mm[cursor:cursor + 9].decode('latin-1').strip('\x00 ')
+                found['delay'], found['padding'] = gap >> 12, gap & 0xFFF
+            return found
+    at = pos + 36
+    if mm[at:at + 4] == b'VBRI':
+        return {'kind': 'VBRI', 'bytes': int.from_bytes(mm[at + 10:at + 14], 'big'),
+                'frames': int.from_bytes(mm[at + 14:at + 18], 'big')}
+    return None
+
+
+def is_silent_frame(mm, pos, info):
+    """True when no granule / channel of a Layer III frame carries any data
+    (part2_3_length == 0): the frame decodes to digital silence."""
+    mono = info['channels'] == 1
+    start = pos + side_info_offset(info)
+    if info['version'] == '1':
+        size = SIDE_INFO['1'][0 if mono else 1]
+        head, granules, granule_bits = 9 + (5 if mono else 3) + 4 * info['channels'], 2, 59
+    else:
+        size = SIDE_INFO['2'][0 if mono else 1]
+        head, granules, granule_bits = 8 + (1 if mono else 2), 1, 63
+    value = int.from_bytes(mm[start:start + size], 'big')
+    total = size * 8
+    for g in range(granules * info['channels']):
+        if (value >> (total - head - g * granule_bits - 12)) & 0xFFF:
+            return False
+    return True
+
+
+def find_sync(mm, pos, end):
+    """Offset of the next valid frame header whose successor also parses."""
+    limit = min(end, pos + SYNC_SEARCH_BYTES)
+    while True:
+        pos = mm.find(b'\xff', pos, limit)
+        if pos < 0 or pos + 4 > end:
+            return -1
+        info = parse_header(int.from_bytes(mm[pos:pos + 4], 'big'))
+        if info:
+            nxt = pos + info['length']
+            if nxt + 4 > end or parse_header(int.from_bytes(mm[nxt:nxt + 4], 'big')):
+                return pos
+        pos += 1
+
+
+def analyze_file(path):
+    """Header-level analysis of one mp3. Returns a plain dict (it crosses
+    the process pool); 'error' is set when the file isn't MPEG audio."""
+    result = {'path': path, 'bytes': 0, 'error': None, 'frames': 0, 'seconds': 0.0,
+              'kbps': 0.0, 'rate': None, 'channels': None, 'mode': None, 'vbr': False,
+              'leadMs': 0, 'trailMs': 0, 'resyncs': 0, 'tag': None}
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            result['bytes'] = size
+            if size == 0:
+                result['error'] = 'empty file'
+                return result
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                _walk(mm, result)
+    except OSError as e:
+        result['error'] = str(e)
+    return result
+
+
+def _walk(mm, result):
+    start, end = id3v2_size(mm), len(mm) - tail_tags_size(mm)
+    pos = find_sync(mm, start, end)
+    if pos < 0:
+        result['error'] = 'no MPEG audio frame found'
+        return
+    first = parse_header(int.from_bytes(mm[pos:pos + 4], 'big'))
+    tag = read_vbr_tag(mm, pos, first)
+    if tag:
+        result['tag'] = tag
+        pos += first['length']
+
+    frames = samples = audio_bytes = 0
+    kbps_seen, rates, modes = set(), Counter(), Counter()
+    layer3 = first['layer'] == 3
+    lead = trail = 0        # silent frames at the start / since the last sound
+    heard = False
+    while pos + 4 <= end:
+        info = parse_header(int.from_bytes(mm[pos:pos + 4], 'big'))
+        if info is None:
+            nxt = find_sync(mm, pos + 1, end)
+            if nxt < 0:
+                break  # trailing junk
+            result['resyncs'] += 1
+            pos = nxt
+            continue
+        frames += 1
+        samples += info['samples']
+        audio_bytes += info['length']
+        kbps_seen.add(info['kbps'])
+        rates[info['rate']] += 1
+        modes[info['mode']] += 1
+        if layer3:
+            if is_silent_frame(mm, pos, info):
+                trail += 1
+                if not heard:
+                    lead += 1
+            else:
+                heard, trail = True, 0
+        pos += info['length']
+
+    if not frames:
+        result['error'] = 'no MPEG audio frame found'
+        return
+    rate = rates.most_common(1)[0][0]
+    mode = modes.most_common(1)[0][0]
+    frame_ms = 1000 * samples / frames / rate
+    if not heard:
+        trail = 0  # all silence: count it once, as leading
+    result.update(frames=frames, rate=rate, mode=mode, channels=1 if mode == 'mono' else 2,
+                  seconds=samples / rate, vbr=len(kbps_seen) > 1,
+                  kbps=audio_bytes * 8 / (samples / rate) / 1000,
+                  leadMs=round(lead * frame_ms), trailMs=round(trail * frame_ms))
+
+
+def analyze_batch(paths):
+    return [analyze_file(path) for path in paths]
+
+
+# --- Decks -> cards -> files ---
+
+# Card-level audio fields -> the field they read out, when there is no
+# sibling "text" (audioChoice / multipleChoice / plsql-style cards).
+SPOKEN_FIELDS = {'audioSrc': 'correctAnswer', 'questionAudioSrc': 'question',
+                 'answerAudioSrc': 'correctAnswer'}
+
+
+def spoken_text(card, json_path, text):
+    """The text a clip reads out: the sibling "text" (sideB, conversation),
+    else the card field its audio key stands for, else (a flippable card with
+    one card-level audioSrc) the first sideB phrase."""
+    if text:
+        return text
+    field = SPOKEN_FIELDS.get(json_path)
+    if field and isinstance(card.get(field), str):
+        return card[field]
+    side_b = card.get('sideB')
+    if json_path == 'audioSrc' and isinstance(side_b, list) and side_b and isinstance(side_b[0], str):
+        return side_b[0]
+    return None
+
+
+def collect_refs(targets):
+    """{abs mp3 path: (deck file, cardId, text or None)} over the decks."""
+    refs = {}
+    for path in targets:
+        deck, _error = load_deck(path)
+        if deck is None:
+            continue
+        name = os.path.basename(path)
+        for position, card in enumerate(deck['cards'], start=1):
+            if not isinstance(card, dict):
+                continue
+            card_id = card.get('cardId') or f'#{position}'
+            for json_path, src, text in iter_audio_refs(card):
+                abs_path = os.path.normpath(os.path.join(BASE_DIR, src))
+                refs.setdefault(abs_path, (name, card_id, spoken_text(card, json_path, text)))
+    return refs
+
+
+def card_of(abs_path, refs):
+    if abs_path in refs:
+        return refs[abs_path]
+    match = AUDIO_NAME_RE.match(os.path.basename(abs_path))
+    return None, match.group('card') if match else '', None
+
+
+# --- Flags and savings ---
+
+def estimate_savings(stats, target_kbps, keep_ms):
+    """Bytes saved by trimming silence to keep_ms per end and re-encoding to
+    mono at target_kbps when the clip is above it (frame overhead ignored)."""
+    if stats['error'] or not stats['seconds']:
+        return 0
+    trim = (max(0, stats['leadMs'] - keep_ms) + max(0, stats['trailMs'] - keep_ms)) / 1000
+    kept = max(0.0, stats['seconds'] - trim)
+    # kbps * 125 = bytes per second; tags and other overhead stay as they are.
+    now = stats['seconds'] * stats['kbps'] * 125
+    after = kept * min(stats['kbps'], target_kbps) * 125
+    return max(0, round(now - after))
+
+
+def flag_files(files, args):
+    """Set stats['flags'] on every file; [LONG] is relative to its folder."""
+    per_char = defaultdict(list)
+    for stats in files:
+        if not stats['error'] and stats['chars']:
+            per_char[stats['folder']].append(stats['seconds'] / stats['chars'])
+    medians = {folder: statistics.median(values) for folder, values in per_char.items()}
+
+    for stats in files:
+        flags = []
+        if stats['error'] or stats['resyncs']:
+            flags.append('DAMAGED')
+        if not stats['error']:
+            if stats['channels'] == 2:
+                flags.append('STEREO')
+            if stats['kbps'] > args.max_kbps + 0.5:
+                flags.append('BITRATE')
+            if stats['rate'] > args.max_rate:
+                flags.append('RATE')
+            median = medians.get(stats['folder'])
+            if (median and stats['chars'] and stats['seconds'] >= LONG_MIN_SECONDS
+                    and stats['seconds'] / stats['chars'] > args.long_factor * median):
+                flags.append('LONG')
+            if stats['leadMs'] + stats['trailMs'] > args.max_silence_ms:
+                flags.append('SILENCE')
+        stats['flags'] = flags
+
+
+# --- Report ---
+
+def folder_summary(files):
+    ok = [s for s in files if not s['error']]
+    return {
+        'files': len(files),
+        'bytes': sum(s['bytes'] for s in files),
+        'seconds': round(sum(s['seconds'] for s in ok), 1),
+        'savingsBytes': sum(s['savingsBytes'] for s in files),
+        'bitrates': dict(Counter(str(round(s['kbps'])) for s in ok).most_common()),
+        'sampleRates': dict(Counter(str(s['rate']) for s in ok).most_common()),
+        'channels': dict(Counter(s['mode'] for s in ok).most_common()),
+        'leadMsMean': round(statistics.mean(s['leadMs'] for s in ok)) if ok else 0,
+        'trailMsMean': round(statistics.mean(s['trailMs'] for s in ok)) if ok else 0,
+        'flags': dict(Counter(flag for s in files for flag in s['flags']).most_common()),
+    }
+
+
+def file_entry(stats):
+    if stats['error']:
+        return {'bytes': stats['bytes'], 'error': stats['error'], 'flags': stats['flags']}
+    entry = {'bytes': stats['bytes'], 'seconds': round(stats['seconds'], 3),
+             'kbps': round(stats['kbps'], 1), 'sampleRate': stats['rate'], 'channels': stats['mode'],
+             'leadMs': stats['leadMs'], 'trailMs': stats['trailMs'], 'chars': stats['chars'],
+             'savingsBytes': stats['savingsBytes'], 'flags': stats['flags']}
+    if stats['vbr']:
+        entry['vbr'] = True
+    if stats['tag']:
+        entry['tag'] = stats['tag']
+    return entry
+
+
+def build_report(by_folder, deck_of_folder, target_kbps):
+    folders = {}
+    for folder, files in sorted(by_folder.items()):
+        cards = defaultdict(dict)
+        for stats in sorted(files, key=lambda s: s['path']):
+            cards[stats['card']][os.path.basename(stats['path'])] = file_entry(stats)
+        folders[os.path.basename(folder)] = dict(
+            base=rel_src(folder) + '/', deckFile=deck_of_folder.get(folder),
+            **folder_summary(files), cards={k: cards[k] for k in sorted(cards)})
+    every = [s for files in by_folder.values() for s in files]
+    return {'format': REPORT_FORMAT, 'targetKbps': target_kbps, 'totals': folder_summary(every),
+            'folders': folders}
+
+
+def _mb(n):
+    return f'{n / 1024 / 1024:.1f} MB'
+
+
+def _top(counter):
+    return '/'.join(k for k, _ in Counter(counter).most_common(2)) or '-'
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Header-level encoding audit of public/data/audio.")
+    parser.add_argument('folders', nargs='*', help="Audio folder names (default: every folder).")
+    parser.add_argument('--json', metavar='PATH', help="Write the full per-folder / per-card report.")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Worker processes.")
+    parser.add_argument('--target-kbps', type=int, default=DEFAULT_TARGET_KBPS,
+                        help=f"Mono bitrate assumed for the savings estimate (default: {DEFAULT_TARGET_KBPS}).")
+    parser.add_argument('--max-kbps', type=int, default=DEFAULT_MAX_KBPS)
+    parser.add_argument('--max-rate', type=int, default=DEFAULT_MAX_RATE)
+    parser.add_argument('--long-factor', type=float, default=DEFAULT_LONG_FACTOR)
+    parser.add_argument('--max-silence-ms', type=int, default=DEFAULT_MAX_SILENCE_MS)
+    parser.add_argument('--keep-silence-ms', type=int, default=DEFAULT_KEEP_SILENCE_MS)
+    parser.add_argument('--top', type=int, default=20, help="Worst files listed (default: 20).")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    started = time.perf_counter()
+    tree = scan_audio_tree(min(32, (os.cpu_count() or 1) * 4))
+    if args.folders:
+        wanted = {os.path.basename(os.path.normpath(f)) for f in args.folders}
+        unknown = wanted - {os.path.basename(folder) for folder in tree}
+        if unknown:
+            print(f"DEBUG: Audio folder(s) not found in {AUDIO_DIR}: {', '.join(sorted(unknown))}")
+            sys.exit(1)
+        tree = {folder: files for folder, files in tree.items() if os.path.basename(folder) in wanted}
+    paths = sorted(os.path.join(folder, name) for folder, files in tree.items() for name in files)
+
+    targets, _scan_all = resolve_targets([])
+    refs = collect_refs(targets)
+
+    batches = [paths[i:i + BATCH_SIZE] for i in range(0, len(paths), BATCH_SIZE)]
+    if args.jobs > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(batches))) as pool:
+            results = [stats for batch in pool.map(analyze_batch, batches) for stats in batch]
+    else:
+        results = [analyze_file(path) for path in paths]
+    parsed_ms = (time.perf_counter() - started) * 1000
+
+    by_folder = defaultdict(list)
+    deck_votes = defaultdict(Counter)
+    for stats in results:
+        deck_file, card_id, text = card_of(stats['path'], refs)
+        stats.update(folder=os.path.dirname(stats['path']), card=card_id,
+                     chars=len(text.strip()) if text else 0)
+        stats['savingsBytes'] = estimate_savings(stats, args.target_kbps, args.keep_silence_ms)
+        by_folder[stats['folder']].append(stats)
+        if deck_file:
+            deck_votes[stats['folder']][deck_file] += 1
+    deck_of_folder = {folder: votes.most_common(1)[0][0] for folder, votes in deck_votes.items()}
+    flag_files(results, args)
+
+    print("=====================================================")
+    print("=== AUDIO ENCODING AUDIT (mp3 headers only)       ===")
+    print("=====================================================")
+    for folder, files in sorted(by_folder.items()):
+        summary = folder_summary(files)
+        flagged = sum(1 for s in files if s['flags'])
+        damaged = summary['flags'].get('DAMAGED', 0)
+        status = "FAIL:   [DAMAGED]" if damaged else ("DEBUG:  [FLAGGED]" if flagged else "VERIFY: [OK]     ")
+        print(f"{status} {os.path.basename(folder):<28} {summary['files']:>5} files {_mb(summary['bytes']):>9} "
+              f"{summary['seconds'] / 60:>6.1f} min  {_top(summary['bitrates'])} kbps "
+              f"{_top(summary['sampleRates'])} Hz {_top(summary['channels']):<6} "
+              f"silence {summary['leadMsMean']}+{summary['trailMsMean']} ms  "
+              f"save ~{_mb(summary['savingsBytes'])}")
+        if summary['flags']:
+            print(f"          flags: " + ', '.join(f'{k} {v}' for k, v in summary['flags'].items())
+                  + (f"  (deck: {deck_of_folder[folder]})" if folder in deck_of_folder else ''))
+
+    worst = sorted((s for s in results if s['flags']),
+                   key=lambda s: ('DAMAGED' not in s['flags'], -len(s['flags']),
+                                  -s['savingsBytes'], s['path']))[:args.top]
+    if worst:
+        print("")
+        print(f"Worst {len(worst)} file(s):")
+        for stats in worst:
+            where = rel_src(stats['path'])
+            if stats['error']:
+                print(f"          [DAMAGED]  {where} -> {stats['error']}")
+                continue
+            print(f"          [{'/'.join(stats['flags'])}] {where}: {stats['seconds']:.1f} s, "
+                  f"{stats['kbps']:.0f} kbps {stats['rate']} Hz {stats['mode']}, "
+                  f"silence {stats['leadMs']}+{stats['trailMs']} ms, {stats['chars']} chars, "
+                  f"save ~{stats['savingsBytes'] / 1024:.0f} KB")
+
+    report = build_report(by_folder, deck_of_folder, args.target_kbps)
+    totals = report['totals']
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print("")
+    print("=====================================================")
+    print(f"VERIFY: Files analysed: {totals['files']} in {len(by_folder)} folder(s), {_mb(totals['bytes'])}, "
+          f"{totals['seconds'] / 3600:.2f} h of audio ({parsed_ms:.0f} ms parse, {elapsed_ms:.0f} ms total)")
+    print(f"VERIFY: Estimated savings at {args.target_kbps} kbps mono + silence trimmed to "
+          f"{args.keep_silence_ms} ms: {_mb(totals['savingsBytes'])} "
+          f"({totals['savingsBytes'] / max(1, totals['bytes']):.0%})")
+    if args.json:
+        print(f"VERIFY: Report written to {args.json}")
+    damaged = totals['flags'].get('DAMAGED', 0)
+    if damaged:
+        print(f"FAIL:   {damaged} file(s) are not clean MPEG audio.")
+        print("=====================================================")
+        sys.exit(1)
+    print("=====================================================")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""
+benchmark.py
+
+Benchmarks for the content toolchain, on synthetic decks of any size:
+
+    check_deck_ids        check_deck_ids.check_file()        / the CLI
+    update_deck           update_deck.update_deck_file()     / the CLI
+    migrate_modal_links   migrate_modal_links_qualified.migrate_deck_file()
+    migrate_glossary      migrate_glossary_add_description.migrate_file()
+
+Every measurement runs in a child process on a fresh copy of the data, in two
+modes:
+    function   the function above, timed around the call only
+    cli        the whole process: interpreter start, imports, the tool.
+               The two migrations have no path arguments (they always scan
+               public/data), so their "cli" is a fresh interpreter calling the
+               entry function on the copy.
+and records wall time (best of --repeat), peak RSS of that child (via
+os.wait4; None where the platform has no rusage, e.g. Windows) and bytes
+written (total size of files created or changed in the copy, backups
+included).
+
+Synthetic data is seeded, so a size + seed always gives the same bytes:
+    flippable        sideA (es) + 1-4 sideB {text, audioSrc} + an HTML note
+    audioChoice      sentenceParts / options / correctAnswer / audio / content
+    multipleChoice   question / options / correctAnswer / code content
+Notes and content carry modal links: a third are legacy **[N]** (work for
+migrate_modal_links), the rest **[er:N]** / **[pv:N]**. The glossary has
+size / 20 entries of inline HTML and no "description" (work for
+migrate_glossary); update_deck gets an improvement file touching 1% of the
+cards. Generated data is cached under --work (default: the temp dir).
+
+Results are appended to bench_history.json (git-ignored), one entry per run
+with the git revision; `compare` flags regressions between two entries.
+
+Usage:
+    py benchmark.py run                               -> 1k, 10k, 100k cards
+    py benchmark.py run --sizes 1k,500k --tools check_deck_ids --repeat 3
+    py benchmark.py run --deck-type audioChoice --modes function --label "after splice"
+    py benchmark.py compare                           -> last run vs the one before
+    py benchmark.py compare --base 0 --threshold 0.2  -> vs the first run, 20% slack
+    py benchmark.py generate --cards 50000 --out /tmp/decks
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is reported as None
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.path.join(BASE_DIR, 'bench_history.json')
+DEFAULT_SIZES = '1k,10k,100k'
+DEFAULT_THRESHOLD = 0.10
+NOISE_SECONDS = 0.02      # timing changes smaller than this are never a regression
+DECK_TYPES = ('flippable', 'audioChoice', 'multipleChoice')
+DECK_NAME = 'bench_deck.json'
+GLOSSARY_NAME = 'english_rules.json'
+IMPROVEMENTS_NAME = 'improvements.json'
+GLOSSARY_RATIO = 20
+UPDATE_RATIO = 100
+METRICS = ('seconds', 'peak_rss_kb', 'bytes_written')
+
+ES_WORDS = ('la reunión', 'el equipo', 'mañana', 'el código', 'la rama', 'el servidor', 'después',
+            'necesitamos', 'revisar', 'el cliente', 'la versión', 'ahora mismo', 'el ambiente',
+            'producción', 'la base de datos', 'la prueba', 'el error', 'también', 'rápido', 'la tarea')
+EN_WORDS = ('the meeting', 'the team', 'tomorrow', 'the code', 'the branch', 'the server', 'later',
+            'we need to', 'review', 'the client', 'the release', 'right now', 'the environment',
+            'production', 'the database', 'the test', 'the bug', 'also', 'quickly', 'the task',
+            'deploy', 'check', 'merge', 'fix', 'before', 'after', 'because', 'so that')
+CODE_LINES = ('git checkout -b feature/{w}', 'SELECT * FROM {w} WHERE id = :id;', 'ls -la /var/{w}',
+              'final {w} = Get.find<{W}Controller>();', 'curl -X POST https://api/{w}')
+
+
+# --- Synthetic data ---
+
+def _sentence(rng, words, low=5, high=12):
+    text = ' '.join(rng.choice(words) for _ in range(rng.randint(low, high)))
+    return text[0].upper() + text[1:] + rng.choice('.?!')
+
+
+def _note(rng, card_number):
+    links = []
+    for _ in range(rng.randint(0, 3)):
+        entry = rng.randint(1, 220)
+        kind = rng.random()
+        links.append(f'**[{entry}]**' if kind < 1 / 3 else f"**[{'er' if kind < 0.85 else 'pv'}:{entry}]**")
+    return (f"<p>Use <strong>{rng.choice(EN_WORDS)}</strong> here (card {card_number}).</p>"
+            f"<ul><li>{_sentence(rng, EN_WORDS, 3, 6)}</li><li>{_sentence(rng, EN_WORDS, 3, 6)}</li></ul>"
+            + ' '.join(links))
+
+
+def generate_card(rng, deck_type, deck_id, number):
+    card_id = f'bench_{number:06d}'
+    audio = f'public/data/audio/{deck_id}/{card_id}'
+    if deck_type == 'flippable':
+        return {'cardId': card_id, 'cardType': 'flippable', 'sideA': _sentence(rng, ES_WORDS),
+                'sideB': [{'text': _sentence(rng, EN_WORDS), 'audioSrc': f'{audio}_sideB_{i}.mp3'}
+                          for i in range(rng.randint(1, 4))],
+                'note': _note(rng, number)}
+    if deck_type == 'audioChoice':
+        prefix, suffix = _sentence(rng, EN_WORDS, 2, 5)[:-1] + ' ', ' ' + _sentence(rng, EN_WORDS, 2, 5).lower()
+        options = rng.sample(EN_WORDS, 3)
+        return {'cardId': card_id, 'category': rng.choice(EN_WORDS), 'sentenceParts': {'prefix': prefix, 'suffix': suffix},
+                'options': [{'text': o, 'isCorrect': i == 0} for i, o in enumerate(options)],
+                'correctAnswer': prefix + options[0] + suffix, 'audioSrc': f'{audio}.mp3',
+                'hint': _sentence(rng, EN_WORDS, 4, 8), 'content': {'type': 'text', 'value': _note(rng, number)}}
+    word = rng.choice(('login', 'orders', 'users', 'cache', 'deploy'))
+    options = [line.format(w=word, W=word.title()) for line in rng.sample(CODE_LINES, 3)]
+    return {'cardId': card_id, 'category': rng.choice(EN_WORDS), 'hint': _sentence(rng, EN_WORDS, 4, 8),
+            'question': _sentence(rng, EN_WORDS, 6, 12)[:-1] + '?', 'options': options,
+            'correctAnswer': options[0],
+            'content': {'type': 'code', 'language': 'bash',
+                        'value': '\n'.join(f'# {chr(65 + i)}. {o}' for i, o in enumerate(options))
+                                 + '\n' + _note(rng, number)}}
+
+
+def generate_deck(cards, deck_type='flippable', seed=1):
+    rng = random.Random(f'{seed}-{deck_type}-{cards}')
+    deck_id = f'bench_{deck_type.lower()}'
+    return {'id': deck_id, 'name': f'Benchmark {deck_type}', 'description': f'{cards} synthetic cards',
+            'deckType': deck_type, 'cards': [generate_card(rng, deck_type, deck_id, n) for n in range(1, cards + 1)]}
+
+
+def generate_glossary(entries, seed=1):
+    rng = random.Random(f'{seed}-glossary-{entries}')
+    glossary = {}
+    for key in range(1, entries + 1):
+        items = ''.join(f"<li><strong>{rng.choice(EN_WORDS)}</strong>: {_sentence(rng, EN_WORDS)}</li>"
+                        for _ in range(rng.randint(3, 8)))
+        glossary[str(key)] = {'title': _sentence(rng, EN_WORDS, 2, 4)[:-1],
+                              'content': f"<p class='mb-4'>{_sentence(rng, EN_WORDS, 10, 25)}</p>"
+                                         f"<ul class='list-disc list-inside space-y-2'>{items}</ul>"}
+    return glossary
+
+
+def generate_improvements(deck, seed=1):
+    """Improved copies of 1% of the cards (at least one), as update_deck takes them."""
+    rng = random.Random(f'{seed}-improvements-{len(deck["cards"])}')
+    picked = rng.sample(deck['cards'], max(1, len(deck['cards']) // UPDATE_RATIO))
+    improved = []
+    for card in picked:
+        card = json.loads(json.dumps(card))
+        card['hint'] = _sentence(rng, EN_WORDS, 4, 8)
+        improved.append(card)
+    return improved
+
+
+def _dump(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def write_dataset(folder, cards, deck_type, seed):
+    """Deck + glossary + improvement file for one size, in `folder`."""
+    os.makedirs(folder, exist_ok=True)
+    deck = generate_deck(cards, deck_type, seed)
+    _dump(os.path.join(folder, DECK_NAME), deck)
+    _dump(os.path.join(folder, GLOSSARY_NAME), generate_glossary(max(10, cards // GLOSSARY_RATIO), seed))
+    _dump(os.path.join(folder, IMPROVEMENTS_NAME), generate_improvements(deck, seed))
+
+
+def dataset_dir(work_dir, cards, deck_type, seed):
+    """The cached dataset for these parameters, generated on first use."""
+    folder = os.path.join(work_dir, f'{deck_type}-{cards}-seed{seed}')
+    if not os.path.exists(os.path.join(folder, IMPROVEMENTS_NAME)):
+        write_dataset(folder + '.tmp', cards, deck_type, seed)
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(folder + '.tmp', folder)
+    return folder
+
+
+# --- Tools ---
+
+def _run_function(tool, workspace):
+    """Call one tool's entry function on `workspace` (in the worker process)."""
+    deck = os.path.join(workspace, DECK_NAME)
+    if tool == 'check_deck_ids':
+        import check_deck_ids
+        result = check_deck_ids.check_file(deck)
+        if result.get('error') or result.get('duplicates'):
+            raise RuntimeError(f"check_deck_ids reported a problem: {result.get('error')}")
+    elif tool == 'update_deck':
+        import update_deck
+        update_deck.update_deck_file(deck, os.path.join(workspace, IMPROVEMENTS_NAME))
+    elif tool == 'migrate_modal_links':
+        import migrate_modal_links_qualified
+        migrate_modal_links_qualified.migrate_deck_file(deck)
+    elif tool == 'migrate_glossary':
+        import migrate_glossary_add_description
+        migrate_glossary_add_description.migrate_file(os.path.join(workspace, GLOSSARY_NAME))
+
+
+def cli_command(tool, workspace):
+    deck = os.path.join(workspace, DECK_NAME)
+    if tool == 'check_deck_ids':
+        return [sys.executable, os.path.join(BASE_DIR, 'check_deck_ids.py'), deck, '--no-cache', '--jobs', '1']
+    if tool == 'update_deck':
+        return [sys.executable, os.path.join(BASE_DIR, 'update_deck.py'), '--deck-file', deck,
+                '--input-file', os.path.join(workspace, IMPROVEMENTS_NAME)]
+    return [sys.executable, os.path.abspath(__file__), '_worker', tool, workspace, '--untimed']
+
+
+TOOLS = ('check_deck_ids', 'update_deck', 'migrate_modal_links', 'migrate_glossary')
+
+
+# --- Measurement ---
+
+def _tree_state(folder):
+    state = {}
+    for root, _dirs, files in os.walk(folder):
+        for name in files:
+            st = os.stat(os.path.join(root, name))
+            state[os.path.join(root, name)] = (st.st_size, st.st_mtime_ns)
+    return state
+
+
+def _run_child(command):
+    """Run `command`; return (returncode, wall seconds, peak RSS in KB or None, stdout)."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=BASE_DIR)
+    # Read before waiting, so a chatty child never blocks on a full pipe.
+    output = process.stdout.read().decode('utf-8', 'replace')
+    if hasattr(os, 'wait4'):
+        _pid, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is KB on Linux, bytes on macOS.
+        peak = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    else:
+        process.wait()
+        peak = None
+    return process.returncode, time.perf_counter() - started, peak, output
+
+
+def measure(tool, mode, dataset, repeat):
+    """Best-of-`repeat` wall time, the peak RSS of that run and bytes written."""
+    best = None
+    for _ in range(repeat):
+        workspace = tempfile.mkdtemp(prefix='bench_')
+        try:
+            shutil.copytree(dataset, workspace, dirs_exist_ok=True)
+            before = _tree_state(workspace)
+            if mode == 'function':
+                command = [sys.executable, os.path.abspath(__file__), '_worker', tool, workspace]
+            else:
+                command = cli_command(tool, workspace)
+            code, wall, peak, output = _run_child(command)
+            if code != 0:
+                return {'ok': False, 'error': output.strip().splitlines()[-1:] or [f'exit code {code}']}
+            seconds = json.loads(output.strip().splitlines()[-1])['seconds'] if mode == 'function' else wall
+            after = _tree_state(workspace)
+            written = sum(size for path, (size, mtime) in after.items() if before.get(path) != (size, mtime))
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+        if best is None or seconds < best['seconds']:
+            best = {'ok': True, 'seconds': round(seconds, 4), 'peak_rss_kb': peak, 'bytes_written': written}
+    return best
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history():
+    try:
+        with open(HISTORY_PATH, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    except FileNotFoundError:
+        return []
+    return history if isinstance(history, list) else []
+
+
+def save_history(history):
+    tmp_path = HISTORY_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, HISTORY_PATH)
+
+
+def parse_sizes(text):
+    sizes = []
+    for part in text.split(','):
+        part = part.strip().lower()
+        factor = 1000 if part.endswith('k') else 1
+        sizes.append(int(float(part.rstrip('k')) * factor))
+    return sizes
+
+
+def _fmt(value, metric):
+    if value is None:
+        return '-'
+    if metric == 'seconds':
+        return f'{value * 1000:.0f} ms'
+    if metric == 'peak_rss_kb':
+        return f'{value / 1024:.1f} MB'
+    return f'{value / 1024:.0f} KB'
+
+
+# --- Commands ---
+
+def cmd_run(args):
+    tools = args.tools.split(',') if args.tools else list(TOOLS)
+    unknown = sorted(set(tools) - set(TOOLS))
+    if unknown:
+        print(f"FAIL:   Unknown tool(s): {', '.join(unknown)} (known: {', '.join(TOOLS)})")
+        return 1
+    modes = args.modes.split(',')
+    work_dir = args.work or os.path.join(tempfile.gettempdir(), 'smartdeck_bench')
+
+    results, failed = [], 0
+    for size in parse_sizes(args.sizes):
+        started = time.perf_counter()
+        dataset = dataset_dir(work_dir, size, args.deck_type, args.seed)
+        print(f"DEBUG:  {size} {args.deck_type} cards: dataset ready in {dataset} "
+              f"({time.perf_counter() - started:.1f} s)")
+        for tool in tools:
+            for mode in modes:
+                result = measure(tool, mode, dataset, args.repeat)
+                result.update(tool=tool, mode=mode, cards=size, deckType=args.deck_type)
+                results.append(result)
+                if not result['ok']:
+                    failed += 1
+                    print(f"FAIL:   [{tool}/{mode}] {size} cards -> {result['error']}")
+                    continue
+                print(f"VERIFY: [{tool:<19} {mode:<8}] {size:>7} cards  {_fmt(result['seconds'], 'seconds'):>10}  "
+                      f"rss {_fmt(result['peak_rss_kb'], 'peak_rss_kb'):>9}  "
+                      f"written {_fmt(result['bytes_written'], 'bytes_written'):>9}")
+
+    history = load_history()
+    history.append({'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'label': args.label,
+                    'git': git_revision(), 'python': platform.python_version(),
+                    'platform': platform.platform(), 'seed': args.seed, 'repeat': args.repeat,
+                    'results': results})
+    save_history(history)
+    print(f"\nVERIFY: Run #{len(history) - 1} saved to {os.path.relpath(HISTORY_PATH, BASE_DIR)}")
+    return 1 if failed else 0
+
+
+def _pick(history, ref):
+    """A run by index (negative counts from the end) or by label."""
+    try:
+        return history[int(ref)]
+    except ValueError:
+        matches = [run for run in history if run.get('label') == ref]
+        if not matches:
+            raise LookupError(f"no run labelled {ref!r}")
+        return matches[-1]
+    except IndexError:
+        raise LookupError(f"no run #{ref} (history has {len(history)})") from None
+
+
+def cmd_compare(args):
+    history = load_history()
+    if len(history) < 2 and (args.base is None or args.head is None):
+        print(f"FAIL:   Need two runs in {os.path.relpath(HISTORY_PATH, BASE_DIR)} to compare.")
+        return 1
+    try:
+        base = _pick(history, args.base if args.base is not None else -2)
+        head = _pick(history, args.head if args.head is not None else -1)
+    except LookupError as e:
+        print(f"FAIL:   {e}")
+        return 1
+
+    def key(result):
+        return result['tool'], result['mode'], result['cards'], result.get('deckType')
+
+    base_results = {key(r): r for r in base['results'] if r.get('ok')}
+    print(f"  base: {base['timestamp']} {base.get('git') or ''} {base.get('label') or ''}")
+    print(f"  head: {head['timestamp']} {head.get('git') or ''} {head.get('label') or ''}")
+    print(f"  threshold: +{args.threshold:.0%} (timings within {NOISE_SECONDS * 1000:.0f} ms are noise)\n")
+    regressions = 0
+    for result in head['results']:
+        old = base_results.get(key(result))
+        if not result.get('ok') or old is None:
+            continue
+        cells = []
+        for metric in METRICS:
+            new_value, old_value = result.get(metric), old.get(metric)
+            if new_value is None or old_value is None:
+                cells.append(f" {metric} n/a")
+                continue
+            change = new_value / old_value - 1 if old_value else (1.0 if new_value else 0.0)
+            flag = change > args.threshold
+            if metric == 'seconds' and new_value - old_value < NOISE_SECONDS:
+                flag = False
+            regressions += flag
+            cells.append(f"{'!' if flag else ' '}{_fmt(new_value, metric)} ({change:+.0%})")
+        tool, mode, cards, _deck_type = key(result)
+        status = 'FAIL:   [REGRESSION]' if any(c.startswith('!') for c in cells) else 'VERIFY: [OK]        '
+        print(f"{status} {tool:<19} {mode:<8} {cards:>7}  " + '  '.join(cells))
+
+    print("")
+    if regressions:
+        print(f"FAIL:   {regressions} metric(s) regressed by more than {args.threshold:.0%}.")
+        return 1
+    print(f"VERIFY: No regression beyond {args.threshold:.0%}.")
+    return 0
+
+
+def cmd_generate(args):
+    write_dataset(args.out, args.cards, args.deck_type, args.seed)
+    sizes = {name: os.path.getsize(os.path.join(args.out, name))
+             for name in (DECK_NAME, GLOSSARY_NAME, IMPROVEMENTS_NAME)}
+    print(f"VERIFY: {args.cards} {args.deck_type} cards -> {args.out} "
+          + ', '.join(f'{name} {size / 1024:.0f} KB' for name, size in sizes.items()))
+    return 0
+
+
+def cmd_worker(args):
+    """Child side of a measurement: run the tool quietly, print the timing."""
+    sys.path.insert(0, BASE_DIR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        _run_function(args.tool, args.workspace)
+        seconds = time.perf_counter() - started
+    if not args.untimed:
+        print(json.dumps({'seconds': seconds}))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the content toolchain on synthetic decks.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help="Measure the tools and append the results to the history.")
+    p.add_argument('--sizes', default=DEFAULT_SIZES, help=f"Card counts, 'k' = 1000 (default: {DEFAULT_SIZES}).")
+    p.add_argument('--tools', help=f"Comma-separated subset of: {', '.join(TOOLS)}.")
+    p.add_argument('--modes', default='function,cli', help="function, cli or both (default: both).")
+    p.add_argument('--deck-type', choices=DECK_TYPES, default='flippable')
+    p.add_argument('--repeat', type=int, default=1, help="Runs per measurement; the fastest is kept.")
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--label', help="Name for this run (usable with compare --base/--head).")
+    p.add_argument('--work', help="Where generated datasets are cached (default: temp dir).")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('compare', help="Flag regressions between two runs of the history.")
+    p.add_argument('--base', help="Run index or label (default: the second to last run).")
+    p.add_argument('--head', help="Run index or label (default: the last run).")
+    p.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                   help=f"Allowed growth per metric (default: {DEFAULT_THRESHOLD}).")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser('generate', help="Write one synthetic dataset (deck, glossary, improvements).")
+    p.add_argument('--cards', type=int, required=True)
+    p.add_argument('--deck-type', choices=DECK_TYPES, default='flippable')
+    p.add_argument('--seed', type=int, default=1)
+    p.add_argument('--out', required=True)
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser('_worker', help=argparse.SUPPRESS)
+    p.add_argument('tool', choices=TOOLS)
+    p.add_argument('workspace')
+    p.add_argument('--untimed', action='store_true')
+    p.set_defaults(func=cmd_worker)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+build_asset_manifest.py
+
+Content-hash manifest of everything the app downloads from public/data, so
+a client can tell exactly which files changed instead of trusting one global
+number. version.json ("95.0.0") is bumped by hand and says "something
+changed" for every deck, glossary and mp3 at once; the manifest says which:
+
+    asset_manifest.json   (next to version.json, committed)
+        {"format": "smartdeck-assets/1",
+         "base": "public/data/",
+         "version": "3f9c0a1b7d2e",
+         "files": {
+           "audio/common_meeting/mi_001.mp3": ["a41c09e2b7f0", 18432],
+           "common_meeting.json": ["0b7d3e5f9a12", 1523311],
+           ...}}
+
+Every entry is path (relative to "base") -> [short hash, size in bytes].
+The short hash is the first 12 hex digits of the file's sha1. "version" is
+the same short hash taken over the sorted entries, so one string comparison
+still answers "anything new?"; when it differs, the client re-downloads only
+the files whose hash differs from the ones it has cached and forgets the
+paths that are gone.
+
+Covered: every file under public/data (decks, sharded decks, glossaries and
+their shards, deck_unlock_codes.json, the search index, audio), except the
+backups/ folders, dotfiles and *.tmp leftovers. version.json stays as the
+human-readable release label shown in the deck list.
+
+Incremental: .asset_manifest_cache.json (git-ignored) remembers size +
+mtime + hash per file; a file whose size and mtime are unchanged is not read
+again. The others are hashed in a thread pool (hashlib releases the GIL
+while it hashes, so threads use every core without pickling file contents
+across processes). asset_manifest.json is written only when its content
+changed, one entry per line, so a commit diff shows exactly which assets
+moved.
+
+Usage:
+    py build_asset_manifest.py           -> update asset_manifest.json
+    py build_asset_manifest.py --check   -> leave the manifest alone; exit 1
+                                            if the committed one is stale
+    py build_asset_manifest.py --force   -> ignore the cache, hash everything
+                                            (mtime + size can miss an edit
+                                            that keeps both)
+    py build_asset_manifest.py --jobs 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from check_deck_ids import BASE_DIR, DATA_DIR
+
+MANIFEST_PATH = os.path.join(BASE_DIR, 'asset_manifest.json')
+CACHE_PATH = os.path.join(BASE_DIR, '.asset_manifest_cache.json')
+FORMAT = 'smartdeck-assets/1'
+BASE = 'public/data/'
+HASH_LENGTH = 12
+# Bump when the hash or the cache shape changes, so every file is re-hashed once.
+CACHE_VERSION = 1
+SKIP_DIRS = {'backups'}
+CHUNK_SIZE = 1024 * 1024
+# Changes listed per kind before the rest is summed up in one line.
+LIST_LIMIT = 20
+
+
+def find_assets(data_dir=DATA_DIR):
+    """{rel path: (size, mtime_ns)} for every file the manifest covers."""
+    assets = {}
+    for folder, dirs, files in os.walk(data_dir):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith('.'))
+        for name in files:
+            if name.startswith('.') or name.endswith('.tmp'):
+                continue
+            path = os.path.join(folder, name)
+            st = os.stat(path)
+            rel = os.path.relpath(path, data_dir).replace(os.sep, '/')
+            assets[rel] = (st.st_size, st.st_mtime_ns)
+    return assets
+
+
+def short_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def manifest_version(files):
+    """Short hash over every (path, hash, size): changes when any asset does."""
+    digest = hashlib.sha1()
+    for rel in sorted(files):
+        file_hash, size = files[rel]
+        digest.update(f'{rel}\0{file_hash}\0{size}\n'.encode('utf-8'))
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def render(files):
+    """The manifest as text: sorted, one entry per line for readable diffs."""
+    lines = [f'    {json.dumps(rel, ensure_ascii=False)}: {json.dumps(files[rel])}'
+             for rel in sorted(files)]
+    return (f'{{\n  "format": "{FORMAT}",\n  "base": "{BASE}",\n'
+            f'  "version": "{manifest_version(files)}",\n'
+            f'  "files": {{\n' + ',\n'.join(lines) + '\n  }\n}\n')
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """{rel: [hash, size]} of the committed manifest ({} if missing or unreadable)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('format') != FORMAT:
+        return {}
+    return manifest.get('files') or {}
+
+
+def load_cache():
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+
+def save_cache(files):
+    tmp_path = CACHE_PATH + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': files}, f, ensure_ascii=False,
+                      separators=(',', ':'))
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        print(f"DEBUG: Could not write cache {CACHE_PATH} ({e})")
+
+
+def hash_assets(assets, cache, jobs):
+    """{rel: [hash, size]} for every asset, plus (hashed count, bytes hashed).
+    Cached hashes are reused when size and mtime match."""
+    files, todo = {}, []
+    for rel, (size, mtime_ns) in assets.items():
+        cached = cache.get(rel)
+        if cached and cached[0] == size and cached[1] == mtime_ns:
+            files[rel] = [cached[2], size]
+        else:
+            todo.append(rel)
+
+    paths = [os.path.join(DATA_DIR, rel) for rel in todo]
+    if len(todo) > 1 and jobs > 1:
+        with ThreadPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+            hashes = list(pool.map(short_hash, paths))
+    else:
+        hashes = [short_hash(path) for path in paths]
+    for rel, file_hash in zip(todo, hashes):
+        files[rel] = [file_hash, assets[rel][0]]
+    return files, len(todo), sum(assets[rel][0] for rel in todo)
+
+
+def compare(old, new):
+    """(added, changed, removed) paths between two {rel: [hash, size]} maps."""
+    added = sorted(set(new) - set(old))
+    removed = sorted(set(old) - set(new))
+    changed = sorted(rel for rel in set(old) & set(new) if list(old[rel]) != list(new[rel]))
+    return added, changed, removed
+
+
+def print_changes(tag, paths, files):
+    for rel in paths[:LIST_LIMIT]:
+        size = f" {files[rel][1]:>9} bytes" if rel in files else ''
+        print(f"DEBUG:  [{tag}]{' ' * (8 - len(tag))}{rel}{size}")
+    if len(paths) > LIST_LIMIT:
+        print(f"DEBUG:  [{tag}]{' ' * (8 - len(tag))}... and {len(paths) - LIST_LIMIT} more")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the content-hash manifest of public/data.")
+    parser.add_argument('--check', action='store_true',
+                        help="Leave the manifest alone; exit 1 if asset_manifest.json is stale.")
+    parser.add_argument('--force', action='store_true', help="Ignore the cache and hash every file.")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(DATA_DIR):
+        print(f"DEBUG: Data directory not found at {DATA_DIR}")
+        return 1
+
+    print("=====================================================")
+    print("=== ASSET MANIFEST (hash per file in public/data) ===")
+    print("=====================================================")
+    started = time.perf_counter()
+    assets = find_assets()
+    cache = {} if args.force else load_cache()
+    files, hashed, bytes_hashed = hash_assets(assets, cache, args.jobs)
+    save_cache({rel: [assets[rel][0], assets[rel][1], files[rel][0]] for rel in files})
+
+    committed = load_manifest()
+    added, changed, removed = compare(committed, files)
+    print_changes('NEW', added, files)
+    print_changes('CHANGED', changed, files)
+    print_changes('GONE', removed, files)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    total = sum(size for _hash, size in files.values())
+    print("")
+    print(f"VERIFY: {len(files)} files, {total / 1024 / 1024:.1f} MB; {hashed} hashed "
+          f"({bytes_hashed / 1024 / 1024:.1f} MB), {len(files) - hashed} from cache, {elapsed_ms:.0f} ms")
+
+    text = render(files)
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            current_text = f.read()
+    except OSError:
+        current_text = None
+    name = os.path.basename(MANIFEST_PATH)
+    if args.check:
+        if text == current_text:
+            print(f"VERIFY: {name} is up to date (version {manifest_version(files)}).")
+            return 0
+        print(f"FAIL:   {name} is stale: {len(added)} new, {len(changed)} changed, "
+              f"{len(removed)} gone. Run: py build_asset_manifest.py")
+        return 1
+    if text == current_text:
+        print(f"VERIFY: {name} unchanged (version {manifest_version(files)}).")
+        return 0
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(text)
+    os.replace(tmp_path, MANIFEST_PATH)
+    print(f"VERIFY: {name} written: {len(added)} new, {len(changed)} changed, "
+          f"{len(removed)} gone -> version {manifest_version(files)}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
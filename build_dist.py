@@ -0,0 +1,261 @@
+"""
+build_dist.py
+
+Build step for deployment. The Python tooling keeps the files under
+public/data pretty-printed (indent=2) on purpose, for readable diffs; this
+turns them into a deploy tree of minified JSON with precompressed siblings:
+
+    dist/data/<deck>.json          minified
+    dist/data/<deck>.json.gz       gzip -9 (deterministic, mtime 0)
+    dist/data/<deck>.json.br       brotli q11 (only if the `brotli` package is
+                                   installed; skipped with a note otherwise)
+    dist/data/glossary/...         same for every glossary file
+    dist/data/<deck>.deck/...      same for every file of a sharded deck
+                                   (see deck_shards.py)
+    dist/data/glossary/<name>/...  same for the per-entry glossary shards
+                                   (see build_glossary_shards.py)
+    dist/data/search/index.json    same for the full-text search index
+                                   (see build_search_index.py)
+    dist/catalog.json              one small file the app can load at startup
+                                   instead of every full deck
+
+catalog.json:
+    {"decks": [{"id", "name", "description", "deckType", "cardCount", "path",
+                "bytes": {"source", "min", "gz", "br"}}, ...],
+     "glossaries": [{"key", "entryCount", "path", "bytes": {...}}, ...]}
+
+Incremental: dist/.build_state.json remembers the sha1 of every source and
+its catalog entry; only sources whose hash changed (or whose artifacts are
+missing) are rebuilt, in a process pool. Artifacts whose source was deleted
+or renamed are removed from dist/data, together with their state entry.
+
+Usage:
+    py build_dist.py                 -> incremental build into dist/
+    py build_dist.py --force         -> rebuild everything
+    py build_dist.py --out build/ --jobs 4
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # optional: .br artifacts are skipped without it
+    brotli = None
+
+import deck_shards
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'public', 'data')
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, 'dist')
+STATE_NAME = '.build_state.json'
+# Bump when the artifact format changes, so every file is rebuilt once.
+BUILD_VERSION = 1
+
+
+def find_sources():
+    """Every deck/glossary JSON: public/data/*.json, public/data/glossary/*.json,
+    the index + chunks of every sharded deck, the glossary shards and the
+    search index."""
+    sources = []
+    folders = ['', 'glossary', 'search']
+    folders += [name for name in sorted(os.listdir(DATA_DIR))
+                if deck_shards.is_sharded(os.path.join(DATA_DIR, name))]
+    glossary_dir = os.path.join(DATA_DIR, 'glossary')
+    if os.path.isdir(glossary_dir):
+        folders += ['glossary/' + name for name in sorted(os.listdir(glossary_dir))
+                    if name != 'backups' and os.path.isdir(os.path.join(glossary_dir, name))]
+    for sub in folders:
+        folder = os.path.join(DATA_DIR, sub)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if name.endswith('.json') and os.path.isfile(path):
+                sources.append(path)
+    return sources
+
+
+def artifact_paths(out_dir, rel):
+    base = os.path.join(out_dir, 'data', rel)
+    paths = [base, base + '.gz']
+    if brotli is not None:
+        paths.append(base + '.br')
+    return paths
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def catalog_entry(rel, data, sizes):
+    """Describe one source for catalog.json (None for non deck/glossary files)."""
+    path = 'data/' + rel
+    folder = os.path.dirname(rel)
+    if folder.endswith(deck_shards.SHARD_SUFFIX) and os.path.basename(rel) != deck_shards.INDEX_NAME:
+        return None, None  # a chunk: reached through its deck's index
+    if isinstance(data, dict) and isinstance(data.get('cards'), list):
+        return 'decks', {
+            'id': data.get('id'),
+            'name': data.get('name'),
+            'description': data.get('description'),
+            'deckType': data.get('deckType'),
+            'cardCount': len(data['cards']),
+            'path': path,
+            'bytes': sizes,
+        }
+    if folder == 'glossary' and isinstance(data, dict) and \
+            rel not in ('glossary/glossary_manifest.json', 'glossary/glossary_refs.json'):
+        return 'glossaries', {
+            'key': os.path.splitext(os.path.basename(rel))[0],
+            'entryCount': len(data),
+            'path': path,
+            'bytes': sizes,
+        }
+    return None, None
+
+
+def build_one(source, rel, out_dir, digest):
+    """Minify + compress one source. Runs in the process pool."""
+    with open(source, 'rb') as f:
+        raw = f.read()
+    data = json.loads(raw.decode('utf-8-sig'))
+    minified = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    gz = gzip.compress(minified, compresslevel=9, mtime=0)
+
+    paths = artifact_paths(out_dir, rel)
+    _write(paths[0], minified)
+    _write(paths[1], gz)
+    sizes = {'source': len(raw), 'min': len(minified), 'gz': len(gz), 'br': None}
+    if brotli is not None:
+        br = brotli.compress(minified, quality=11)
+        _write(paths[2], br)
+        sizes['br'] = len(br)
+
+    section, entry = catalog_entry(rel, data, sizes)
+    return {'sha1': digest, 'section': section, 'entry': entry, 'sizes': sizes}
+
+
+def prune(out_dir, current):
+    """Delete artifacts under dist/data whose source is no longer in `current`
+    (deleted or renamed decks / glossaries), then any folder left empty.
+    Scans dist/ itself rather than the build state, so it also works after
+    --force or a BUILD_VERSION bump. Returns {rel: artifacts removed}."""
+    root = os.path.join(out_dir, 'data')
+    removed = {}
+    for folder, _dirs, files in os.walk(root, topdown=False):
+        for name in files:
+            rel = os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/')
+            for suffix in ('.gz', '.br'):
+                if rel.endswith(suffix):
+                    rel = rel[:-len(suffix)]
+            if rel not in current:
+                os.remove(os.path.join(folder, name))
+                removed[rel] = removed.get(rel, 0) + 1
+        if folder != root and not os.listdir(folder):
+            os.rmdir(folder)
+    return removed
+
+
+def load_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_NAME), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get('version') != BUILD_VERSION or state.get('brotli') != (brotli is not None):
+        return {}
+    return state.get('files', {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build minified, precompressed deck artifacts and catalog.json.")
+    parser.add_argument('--out', default=DEFAULT_OUT_DIR, help="Output directory (default: dist/).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--force', action='store_true', help="Rebuild every artifact.")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    out_dir = os.path.abspath(args.out)
+    state = {} if args.force else load_state(out_dir)
+    if brotli is None:
+        print("DEBUG:  'brotli' package not installed -> skipping .br artifacts (pip install brotli).")
+
+    results, todo = {}, []
+    for source in find_sources():
+        rel = os.path.relpath(source, DATA_DIR).replace(os.sep, '/')
+        with open(source, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        previous = state.get(rel)
+        if previous and previous['sha1'] == digest and \
+                all(os.path.exists(p) for p in artifact_paths(out_dir, rel)):
+            results[rel] = previous
+        else:
+            todo.append((source, rel, digest))
+
+    collected, failed = [], []
+    if len(todo) > 1 and args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(todo))) as pool:
+            futures = [(rel, pool.submit(build_one, source, rel, out_dir, digest))
+                       for source, rel, digest in todo]
+            for rel, future in futures:
+                try:
+                    collected.append((rel, future.result()))
+                except Exception as e:
+                    failed.append((rel, e))
+    else:
+        for source, rel, digest in todo:
+            try:
+                collected.append((rel, build_one(source, rel, out_dir, digest)))
+            except Exception as e:
+                failed.append((rel, e))
+    results.update(collected)
+
+    # Sources deleted or renamed since the last build: drop their artifacts.
+    # Their state entries go too, since the state is rewritten from results.
+    stale = prune(out_dir, set(results) | {rel for rel, _error in failed})
+    for rel, count in sorted(stale.items()):
+        print(f"DEBUG:  [PRUNED]  {rel:<44} {count} artifact(s) removed (source is gone)")
+
+    for rel, error in failed:
+        print(f"FAIL:   {rel} -> {error}")
+    for rel, _result in collected:
+        sizes = results[rel]['sizes']
+        br = f", br {sizes['br']:>8}" if sizes['br'] is not None else ''
+        print(f"VERIFY: [BUILT]   {rel:<44} {sizes['source']:>8} -> min {sizes['min']:>8}, "
+              f"gz {sizes['gz']:>8}{br}")
+
+    catalog = {'decks': [], 'glossaries': []}
+    for rel in sorted(results):
+        result = results[rel]
+        if result['section']:
+            catalog[result['section']].append(result['entry'])
+    _write(os.path.join(out_dir, 'catalog.json'),
+           json.dumps(catalog, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    _write(os.path.join(out_dir, STATE_NAME),
+           json.dumps({'version': BUILD_VERSION, 'brotli': brotli is not None,
+                       'files': results}, indent=2).encode('utf-8'))
+
+    totals = {k: sum((r['sizes'][k] or 0) for r in results.values()) for k in ('source', 'min', 'gz')}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print("")
+    print(f"VERIFY: {len(results)} source(s), {len(collected)} rebuilt, "
+          f"{len(results) - len(collected)} up to date, {len(stale)} pruned, {elapsed_ms:.0f} ms")
+    print(f"VERIFY: {totals['source']} bytes source -> {totals['min']} minified -> {totals['gz']} gzip")
+    print(f"VERIFY: catalog: {len(catalog['decks'])} decks, {len(catalog['glossaries'])} glossaries "
+          f"-> {os.path.relpath(os.path.join(out_dir, 'catalog.json'), BASE_DIR)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+build_glossary_shards.py
+
+Splits every glossary listed in public/data/glossary/glossary_manifest.json
+into one small file per entry plus a light index, so the app loads only the
+indexes at startup and fetches a few KB when a modal is opened, instead of
+the whole glossary (english_rules.json is ~725 KB of inline HTML):
+
+    public/data/glossary/english_rules/
+        index.json     {"format": "smartdeck-glossary/1", "glossary": "english_rules",
+                        "sourceSha1": "...",
+                        "entries": {"16": {"title", "description", "bytes"}, ...}}
+        16.json        {"title", "description", "content"}  minified
+        ...
+
+"bytes" is the size of the entry file. Entry files are minified JSON and the
+HTML in "content" has its whitespace runs collapsed to one space (the glossary
+HTML has no <pre>/<textarea>; an entry that does is kept verbatim).
+
+The glossary JSON files stay the source of truth: edit them, then re-run this
+(check_modal_links.py fails while any shard set is stale). The app trusts the
+index; only an id missing from it makes GlossaryService load the full file.
+Incremental: a glossary whose sha1 matches index.json's "sourceSha1" is
+skipped, and otherwise only entry files whose bytes changed are rewritten
+(files of deleted entries are removed). Every run ends with a round-trip check:
+index + entry files must reassemble into the (collapsed) source.
+
+Usage:
+    py build_glossary_shards.py            -> incremental
+    py build_glossary_shards.py --force    -> re-check every glossary
+    py build_glossary_shards.py --verify   -> round-trip check only, no writes
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GLOSSARY_DIR = os.path.join(BASE_DIR, 'public', 'data', 'glossary')
+MANIFEST_PATH = os.path.join(GLOSSARY_DIR, 'glossary_manifest.json')
+INDEX_NAME = 'index.json'
+FORMAT = 'smartdeck-glossary/1'
+
+WHITESPACE_RE = re.compile(r'\s+')
+VERBATIM_RE = re.compile(r'<(pre|textarea)\b', re.IGNORECASE)
+
+
+def collapse_html(html):
+    if VERBATIM_RE.search(html):
+        return html
+    return WHITESPACE_RE.sub(' ', html).strip()
+
+
+def shard_entry(entry):
+    """The entry as stored in its shard: same fields, content collapsed."""
+    if isinstance(entry, dict) and isinstance(entry.get('content'), str):
+        entry = dict(entry, content=collapse_html(entry['content']))
+    return entry
+
+
+def encode(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def entry_file(key):
+    # Keys are numeric strings; anything else must not escape the folder or
+    # shadow the index.
+    if not re.fullmatch(r'[A-Za-z0-9_-]+', key) or key == 'index':
+        raise ValueError(f"entry key {key!r} can't be used as a file name")
+    return key + '.json'
+
+
+def load_index(shard_dir):
+    try:
+        with open(os.path.join(shard_dir, INDEX_NAME), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get('format') == FORMAT else None
+
+
+def _write_if_changed(path, data):
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def build(name, glossary, digest, shard_dir):
+    """Write the shards of one glossary. Returns (written, removed) counts."""
+    os.makedirs(shard_dir, exist_ok=True)
+    written, entries = 0, {}
+    for key, entry in glossary.items():
+        data = encode(shard_entry(entry))
+        written += _write_if_changed(os.path.join(shard_dir, entry_file(key)), data)
+        entries[key] = {'title': entry.get('title'), 'description': entry.get('description', ''),
+                        'bytes': len(data)}
+
+    keep = {entry_file(key) for key in glossary} | {INDEX_NAME}
+    removed = 0
+    for file_name in os.listdir(shard_dir):
+        if file_name.endswith('.json') and file_name not in keep:
+            os.remove(os.path.join(shard_dir, file_name))
+            removed += 1
+
+    index = {'format': FORMAT, 'glossary': name, 'sourceSha1': digest, 'entries': entries}
+    written += _write_if_changed(os.path.join(shard_dir, INDEX_NAME), encode(index))
+    return written, removed
+
+
+def verify(glossary, shard_dir, digest=None):
+    """Return a list of round-trip problems (empty = index + shards == source).
+    With `digest` (sha1 of the source bytes) the index's sourceSha1 must match."""
+    index = load_index(shard_dir)
+    if index is None:
+        return ['no readable index.json']
+    problems = []
+    if digest is not None and index.get('sourceSha1') != digest:
+        problems.append('index sourceSha1 differs from the source (stale shards)')
+    if list(index['entries']) != list(glossary):
+        problems.append('index keys differ from the source (order or content)')
+    for key, entry in glossary.items():
+        meta = index['entries'].get(key)
+        try:
+            with open(os.path.join(shard_dir, entry_file(key)), 'rb') as f:
+                raw = f.read()
+        except OSError as e:
+            problems.append(f'{key}: {e}')
+            continue
+        if json.loads(raw) != shard_entry(entry):
+            problems.append(f'{key}: entry file differs from the source')
+        elif meta is None or meta.get('title') != entry.get('title') or \
+                meta.get('description', '') != entry.get('description', '') or meta.get('bytes') != len(raw):
+            problems.append(f'{key}: index entry is stale')
+    return problems
+
+
+def read_source(name):
+    """(glossary, sha1 of its bytes) of public/data/glossary/<name>.json."""
+    with open(os.path.join(GLOSSARY_DIR, name + '.json'), 'rb') as f:
+        raw = f.read()
+    return json.loads(raw.decode('utf-8-sig')), hashlib.sha1(raw).hexdigest()
+
+
+def check(name):
+    """Problems with the shards of one glossary (empty = they match the source).
+    The --verify check, for other scripts."""
+    try:
+        glossary, digest = read_source(name)
+    except (OSError, ValueError) as e:
+        return [f'{name}.json: {e}']
+    return verify(glossary, os.path.join(GLOSSARY_DIR, name), digest)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split glossaries into per-entry shards with a light index.")
+    parser.add_argument('--force', action='store_true', help="Ignore sourceSha1 and re-check every entry.")
+    parser.add_argument('--verify', action='store_true', help="Only run the round-trip check.")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    with open(MANIFEST_PATH, 'r', encoding='utf-8-sig') as f:
+        manifest = json.load(f)
+
+    failed = []
+    for item in manifest:
+        name = item['key']
+        source = os.path.join(GLOSSARY_DIR, name + '.json')
+        shard_dir = os.path.join(GLOSSARY_DIR, name)
+        try:
+            with open(source, 'rb') as f:
+                raw = f.read()
+            glossary = json.loads(raw.decode('utf-8-sig'))
+        except (OSError, ValueError) as e:
+            print(f"FAIL:   {name}.json -> {e}")
+            failed.append(name)
+            continue
+        digest = hashlib.sha1(raw).hexdigest()
+
+        if not args.verify:
+            index = load_index(shard_dir)
+            if not args.force and index and index.get('sourceSha1') == digest:
+                print(f"DEBUG:  [SKIP]  {name:<16} unchanged ({len(glossary)} entries)")
+            else:
+                try:
+                    written, removed = build(name, glossary, digest, shard_dir)
+                except ValueError as e:
+                    print(f"FAIL:   {name} -> {e}")
+                    failed.append(name)
+                    continue
+                print(f"VERIFY: [BUILT] {name:<16} {len(glossary)} entries, "
+                      f"{written} file(s) written, {removed} removed")
+
+        problems = verify(glossary, shard_dir, digest)
+        for problem in problems[:10]:
+            print(f"FAIL:   [ROUNDTRIP] {name}: {problem}")
+        if problems:
+            failed.append(name)
+            continue
+        sizes = [meta['bytes'] for meta in load_index(shard_dir)['entries'].values()]
+        index_size = os.path.getsize(os.path.join(shard_dir, INDEX_NAME))
+        print(f"VERIFY: [OK]    {name:<16} source {len(raw)} bytes -> index {index_size} bytes, "
+              f"entries avg {sum(sizes) // max(len(sizes), 1)} / max {max(sizes, default=0)} bytes")
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print("")
+    if failed:
+        print(f"FAIL:   Problems in: {', '.join(failed)}")
+        return 1
+    print(f"VERIFY: Glossary shards match their sources ({elapsed_ms:.0f} ms).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+build_search_index.py
+
+Builds one inverted full-text index over every deck and glossary, so "which
+card says X" is a lookup instead of loading every deck and scanning strings:
+
+    public/data/search/index.json
+        {"format": "smartdeck-search/1",
+         "sources":  [{"kind": "deck", "id": "<deckId>", "path": "dummy.json",
+                       "first": 0, "count": 33},
+                      {"kind": "glossary", "id": "english_rules",
+                       "path": "glossary/english_rules.json", "first": 4063, ...}, ...],
+         "docs":     ["<cardId or glossary key>", ...],
+         "terms":    ["abandon", "about", ...],
+         "postings": [[12, 1, 40], ...]}
+
+A doc is one card (key = cardId) or one glossary entry (key = entry id); doc
+number n belongs to the source whose [first, first + count) contains it.
+"terms" is sorted by code point, so a client can binary-search it once the
+file is loaded; postings[i] lists the docs containing terms[i], ascending and
+delta-encoded (first doc number, then the gap to each next one).
+
+Indexed text:
+    cards      sideA (text / conversation), sideB (strings or .text), note,
+               sentenceParts, correctAnswer, hint, question, options
+    glossary   title, description, content (HTML tags stripped)
+Modal-link markup (**[er:16]**) is dropped. Tokens are lowercased and
+accent-folded (NFKD without combining marks: "canción" -> "cancion",
+"año" -> "ano"), apostrophes are removed inside words ("don't" -> "dont"), and
+1-character tokens are skipped. Queries go through the same normalization.
+
+Incremental: .search_index_state.json (git-ignored) keeps every source's own
+doc list and term table, keyed by size + mtime + sha1 like check_deck_ids.py.
+Only changed decks / glossaries are re-tokenized; the merge into index.json
+is cheap, and the file is written only when its content changed.
+
+Usage:
+    py build_search_index.py                     -> incremental build
+    py build_search_index.py --force             -> re-tokenize everything
+    py build_search_index.py --query "stand up"  -> search the built index
+                                                    (every word must match;
+                                                    the last one as a prefix)
+"""
+
+import argparse
+import bisect
+import html
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+
+from check_deck_ids import BASE_DIR, DATA_DIR, file_digest, load_deck, resolve_targets, stat_signature
+from check_modal_links import MODAL_LINK_RE
+
+GLOSSARY_DIR = os.path.join(DATA_DIR, 'glossary')
+MANIFEST_PATH = os.path.join(GLOSSARY_DIR, 'glossary_manifest.json')
+INDEX_PATH = os.path.join(DATA_DIR, 'search', 'index.json')
+STATE_PATH = os.path.join(BASE_DIR, '.search_index_state.json')
+FORMAT = 'smartdeck-search/1'
+# Bump when tokenization or the state shape changes, so every source is
+# re-tokenized once.
+STATE_VERSION = 1
+
+TAG_RE = re.compile(r'<[^>]*>')
+APOSTROPHE_RE = re.compile(r"(?<=\w)['’](?=\w)")
+TOKEN_RE = re.compile(r'[^\W_]{2,}')
+
+
+# --- Tokenization ---
+
+def normalize(text):
+    """Lowercase and strip accents; the same fold is applied to queries."""
+    text = text.lower()
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return APOSTROPHE_RE.sub('', text)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(MODAL_LINK_RE.sub(' ', text)))
+
+
+def strip_html(text):
+    return html.unescape(TAG_RE.sub(' ', text))
+
+
+def _texts(value):
+    """Strings inside a side / option value: str, {text}, or a list of them."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        if isinstance(value.get('text'), str):
+            yield value['text']
+        for part in value.get('conversation') or ():
+            yield from _texts(part)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _texts(item)
+
+
+def card_texts(card):
+    for field in ('sideA', 'sideB', 'options'):
+        yield from _texts(card.get(field))
+    for field in ('note', 'correctAnswer', 'hint', 'question'):
+        if isinstance(card.get(field), str):
+            yield card[field]
+    parts = card.get('sentenceParts')
+    if isinstance(parts, dict):
+        yield from (v for v in parts.values() if isinstance(v, str))
+
+
+def glossary_texts(entry):
+    for field in ('title', 'description'):
+        if isinstance(entry.get(field), str):
+            yield entry[field]
+    if isinstance(entry.get('content'), str):
+        yield strip_html(entry['content'])
+
+
+def index_docs(docs):
+    """[(key, texts)] -> (keys, {term: [local doc numbers]})."""
+    keys, terms = [], defaultdict(list)
+    for number, (key, texts) in enumerate(docs):
+        keys.append(key)
+        seen = set()
+        for text in texts:
+            seen.update(tokenize(text))
+        for term in seen:
+            terms[term].append(number)
+    return keys, dict(terms)
+
+
+# --- Sources ---
+
+def find_sources():
+    """[(kind, path)] for every deck (plain or sharded) and every glossary in
+    the manifest, in index order."""
+    targets, _scan_all = resolve_targets([])
+    sources = [('deck', path) for path in targets]
+    with open(MANIFEST_PATH, 'r', encoding='utf-8-sig') as f:
+        sources += [('glossary', os.path.join(GLOSSARY_DIR, item['key'] + '.json')) for item in json.load(f)]
+    return sources
+
+
+def read_source(kind, path):
+    """Return (id, [(key, texts)]), or None for a file that isn't a deck."""
+    if kind == 'glossary':
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            glossary = json.load(f)
+        return (os.path.splitext(os.path.basename(path))[0],
+                [(key, list(glossary_texts(entry))) for key, entry in glossary.items()
+                 if isinstance(entry, dict)])
+    deck, error = load_deck(path)
+    if deck is None:
+        if error:
+            raise ValueError(error)
+        return None
+    return (deck.get('id') or os.path.basename(path),
+            [(card.get('cardId') or f'#{position}', list(card_texts(card)))
+             for position, card in enumerate(deck['cards'], start=1) if isinstance(card, dict)])
+
+
+def load_state():
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+        return {}
+    return state.get('sources', {})
+
+
+def save_state(sources):
+    tmp_path = STATE_PATH + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'sources': sources}, f, ensure_ascii=False,
+                      separators=(',', ':'))
+        os.replace(tmp_path, STATE_PATH)
+    except OSError as e:
+        print(f"DEBUG: Could not write state {STATE_PATH} ({e})")
+
+
+# --- Index ---
+
+def delta_encode(numbers):
+    return [n - prev for prev, n in zip([0] + numbers, numbers)]
+
+
+def delta_decode(deltas):
+    numbers, total = [], 0
+    for delta in deltas:
+        total += delta
+        numbers.append(total)
+    return numbers
+
+
+def merge(entries):
+    """Merge per-source entries (in order) into the index.json structure."""
+    sources, docs, postings = [], [], defaultdict(list)
+    for rel, entry in entries:
+        first = len(docs)
+        sources.append({'kind': entry['kind'], 'id': entry['id'], 'path': rel,
+                        'first': first, 'count': len(entry['docs'])})
+        docs += entry['docs']
+        for term, numbers in entry['terms'].items():
+            postings[term].extend(first + n for n in numbers)
+    terms = sorted(postings)
+    return {'format': FORMAT, 'sources': sources, 'docs': docs, 'terms': terms,
+            'postings': [delta_encode(postings[term]) for term in terms]}
+
+
+def _write_if_changed(path, data):
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def build(force=False):
+    """Returns (index, written, reindexed names, failed names)."""
+    state = {} if force else load_state()
+    new_state, entries, reindexed, failed = {}, [], [], []
+    for kind, path in find_sources():
+        rel = os.path.relpath(path, DATA_DIR).replace(os.sep, '/')
+        name = os.path.basename(path)
+        try:
+            signature = list(stat_signature(path))
+            entry = state.get(rel)
+            if entry is None or entry.get('signature') != signature:
+                digest = file_digest(path)
+                if entry is None or entry.get('sha1') != digest:
+                    source = read_source(kind, path)
+                    if source is None:
+                        continue
+                    source_id, docs = source
+                    keys, terms = index_docs(docs)
+                    entry = {'kind': kind, 'id': source_id, 'sha1': digest, 'docs': keys, 'terms': terms}
+                    reindexed.append(name)
+                entry['signature'] = signature
+        except (OSError, ValueError) as e:
+            print(f"FAIL:   {name} -> {e}")
+            failed.append(name)
+            continue
+        new_state[rel] = entry
+        entries.append((rel, entry))
+
+    index = merge(entries)
+    written = _write_if_changed(INDEX_PATH, json.dumps(index, ensure_ascii=False,
+                                                       separators=(',', ':')).encode('utf-8'))
+    save_state(new_state)
+    return index, written, reindexed, failed
+
+
+# --- Query ---
+
+def load_index(path=INDEX_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get('format') != FORMAT:
+        raise ValueError(f"{path} is not a {FORMAT} index; rebuild it")
+    return index
+
+
+def term_docs(index, word, prefix=False):
+    """Doc numbers of the term `word`, or of every term starting with it
+    (binary search either way)."""
+    terms = index['terms']
+    found = set()
+    i = bisect.bisect_left(terms, word)
+    while i < len(terms) and (terms[i] == word or prefix and terms[i].startswith(word)):
+        found.update(delta_decode(index['postings'][i]))
+        i += 1
+    return found
+
+
+def search(index, query):
+    """Doc numbers containing every word of `query`, ascending. The last word
+    also matches as a prefix, so a half-typed query already finds cards."""
+    words = TOKEN_RE.findall(normalize(query))
+    if not words:
+        return []
+    checks = {word: False for word in words}
+    checks[words[-1]] = True
+    result = None
+    for word, prefix in sorted(checks.items(), key=lambda item: item[1]):
+        docs = term_docs(index, word, prefix)
+        result = docs if result is None else result & docs
+        if not result:
+            return []
+    return sorted(result)
+
+
+def doc_source(index, number):
+    firsts = [s['first'] for s in index['sources']]
+    return index['sources'][bisect.bisect_right(firsts, number) - 1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build / query the full-text search index.")
+    parser.add_argument('--force', action='store_true', help="Ignore the state file and re-tokenize everything.")
+    parser.add_argument('--query', metavar='TEXT', help="Search the built index instead of building it.")
+    parser.add_argument('--limit', type=int, default=50, help="Hits to print with --query (default: 50).")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.query is not None:
+        try:
+            index = load_index()
+        except (OSError, ValueError) as e:
+            print(f"FAIL:   {e}")
+            return 1
+        hits = search(index, args.query)
+        for number in hits[:args.limit]:
+            source = doc_source(index, number)
+            print(f"  {source['path']:<40} {index['docs'][number]}")
+        if len(hits) > args.limit:
+            print(f"  ... and {len(hits) - args.limit} more (--limit)")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"VERIFY: {len(hits)} hit(s) for {args.query!r} ({elapsed_ms:.0f} ms)")
+        return 0
+
+    index, written, reindexed, failed = build(args.force)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"DEBUG:  Re-tokenized {len(reindexed)} of {len(index['sources'])} source(s)"
+          + (f": {', '.join(reindexed)}" if reindexed else ""))
+    print(f"VERIFY: {len(index['docs'])} docs, {len(index['terms'])} terms -> "
+          f"{os.path.relpath(INDEX_PATH, BASE_DIR)} ({'written' if written else 'unchanged'}, "
+          f"{os.path.getsize(INDEX_PATH)} bytes, {elapsed_ms:.0f} ms)")
+    if failed:
+        print(f"FAIL:   Not indexed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+# =============================================================================
+# PURPOSE
+#   Audio companion of check_deck_ids.py. Cross-references every audio path
+#   referenced by the decks with the mp3 files that really exist under
+#   public/data/audio/<folder>/, and optionally writes a per-deck
+#   audio_manifest.json so the client knows which files exist without sending
+#   a HEAD request per answer (FlippableCardScreen.js).
+#
+#   An audio reference is any string field whose key ends in "audioSrc"
+#   (case-insensitive), wherever it sits in a card: sideB[*].audioSrc,
+#   audioChoice "audioSrc", options[*].audioSrc, questionAudioSrc,
+#   answerAudioSrc, sideA.conversation[*].audioSrc, ...
+#
+# USAGE
+#   py check_audio.py                       -> every deck vs. the audio tree
+#   py check_audio.py dummy.json            -> only these decks (orphans are
+#                                              then only reported for the
+#                                              folders those decks use)
+#   py check_audio.py --manifest            -> also write audio_manifest.json
+#   py check_audio.py --strict              -> orphans / naming also fail
+#   py check_audio.py --threads 16          -> directory scan threads
+#
+# EXIT CODE
+#   0 = no missing files (and, with --strict, no orphan / naming issue).
+#   1 = at least one failure.
+#
+# WHAT IT REPORTS
+#   [MISSING] a deck references an audio file that does not exist  (failure)
+#   [NAMING]  a referenced file is not named after its card: expected
+#             <cardId>_sideB_<i>.mp3 for sideB[i], otherwise <cardId>[_x].mp3
+#             (warning; failure with --strict)
+#   [ORPHAN]  an mp3 that no deck references, e.g. left behind by a deleted
+#             card  (warning; failure with --strict)
+#
+# MANIFEST (public/data/audio/<folder>/audio_manifest.json, one per deck)
+#   {"deckId": "...", "deckFile": "dummy.json", "base": "public/data/audio/dummy/",
+#    "files": 122, "bytes": N,
+#    "cards": {"<cardId>": {"dummy_001_sideB_0.mp3": <bytes>, ...}}}
+#   A card lists the existing files it references plus any file in the deck's
+#   folder named after it (the <cardId>_sideB_<i>.mp3 paths the client guesses).
+#   Names are relative to "base"; a file outside it keeps its full
+#   "public/..." path.
+# =============================================================================
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from check_deck_ids import BASE_DIR, DATA_DIR, load_deck, resolve_targets
+
+AUDIO_DIR = os.path.join(DATA_DIR, 'audio')
+# Content-addressed store written by dedupe_audio.py; its files are named by
+# hash, not by card, so the [NAMING] rule does not apply to them.
+SHARED_DIR = os.path.join(AUDIO_DIR, '_shared')
+MANIFEST_NAME = 'audio_manifest.json'
+# <cardId> + optional role suffix (_sideB_<i>, _a, _b, _q, ...) + .mp3
+AUDIO_NAME_RE = re.compile(r'^(?P<card>.+?)(?P<suffix>_sideB_(?P<index>\d+)|_[a-z])?\.mp3$')
+
+
+def iter_audio_refs(node, path=''):
+    """Yield (json_path, audioSrc, text) for every audio reference in a card.
+    `text` is the sibling "text" field when there is one (sideB, conversation)."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            child = f'{path}.{key}' if path else key
+            if isinstance(value, str) and key.lower().endswith('audiosrc'):
+                yield child, value, node.get('text') if isinstance(node.get('text'), str) else None
+            elif isinstance(value, (dict, list)):
+                yield from iter_audio_refs(value, child)
+    elif isinstance(node, list):
+        for i, value in enumerate(node):
+            yield from iter_audio_refs(value, f'{path}[{i}]')
+
+
+def rel_src(abs_path):
+    """Absolute path -> the 'public/data/audio/...' form used in audioSrc."""
+    return os.path.relpath(abs_path, BASE_DIR).replace(os.sep, '/')
+
+
+def scan_folder(folder):
+    """One os.scandir pass: {file name: size} for the mp3s in one folder."""
+    files = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith('.mp3'):
+                files[entry.name] = entry.stat().st_size
+    return folder, files
+
+
+def scan_audio_tree(threads):
+    """{folder abs path: {name: size}}, one thread per audio folder."""
+    if not os.path.isdir(AUDIO_DIR):
+        return {}
+    folders = [entry.path for entry in os.scandir(AUDIO_DIR) if entry.is_dir()]
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        return dict(pool.map(scan_folder, folders))
+
+
+def naming_problem(card_id, json_path, src):
+    if os.path.dirname(os.path.normpath(os.path.join(BASE_DIR, src))) == SHARED_DIR:
+        return None
+    name = os.path.basename(src)
+    match = AUDIO_NAME_RE.match(name)
+    if not match or match.group('card') != card_id:
+        return f"'{name}' is not named after card '{card_id}'"
+    side_b = re.match(r'^sideB\[(\d+)\]\.audioSrc$', json_path)
+    if side_b and match.group('index') != side_b.group(1):
+        return f"'{name}' is {json_path}; expected {card_id}_sideB_{side_b.group(1)}.mp3"
+    return None
+
+
+def audit_deck(deck, tree):
+    """Return (refs, missing, naming) for one deck.
+    refs: [(cardId, abs path)] of every reference, existing or not."""
+    refs, missing, naming = [], [], []
+    for position, card in enumerate(deck['cards'], start=1):
+        if not isinstance(card, dict):
+            continue
+        card_id = card.get('cardId') or f'#{position}'
+        for json_path, src, _text in iter_audio_refs(card):
+            abs_path = os.path.normpath(os.path.join(BASE_DIR, src))
+            refs.append((card_id, abs_path))
+            folder, name = os.path.split(abs_path)
+            if name not in tree.get(folder, {}) and not os.path.isfile(abs_path):
+                missing.append((card_id, json_path, src))
+                continue
+            problem = naming_problem(card_id, json_path, src)
+            if problem:
+                naming.append((card_id, problem))
+    return refs, missing, naming
+
+
+def build_manifest(deck, deck_file, refs, tree):
+    """cardId -> existing files (referenced, or named after the card)."""
+    card_ids = {c.get('cardId') for c in deck['cards'] if isinstance(c, dict)}
+    folders = defaultdict(int)
+    per_card = defaultdict(dict)
+    for card_id, abs_path in refs:
+        folder, name = os.path.split(abs_path)
+        folders[folder] += 1
+        if name in tree.get(folder, {}):
+            per_card[card_id][abs_path] = tree[folder][name]
+    if not folders:
+        return None, None
+
+    home = max(folders, key=folders.get)
+    for name, size in tree.get(home, {}).items():
+        match = AUDIO_NAME_RE.match(name)
+        if match and match.group('card') in card_ids:
+            per_card[match.group('card')].setdefault(os.path.join(home, name), size)
+
+    def short(abs_path):
+        folder, name = os.path.split(abs_path)
+        return name if folder == home else rel_src(abs_path)
+
+    cards = {card_id: {short(p): size for p, size in sorted(files.items())}
+             for card_id, files in per_card.items()}
+    manifest = {
+        'deckId': deck.get('id'),
+        'deckFile': deck_file,
+        'base': rel_src(home) + '/',
+        'files': sum(len(files) for files in cards.values()),
+        'bytes': sum(sum(files.values()) for files in cards.values()),
+        'cards': {card_id: cards[card_id] for card_id in sorted(cards)},
+    }
+    return os.path.join(home, MANIFEST_NAME), manifest
+
+
+def write_manifest(path, manifest):
+    """Write only when the content changed; returns True if written. Compact
+    on purpose: the manifest is generated, and fetched by the client."""
+    data = json.dumps(manifest, ensure_ascii=False, separators=(',', ':'))
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-check deck audio references with the audio tree.")
+    parser.add_argument('paths', nargs='*', help="Deck files (default: every deck in public/data).")
+    parser.add_argument('--manifest', action='store_true', help="Write audio_manifest.json per deck.")
+    parser.add_argument('--strict', action='store_true', help="Orphan and naming issues also fail.")
+    parser.add_argument('--threads', type=int, default=min(32, (os.cpu_count() or 1) * 4))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    targets, scan_all = resolve_targets(args.paths)
+    tree = scan_audio_tree(args.threads)
+    scanned_ms = (time.perf_counter() - started) * 1000
+
+    print("=====================================================")
+    print("=== DECK AUDIO CHECK                              ===")
+    print("=====================================================")
+
+    referenced = set()
+    used_folders = set()
+    failed_decks, warned = [], 0
+    manifests_written = 0
+
+    for path in targets:
+        name = os.path.basename(path)
+        deck, error = load_deck(path)
+        if deck is None:
+            if error:
+                print(f"FAIL:   [ERROR]   {name} -> {error}")
+                failed_decks.append(name)
+            continue
+
+        refs, missing, naming = audit_deck(deck, tree)
+        referenced.update(p for _, p in refs)
+        used_folders.update(os.path.dirname(p) for _, p in refs)
+        if not refs:
+            continue
+
+        status = "VERIFY: [OK]     " if not missing else "FAIL:   [PROBLEM]"
+        print(f"{status} {name:<36} {len(refs):>5} audio refs")
+        for card_id, json_path, src in missing:
+            print(f"          [MISSING] {card_id} {json_path} -> {src}")
+        for card_id, problem in naming:
+            print(f"          [NAMING]  {card_id} {problem}")
+        if missing:
+            failed_decks.append(name)
+        if naming:
+            warned += len(naming)
+            if args.strict:
+                failed_decks.append(name)
+
+        if args.manifest:
+            manifest_path, manifest = build_manifest(deck, name, refs, tree)
+            if manifest_path and write_manifest(manifest_path, manifest):
+                manifests_written += 1
+
+    folders = tree if scan_all else {f: tree.get(f, {}) for f in used_folders}
+    orphans = defaultdict(list)
+    for folder, files in folders.items():
+        for file_name, size in files.items():
+            if os.path.join(folder, file_name) not in referenced:
+                orphans[folder].append((file_name, size))
+
+    if orphans:
+        print("")
+        for folder in sorted(orphans):
+            items = sorted(orphans[folder])
+            total = sum(size for _, size in items)
+            print(f"DEBUG:  [ORPHAN]  {rel_src(folder)}: {len(items)} unreferenced file(s), "
+                  f"{total / 1024 / 1024:.1f} MB")
+            for file_name, _size in items[:5]:
+                print(f"          {file_name}")
+            if len(items) > 5:
+                print(f"          ... and {len(items) - 5} more")
+            warned += len(items)
+            if args.strict:
+                failed_decks.append(rel_src(folder))
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    total_files = sum(len(files) for files in tree.values())
+    print("")
+    print("=====================================================")
+    print(f"VERIFY: Audio files scanned: {total_files} in {len(tree)} folder(s) ({scanned_ms:.0f} ms)")
+    print(f"VERIFY: Referenced: {len(referenced)}, orphaned: "
+          f"{sum(len(v) for v in orphans.values())}, time: {elapsed_ms:.0f} ms")
+    if args.manifest:
+        print(f"VERIFY: Manifests written: {manifests_written}")
+    if failed_decks:
+        unique_failed = sorted(set(failed_decks))
+        print(f"FAIL:   Problems in: {len(unique_failed)} -> {', '.join(unique_failed)}")
+        print("=====================================================")
+        sys.exit(1)
+    if warned:
+        print(f"VERIFY: No missing audio ({warned} warning(s); --strict to fail on them).")
+    else:
+        print("VERIFY: All audio references resolve. Safe to commit.")
+    print("=====================================================")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
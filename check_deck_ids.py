@@ -21,13 +21,43 @@
 #   py check_deck_ids.py public/data/dummy.json
 #   py check_deck_ids.py dummy.json common_meeting.json   (bare names resolve
 #                                                          inside public/data)
+#   py check_deck_ids.py --no-cache           -> ignore the cache, full rescan
+#   py check_deck_ids.py --jobs 4             -> size of the process pool
+#   py check_deck_ids.py common_meeting.deck  -> a sharded deck directory
+#                                                (see deck_shards.py)
+#
+# INCREMENTAL MODE (default)
+#   Results are cached per file in .deck_ids_cache.json (next to this script,
+#   git-ignored), keyed by path + size + mtime + sha1 of the bytes. A deck whose
+#   size and mtime are unchanged is not even read; a deck whose mtime changed
+#   but whose bytes hash the same (e.g. a touch or a checkout) is not parsed.
+#   Only really changed decks are parsed and checked, in a process pool when
+#   there is more than one. The cache stores each deck's top-level "id", so
+#   the cross-deck [DECKID] check still sees every deck, cached or not.
+#
+# STREAMING
+#   Plain deck files are never loaded whole: deck_stream.py yields the cards
+#   of the "cards" array one at a time and each is checked as it is parsed,
+#   so memory stays flat however large the deck grows (only one small entry
+#   per cardId is kept, for the uniqueness check). Results are the same as a
+#   full json.load, and every [DUP] also shows the byte offset of each card,
+#   so a huge file can be opened at the right place.
+#
+# PROFILING
+#   py check_deck_ids.py --profile            -> time per phase (cache, stat,
+#                                                hash, check, report) and
+#                                                bytes / cards per file
+#   py check_deck_ids.py --profile-out trace.json --no-cache
+#                                             -> Chrome trace, pool workers
+#                                                included (see deck_profile.py)
 #
 # EXIT CODE
 #   0 = every deck is clean.  1 = at least one problem was found.
 #   So it can gate a commit:  py check_deck_ids.py && git add ...
 #
 # WHAT IT REPORTS
-#   [DUP]     the same cardId used by 2+ cards in one deck  (hard failure)
+#   [DUP]     the same cardId used by 2+ cards in one deck  (hard failure),
+#             e.g. 'x_001' used 2 times -> cards #3 (byte 812), #9 (byte 2741)
 #   [MISSING] a card with no cardId / empty / not a string  (hard failure)
 #   [DECKID]  two deck FILES sharing the same top-level deck "id" (hard
 #             failure, only in scan-all mode) — they would collide on the
@@ -37,13 +67,24 @@
 #   $env:PYTHONIOENCODING="utf-8".
 # =============================================================================
 
+import argparse
+import hashlib
 import json
 import os
 import sys
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import deck_profile
+import deck_shards
+import deck_stream
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'public', 'data')
+CACHE_PATH = os.path.join(BASE_DIR, '.deck_ids_cache.json')
+# Bump when the shape of a cached result changes, so old caches are ignored.
+CACHE_VERSION = 2
 
 
 def resolve_targets(args):
@@ -55,7 +96,8 @@ def resolve_targets(args):
             sys.exit(1)
         found = [os.path.join(DATA_DIR, f)
                  for f in sorted(os.listdir(DATA_DIR))
-                 if f.endswith('.json')]
+                 if f.endswith('.json')
+                 or deck_shards.is_sharded(os.path.join(DATA_DIR, f))]
         return found, True
 
     paths = []
@@ -75,6 +117,11 @@ def resolve_targets(args):
 
 def load_deck(path):
     """Return (deck_dict, error_string). Non-decks return (None, None)."""
+    if deck_shards.is_sharded(path):
+        try:
+            return deck_shards.load_sharded(path), None
+        except Exception as e:
+            return None, f"broken sharded deck ({e})"
     try:
         # utf-8-sig reads both plain UTF-8 and UTF-8-with-BOM (some Windows
         # editors add a BOM), so a BOM never shows up as a bogus failure.
@@ -90,13 +137,22 @@ def load_deck(path):
     return data, None
 
 
-def check_deck(deck):
-    """Return (duplicates, malformed) for one deck's cards."""
+def check_cards(cards):
+    """Core check over an iterable of (position, byte offset or None, card).
+
+    Returns (duplicates, malformed, offsets, unique_count, card_count).
+    Only one entry per cardId is kept, never the cards themselves, so it runs
+    in flat memory over a streamed deck.
+    """
     positions = defaultdict(list)
+    offsets = defaultdict(list)
     malformed = []
+    blank_ids = set()
+    count = 0
 
-    for index, card in enumerate(deck['cards']):
-        position = index + 1  # 1-based, matches "card #N" when reading the file
+    for position, offset, card in cards:
+        # position is 1-based, matches "card #N" when reading the file
+        count += 1
         if not isinstance(card, dict):
             malformed.append((position, 'card is not an object'))
             continue
@@ -108,15 +164,226 @@ def check_deck(deck):
             malformed.append((position, f'cardId is not a string ({card_id!r})'))
         elif not card_id.strip():
             malformed.append((position, 'cardId is empty'))
+            blank_ids.add(card_id)
         else:
             positions[card_id].append(position)
+            offsets[card_id].append(offset)
 
     duplicates = {cid: pos for cid, pos in positions.items() if len(pos) > 1}
+    dup_offsets = {cid: offsets[cid] for cid in duplicates}
+    return duplicates, malformed, dup_offsets, len(positions) + len(blank_ids), count
+
+
+def check_deck(deck):
+    """Return (duplicates, malformed) for one deck's cards."""
+    cards = ((index + 1, None, card) for index, card in enumerate(deck['cards']))
+    duplicates, malformed, _offsets, _unique, _count = check_cards(cards)
     return duplicates, malformed
 
 
+def check_stream(path):
+    """Streaming equivalent of load_deck + check_cards for a plain deck file
+    (see deck_stream.py): cards are checked as they are parsed, so memory
+    stays flat however large the deck is.
+
+    Returns (fields, is_deck, checked) where checked is check_cards' tuple,
+    or raises ValueError on malformed JSON.
+    """
+    fields = {}
+    state = {'cards': False, 'document': False}
+
+    def cards():
+        for kind, key, start, _end, value in deck_stream.iter_deck(path):
+            if kind == 'card':
+                yield key, start, value
+            elif kind == 'array':
+                state['cards'] = True
+            elif kind == 'document':
+                state['document'] = True
+            else:
+                fields[key] = value
+
+    checked = check_cards(cards())
+    return fields, state['cards'] or 'cards' in fields, checked
+
+
+def check_file(path, digest=None):
+    """Load + check one file and return a plain, JSON-serialisable result.
+
+    This is what runs inside the process pool and what lands in the cache, so
+    it only holds primitives: no deck object travels back to the parent.
+    Plain deck files are streamed (byte offsets of duplicates included);
+    sharded decks are small per file and go through load_deck.
+    """
+    result = {
+        'sha1': digest,
+        'is_deck': False,
+        'error': None,
+        'deck_id': None,
+        'card_count': 0,
+        'unique_count': 0,
+        'duplicates': {},
+        'offsets': {},
+        'malformed': [],
+    }
+    if deck_shards.is_sharded(path):
+        with deck_profile.phase('parse', path):
+            deck, error = load_deck(path)
+        if deck is None:
+            result['error'] = error
+            return result
+        fields = deck
+        cards = ((index + 1, None, card) for index, card in enumerate(deck['cards']))
+        with deck_profile.phase('check', path):
+            checked = check_cards(cards)
+    else:
+        try:
+            # Streaming: parsing and checking interleave, so one phase.
+            with deck_profile.phase('parse+check', path):
+                fields, is_deck, checked = check_stream(path)
+        except Exception as e:
+            result['error'] = f"unreadable JSON ({e})"
+            return result
+        if not is_deck:
+            return result  # glossary/manifest/other file - not a deck
+        if 'cards' in fields:
+            result['error'] = "'cards' is not a list"
+            return result
+
+    duplicates, malformed, offsets, unique_count, card_count = checked
+    if deck_profile.enabled():
+        deck_profile.count(path, bytes_read=stat_signature(path)[0], cards=card_count)
+    result['is_deck'] = True
+    result['deck_id'] = fields.get('id', '(no id)')
+    result['card_count'] = card_count
+    result['unique_count'] = unique_count
+    result['duplicates'] = duplicates
+    result['offsets'] = offsets
+    result['malformed'] = [list(m) for m in malformed]
+    return result
+
+
+def file_digest(path):
+    if os.path.isdir(path):
+        return deck_shards.digest(path)
+    with deck_profile.phase('hash', path), open(path, 'rb') as f:
+        data = f.read()
+        deck_profile.count(path, bytes_hashed=len(data))
+        return hashlib.sha1(data).hexdigest()
+
+
+def stat_signature(path):
+    """(size, mtime_ns) of a deck file, or summed over a sharded deck's files."""
+    if os.path.isdir(path):
+        return deck_shards.stat_signature(path)
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def load_cache():
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return {}
+    return cache.get('files', {})
+
+
+def save_cache(entries):
+    tmp_path = CACHE_PATH + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': entries}, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        print(f"DEBUG: Could not write cache {CACHE_PATH} ({e})")
+
+
+def cache_key(path):
+    return os.path.relpath(path, BASE_DIR).replace(os.sep, '/')
+
+
+def collect_results(targets, use_cache, jobs):
+    """Return ({path: result}, cache_hits) for every target.
+
+    Unchanged files come straight from the cache; the rest are checked, in a
+    process pool when more than one file needs work.
+    """
+    with deck_profile.phase('cache.load'):
+        cached = load_cache() if use_cache else {}
+    results = {}
+    stats = {}
+    pending = []
+
+    for path in targets:
+        try:
+            with deck_profile.phase('stat', path):
+                size, mtime_ns = stat_signature(path)
+        except (OSError, ValueError):
+            size, mtime_ns = -1, -1  # broken shard index: always re-check
+            use_entry = False
+        else:
+            use_entry = use_cache
+        stats[path] = (size, mtime_ns)
+        if not use_entry:
+            pending.append((path, None))
+            continue
+
+        entry = cached.get(cache_key(path))
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            results[path] = entry['result']
+            continue
+
+        digest = file_digest(path)
+        if entry and entry['size'] == size and entry['result'].get('sha1') == digest:
+            results[path] = entry['result']  # touched, not edited
+            continue
+        pending.append((path, digest))
+
+    hits = len(results)
+    if len(pending) > 1 and jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            futures = {path: deck_profile.submit(pool, check_file, path, digest)
+                       for path, digest in pending}
+            for path, future in futures.items():
+                results[path] = deck_profile.result(future)
+    else:
+        for path, digest in pending:
+            results[path] = check_file(path, digest)
+
+    if use_cache:
+        # Merge rather than replace, so checking one deck keeps the others.
+        for path in targets:
+            size, mtime_ns = stats[path]
+            cached[cache_key(path)] = {'size': size, 'mtime_ns': mtime_ns,
+                                       'result': results[path]}
+        with deck_profile.phase('cache.save'):
+            save_cache(cached)
+
+    return results, hits
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Check that every cardId inside each deck is unique.")
+    parser.add_argument('paths', nargs='*',
+                        help="Deck files to check (default: every deck in public/data).")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Ignore and do not update the result cache (full rescan).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes used for changed decks (default: CPU count).")
+    deck_profile.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
 def main():
-    targets, scan_all = resolve_targets(sys.argv[1:])
+    args = parse_args(sys.argv[1:])
+    deck_profile.start(args)
+    started = time.perf_counter()
+    targets, scan_all = resolve_targets(args.paths)
+    results, cache_hits = collect_results(targets, not args.no_cache, max(1, args.jobs))
 
     print("=====================================================")
     print("=== DECK CARD-ID UNIQUENESS CHECK                 ===")
@@ -129,11 +396,11 @@ def main():
 
     for path in targets:
         name = os.path.basename(path)
-        deck, error = load_deck(path)
+        result = results[path]
 
-        if deck is None:
-            if error:
-                print(f"FAIL:   [ERROR]   {name} -> {error}")
+        if not result['is_deck']:
+            if result['error']:
+                print(f"FAIL:   [ERROR]   {name} -> {result['error']}")
                 failed_decks.append(name)
             else:
                 skipped += 1
@@ -142,25 +409,25 @@ def main():
             continue
 
         checked += 1
-        cards = deck['cards']
-        deck_id = deck.get('id', '(no id)')
-        deck_ids_seen[deck_id].append(name)
-
-        duplicates, malformed = check_deck(deck)
-        unique_count = len({c.get('cardId') for c in cards
-                            if isinstance(c, dict) and isinstance(c.get('cardId'), str)})
+        card_count = result['card_count']
+        unique_count = result['unique_count']
+        deck_ids_seen[result['deck_id']].append(name)
+        duplicates = result['duplicates']
+        malformed = result['malformed']
 
         if not duplicates and not malformed:
-            print(f"VERIFY: [OK]      {name:<36} {len(cards):>5} cards, "
+            print(f"VERIFY: [OK]      {name:<36} {card_count:>5} cards, "
                   f"{unique_count} unique cardIds")
             continue
 
         failed_decks.append(name)
-        print(f"FAIL:   [PROBLEM] {name:<36} {len(cards):>5} cards, "
+        print(f"FAIL:   [PROBLEM] {name:<36} {card_count:>5} cards, "
               f"{unique_count} unique cardIds")
 
         for card_id, spots in sorted(duplicates.items()):
-            spots_text = ', '.join(f'#{p}' for p in spots)
+            offsets = result['offsets'].get(card_id) or [None] * len(spots)
+            spots_text = ', '.join(f'#{p}' if o is None else f'#{p} (byte {o})'
+                                   for p, o in zip(spots, offsets))
             print(f"          [DUP]     '{card_id}' used {len(spots)} times "
                   f"-> cards {spots_text}")
 
@@ -182,6 +449,9 @@ def main():
     print(f"VERIFY: Decks checked: {checked}")
     if skipped:
         print(f"VERIFY: Non-deck files skipped: {skipped}")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"VERIFY: Files re-checked: {len(targets) - cache_hits}, "
+          f"from cache: {cache_hits}, time: {elapsed_ms:.0f} ms")
 
     if failed_decks:
         unique_failed = sorted(set(failed_decks))
@@ -0,0 +1,362 @@
+# =============================================================================
+# PURPOSE
+#   Structure companion of check_deck_ids.py. Catches the card shapes that
+#   today only break at runtime in the browser:
+#
+#   flippable       (FlippableCardScreen.js)
+#     - sideA is a string, or {text[, visualContent{type, value}]}, or
+#       {conversation: [{text, audioSrc}, ...]}; it may be null only on an
+#       audio-only card (top-level "audioSrc")
+#     - sideB is required unless sideA is a conversation: a non-empty list of
+#       strings, or of {text, audioSrc[, phonetic]} objects
+#     - note is a string or null
+#   audioChoice     (AudioChoiceScreen.js)
+#     - audioSrc, sentenceParts{prefix, suffix}, options[{text, isCorrect}]
+#       with exactly one isCorrect, and
+#       correctAnswer == prefix + correct option + suffix
+#     - content{type, value} when present
+#   multipleChoice  (QuizScreen.js)
+#     - question, options (2+ distinct strings), correctAnswer in options
+#     - content{type: none | code | text, value} when present
+#
+#   Each deckType's rules are compiled once into a single checker function
+#   (field tables turned into local tuples, one closure per deckType), so no
+#   generic schema is interpreted per card. Decks run in a process pool.
+#
+# USAGE
+#   py check_deck_schema.py                       -> every deck in public/data
+#   py check_deck_schema.py dummy.json ebs.json
+#   py check_deck_schema.py --json report.json    -> also a JSON report
+#   py check_deck_schema.py --junit report.xml    -> also a JUnit XML report
+#                                                    (one testsuite per deck,
+#                                                    one testcase per card)
+#   py check_deck_schema.py --jobs 4
+#
+# EXIT CODE
+#   0 = every card matches its deckType.  1 = at least one problem.
+#   Same contract as check_deck_ids.py, so both can gate a commit:
+#     py check_deck_ids.py && py check_deck_schema.py && git add ...
+#
+# WHAT IT REPORTS
+#   [SCHEMA]  card #N 'cardId' <field>: <what is wrong>        (failure)
+#   [DECK]    unknown / missing deckType, unreadable file       (failure)
+# =============================================================================
+
+import argparse
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from check_deck_ids import load_deck, resolve_targets
+
+NONE = type(None)
+# Problems listed per deck in the console; the reports always have them all.
+PRINT_LIMIT = 10
+
+
+def _type_name(types):
+    types = types if isinstance(types, tuple) else (types,)
+    return ' | '.join('null' if t is NONE else {'str': 'string', 'dict': 'object',
+                                                 'list': 'array', 'bool': 'boolean'}[t.__name__]
+                      for t in types)
+
+
+# --- Rules shared by the compiled checkers. Each returns a list of
+# (field, message) and only runs after the field table passed. ---
+
+def _content_rule(types):
+    def rule(card):
+        content = card.get('content')
+        if content is None:
+            return []
+        if not isinstance(content, dict):
+            return [('content', 'must be an object')]
+        problems = []
+        if content.get('type') not in types:
+            problems.append(('content.type', f"must be one of {', '.join(types)}"))
+        if not isinstance(content.get('value'), str) and content.get('type') != 'none':
+            problems.append(('content.value', 'must be a string'))
+        return problems
+    return rule
+
+
+def flippable_sides(card):
+    problems = []
+    side_a = card.get('sideA')
+    conversation = None
+    if isinstance(side_a, dict):
+        conversation = side_a.get('conversation')
+        if conversation is not None:
+            if not isinstance(conversation, list) or not conversation:
+                problems.append(('sideA.conversation', 'must be a non-empty array'))
+            else:
+                for i, part in enumerate(conversation):
+                    if not isinstance(part, dict):
+                        problems.append((f'sideA.conversation[{i}]', 'must be an object'))
+                        continue
+                    for key in ('text', 'audioSrc'):
+                        if not isinstance(part.get(key), str) or not part[key]:
+                            problems.append((f'sideA.conversation[{i}].{key}', 'missing or empty'))
+        elif not isinstance(side_a.get('text'), str):
+            problems.append(('sideA.text', "missing (an object sideA needs 'text' or 'conversation')"))
+        visual = side_a.get('visualContent')
+        if visual is not None and (not isinstance(visual, dict) or 'type' not in visual or 'value' not in visual):
+            problems.append(('sideA.visualContent', "must be an object with 'type' and 'value'"))
+    elif side_a is None and not isinstance(card.get('audioSrc'), str):
+        problems.append(('sideA', "missing (only audio-only cards with 'audioSrc' may omit it)"))
+
+    side_b = card.get('sideB')
+    if side_b is None:
+        if conversation is None:
+            problems.append(('sideB', 'missing'))
+    elif not side_b:
+        problems.append(('sideB', 'is empty'))
+    elif isinstance(side_b[0], dict):
+        for i, item in enumerate(side_b):
+            if not isinstance(item, dict):
+                problems.append((f'sideB[{i}]', 'mixes strings and objects'))
+                continue
+            for key in ('text', 'audioSrc'):
+                if not isinstance(item.get(key), str) or not item[key]:
+                    problems.append((f'sideB[{i}].{key}', 'missing or empty'))
+            if 'phonetic' in item and not isinstance(item['phonetic'], str):
+                problems.append((f'sideB[{i}].phonetic', 'must be a string'))
+    elif not all(isinstance(item, str) for item in side_b):
+        problems.append(('sideB', 'must hold only strings or only {text, audioSrc} objects'))
+    return problems
+
+
+def audio_choice_answer(card):
+    problems = []
+    correct = []
+    for i, option in enumerate(card['options']):
+        if not isinstance(option, dict):
+            problems.append((f'options[{i}]', 'must be an object'))
+            continue
+        if not isinstance(option.get('text'), str):
+            problems.append((f'options[{i}].text', 'must be a string'))
+        if not isinstance(option.get('isCorrect'), bool):
+            problems.append((f'options[{i}].isCorrect', 'must be true or false'))
+        elif option['isCorrect']:
+            correct.append(option.get('text'))
+    if len(correct) != 1:
+        problems.append(('options', f'{len(correct)} options are marked isCorrect; exactly one must be'))
+
+    parts = card['sentenceParts']
+    for key in ('prefix', 'suffix'):
+        if not isinstance(parts.get(key), str):
+            problems.append((f'sentenceParts.{key}', 'must be a string'))
+    if not problems:
+        expected = parts['prefix'] + correct[0] + parts['suffix']
+        if card['correctAnswer'] != expected:
+            problems.append(('correctAnswer', f"{card['correctAnswer']!r} != prefix + correct option "
+                                              f"+ suffix {expected!r}"))
+    return problems
+
+
+def multiple_choice_answer(card):
+    options = card['options']
+    if len(options) < 2:
+        return [('options', 'needs at least 2 options')]
+    if not all(isinstance(o, str) for o in options):
+        return [('options', 'must hold only strings')]
+    problems = []
+    if len(set(options)) != len(options):
+        problems.append(('options', 'has duplicate options'))
+    if card['correctAnswer'] not in options:
+        problems.append(('correctAnswer', f"{card['correctAnswer']!r} is not one of the options"))
+    return problems
+
+
+# deckType -> (required {field: types}, optional {field: types}, rules)
+SCHEMAS = {
+    'flippable': (
+        {'cardId': str},
+        {'sideA': (str, dict, NONE), 'sideB': (list, NONE), 'note': (str, NONE),
+         'audioSrc': str, 'cardType': str},
+        [flippable_sides],
+    ),
+    'audioChoice': (
+        {'cardId': str, 'audioSrc': str, 'sentenceParts': dict, 'options': list,
+         'correctAnswer': str},
+        {'content': dict, 'hint': str, 'note': (str, NONE), 'category': str},
+        [audio_choice_answer, _content_rule(('text', 'none'))],
+    ),
+    'multipleChoice': (
+        {'cardId': str, 'question': str, 'options': list, 'correctAnswer': str},
+        {'content': dict, 'hint': str, 'category': str,
+         'questionAudioSrc': str, 'answerAudioSrc': str},
+        [multiple_choice_answer, _content_rule(('none', 'code', 'text'))],
+    ),
+}
+
+
+def compile_checker(required, optional, rules):
+    """Turn one deckType's field tables into a single function
+    card -> [(field, message)]. Everything that can be precomputed is."""
+    required = tuple((field, types, f'must be {_type_name(types)}') for field, types in required.items())
+    optional = tuple((field, types, f'must be {_type_name(types)}') for field, types in optional.items())
+    rules = tuple(rules)
+
+    def check(card):
+        if not isinstance(card, dict):
+            return [('', 'card is not an object')]
+        problems = []
+        for field, types, message in required:
+            value = card.get(field)
+            if value is None:
+                problems.append((field, 'missing'))
+            elif not isinstance(value, types):
+                problems.append((field, message))
+        for field, types, message in optional:
+            if field in card and not isinstance(card[field], types):
+                problems.append((field, message))
+        if problems:
+            return problems  # the rules assume the field table holds
+        for rule in rules:
+            problems.extend(rule(card))
+        return problems
+
+    return check
+
+
+CHECKERS = {deck_type: compile_checker(*schema) for deck_type, schema in SCHEMAS.items()}
+
+
+def check_file(path):
+    """Validate one deck. Runs in the process pool; returns plain data."""
+    result = {'file': os.path.basename(path), 'path': path, 'is_deck': False, 'error': None,
+              'deckId': None, 'deckType': None, 'cards': [], 'problems': []}
+    deck, error = load_deck(path)
+    if deck is None:
+        result['error'] = error
+        return result
+    result.update(is_deck=True, deckId=deck.get('id'), deckType=deck.get('deckType'))
+    checker = CHECKERS.get(deck.get('deckType'))
+    if checker is None:
+        result['error'] = (f"unknown deckType {deck.get('deckType')!r} "
+                           f"(expected {', '.join(SCHEMAS)})")
+        return result
+    for position, card in enumerate(deck['cards'], start=1):
+        card_id = card.get('cardId') if isinstance(card, dict) else None
+        result['cards'].append(card_id if isinstance(card_id, str) else f'#{position}')
+        for field, message in checker(card):
+            result['problems'].append({'position': position, 'cardId': card_id,
+                                       'field': field, 'message': message})
+    return result
+
+
+def collect_results(targets, jobs):
+    if len(targets) > 1 and jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(targets))) as pool:
+            return list(pool.map(check_file, targets))
+    return [check_file(path) for path in targets]
+
+
+def write_json_report(path, results, elapsed_ms):
+    decks = [{k: r[k] for k in ('file', 'deckId', 'deckType', 'error', 'problems')}
+             | {'cardCount': len(r['cards'])}
+             for r in results if r['is_deck'] or r['error']]
+    report = {
+        'summary': {'decks': len(decks), 'cards': sum(d['cardCount'] for d in decks),
+                    'problems': sum(len(d['problems']) for d in decks),
+                    'failedDecks': sum(1 for d in decks if d['problems'] or d['error']),
+                    'timeMs': round(elapsed_ms)},
+        'decks': decks,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def write_junit_report(path, results, elapsed_ms):
+    suites = ET.Element('testsuites', name='check_deck_schema', time=f'{elapsed_ms / 1000:.3f}')
+    for r in results:
+        if not r['is_deck'] and not r['error']:
+            continue
+        by_position = {}
+        for problem in r['problems']:
+            by_position.setdefault(problem['position'], []).append(problem)
+        suite = ET.SubElement(suites, 'testsuite', name=r['file'],
+                              tests=str(max(len(r['cards']), 1)),
+                              failures=str(len(by_position)), errors='1' if r['error'] else '0')
+        if r['error']:
+            case = ET.SubElement(suite, 'testcase', classname=r['file'], name='(deck)')
+            ET.SubElement(case, 'error', message=r['error'])
+            continue
+        for position, name in enumerate(r['cards'], start=1):
+            case = ET.SubElement(suite, 'testcase', classname=r['file'], name=name)
+            problems = by_position.get(position)
+            if problems:
+                failure = ET.SubElement(case, 'failure', message=f"{len(problems)} schema problem(s)")
+                failure.text = '\n'.join(f"{p['field']}: {p['message']}" for p in problems)
+    ET.ElementTree(suites).write(path, encoding='utf-8', xml_declaration=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate card structure per deckType.")
+    parser.add_argument('paths', nargs='*', help="Deck files (default: every deck in public/data).")
+    parser.add_argument('--json', metavar='PATH', help="Also write a JSON report.")
+    parser.add_argument('--junit', metavar='PATH', help="Also write a JUnit XML report.")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: CPU count).")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    targets, scan_all = resolve_targets(args.paths)
+    results = collect_results(targets, max(1, args.jobs))
+
+    print("=====================================================")
+    print("=== DECK SCHEMA CHECK                             ===")
+    print("=====================================================")
+
+    failed_decks = []
+    checked = total_cards = 0
+    for r in results:
+        name = r['file']
+        if r['error']:
+            print(f"FAIL:   [DECK]    {name} -> {r['error']}")
+            failed_decks.append(name)
+            continue
+        if not r['is_deck']:
+            if not scan_all:
+                print(f"DEBUG:  [SKIP]    {name} has no 'cards' array. Not a deck.")
+            continue
+        checked += 1
+        total_cards += len(r['cards'])
+        if not r['problems']:
+            print(f"VERIFY: [OK]      {name:<36} {len(r['cards']):>5} {r['deckType']} cards")
+            continue
+        failed_decks.append(name)
+        print(f"FAIL:   [PROBLEM] {name:<36} {len(r['cards']):>5} {r['deckType']} cards, "
+              f"{len(r['problems'])} problem(s)")
+        for p in r['problems'][:PRINT_LIMIT]:
+            print(f"          [SCHEMA]  card #{p['position']} '{p['cardId']}' {p['field']}: {p['message']}")
+        if len(r['problems']) > PRINT_LIMIT:
+            print(f"          ... and {len(r['problems']) - PRINT_LIMIT} more (see --json / --junit)")
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if args.json:
+        write_json_report(args.json, results, elapsed_ms)
+    if args.junit:
+        write_junit_report(args.junit, results, elapsed_ms)
+
+    print("")
+    print("=====================================================")
+    print(f"VERIFY: Decks checked: {checked}, cards: {total_cards}, time: {elapsed_ms:.0f} ms")
+    for label, path in (('JSON', args.json), ('JUnit', args.junit)):
+        if path:
+            print(f"VERIFY: {label} report -> {path}")
+    if failed_decks:
+        print(f"FAIL:   Decks with problems: {len(failed_decks)} -> {', '.join(failed_decks)}")
+        print("=====================================================")
+        sys.exit(1)
+    print("VERIFY: Every card matches its deckType. Safe to commit.")
+    print("=====================================================")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
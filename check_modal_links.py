@@ -0,0 +1,219 @@
+# =============================================================================
+# PURPOSE
+#   Glossary companion of check_deck_ids.py. Every modal link in a card's
+#   note / content.value (the `**[alias:id]**` markup rendered as a clickable
+#   chip by FlippableCardScreen.js and AudioChoiceScreen.js) must point at an
+#   existing glossary entry:
+#
+#     er   -> public/data/glossary/english_rules.json
+#     pv   -> public/data/glossary/phrasal_verbs.json
+#     misc -> public/data/glossary/miscellaneous.json
+#
+#   (same table as GLOSSARY_ALIASES in src/services/GlossaryService.js; keep
+#   the two in sync.)
+#
+#   It also writes the reverse index public/data/glossary/glossary_refs.json,
+#   so the glossary screen can list "cards using this rule" without loading
+#   and regex-scanning every deck:
+#
+#     {"er:16": {"<deckId>": ["<cardId>", ...]}, "pv:3": {...}, ...}
+#
+#   Keys use the same "alias:id" form as the chips' data-term-key. Written
+#   compact, and only when its content changed.
+#
+# USAGE
+#   py check_modal_links.py                 -> every deck + write the index
+#   py check_modal_links.py dummy.json      -> only these decks (no index:
+#                                              it would miss the other decks)
+#   py check_modal_links.py --no-index      -> check only
+#
+# EXIT CODE
+#   0 = every link resolves.  1 = at least one failure.
+#
+# WHAT IT REPORTS
+#   [DANGLING] **[er:999]** but english_rules.json has no entry "999"  (failure)
+#   [ALIAS]    **[xx:3]** with an alias no glossary is registered for  (failure)
+#   [LEGACY]   unqualified **[16]** left over; run
+#              migrate_modal_links_qualified.py                          (failure)
+#   [SHARDS]   the per-entry shards the app reads (glossary/<name>/, see
+#              build_glossary_shards.py) no longer match the glossary, e.g.
+#              an entry pasted in without re-running the build    (failure)
+# =============================================================================
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+import build_glossary_shards
+from check_deck_ids import BASE_DIR, DATA_DIR, load_deck, resolve_targets
+
+GLOSSARY_DIR = os.path.join(DATA_DIR, 'glossary')
+REFS_NAME = 'glossary_refs.json'
+GLOSSARY_ALIASES = {
+    'er': 'english_rules',
+    'pv': 'phrasal_verbs',
+    'misc': 'miscellaneous',
+}
+# Qualified **[alias:id]** and legacy **[id]** in one pass. The alias is
+# matched loosely on purpose, so a typo like **[Er:3]** is reported instead of
+# silently skipped.
+MODAL_LINK_RE = re.compile(r'\*\*\[(?:([A-Za-z_]+):)?(\d+)\]\*\*')
+
+
+def load_glossary_ids():
+    """{alias: set of entry ids}; None for a glossary file that can't be read."""
+    ids = {}
+    for alias, name in GLOSSARY_ALIASES.items():
+        try:
+            with open(os.path.join(GLOSSARY_DIR, name + '.json'), 'r', encoding='utf-8-sig') as f:
+                ids[alias] = set(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"FAIL:   [ERROR]    glossary/{name}.json -> {e}")
+            ids[alias] = None
+    return ids
+
+
+def card_texts(card):
+    """(field, text) pairs that may carry modal links."""
+    if isinstance(card.get('note'), str):
+        yield 'note', card['note']
+    content = card.get('content')
+    if isinstance(content, dict) and isinstance(content.get('value'), str):
+        yield 'content.value', content['value']
+
+
+def scan_deck(deck, glossary_ids):
+    """Return (links, problems): links is [(key, cardId)] for every resolvable
+    link, problems is [(kind, cardId, field, markup)]."""
+    links, problems = [], []
+    for position, card in enumerate(deck['cards'], start=1):
+        if not isinstance(card, dict):
+            continue
+        card_id = card.get('cardId') or f'#{position}'
+        for field, text in card_texts(card):
+            if '**[' not in text:
+                continue
+            for match in MODAL_LINK_RE.finditer(text):
+                alias, entry_id = match.groups()
+                if alias is None:
+                    problems.append(('LEGACY', card_id, field, match.group(0)))
+                elif alias not in glossary_ids:
+                    problems.append(('ALIAS', card_id, field, match.group(0)))
+                elif glossary_ids[alias] is not None and entry_id not in glossary_ids[alias]:
+                    problems.append(('DANGLING', card_id, field, match.group(0)))
+                else:
+                    links.append((f'{alias}:{entry_id}', card_id))
+    return links, problems
+
+
+def build_reverse_index(links_by_deck):
+    """{"alias:id": {deckId: [cardId, ...]}} with stable ordering."""
+    index = defaultdict(lambda: defaultdict(list))
+    for deck_id, links in links_by_deck:
+        for key, card_id in links:
+            if card_id not in index[key][deck_id]:
+                index[key][deck_id].append(card_id)
+
+    def sort_key(key):
+        alias, entry_id = key.split(':')
+        return alias, int(entry_id)
+
+    return {key: {deck_id: index[key][deck_id] for deck_id in sorted(index[key])}
+            for key in sorted(index, key=sort_key)}
+
+
+def write_reverse_index(path, index):
+    """Write only when the content changed; returns True if written."""
+    data = json.dumps(index, ensure_ascii=False, separators=(',', ':'))
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check **[alias:id]** modal links against the glossaries.")
+    parser.add_argument('paths', nargs='*', help="Deck files (default: every deck in public/data).")
+    parser.add_argument('--no-index', action='store_true', help=f"Don't write glossary/{REFS_NAME}.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    targets, scan_all = resolve_targets(args.paths)
+    glossary_ids = load_glossary_ids()
+
+    print("=====================================================")
+    print("=== MODAL LINK CHECK                              ===")
+    print("=====================================================")
+
+    failed = [f'glossary/{GLOSSARY_ALIASES[a]}.json' for a, ids in glossary_ids.items() if ids is None]
+    links_by_deck = []
+    total_links = 0
+    for path in targets:
+        name = os.path.basename(path)
+        deck, error = load_deck(path)
+        if deck is None:
+            if error:
+                print(f"FAIL:   [ERROR]    {name} -> {error}")
+                failed.append(name)
+            continue
+
+        links, problems = scan_deck(deck, glossary_ids)
+        links_by_deck.append((deck.get('id') or name, links))
+        total_links += len(links) + len(problems)
+        if not links and not problems:
+            continue
+        status = "VERIFY: [OK]      " if not problems else "FAIL:   [PROBLEM] "
+        print(f"{status} {name:<36} {len(links) + len(problems):>5} links")
+        for kind, card_id, field, markup in problems:
+            print(f"          [{kind}]{' ' * (9 - len(kind))}{card_id} {field} -> {markup}")
+        if problems:
+            failed.append(name)
+
+    for alias, name in GLOSSARY_ALIASES.items():
+        if glossary_ids[alias] is None:
+            continue
+        stale = build_glossary_shards.check(name)
+        if stale:
+            more = f" (+{len(stale) - 1} more)" if len(stale) > 1 else ''
+            print(f"FAIL:   [SHARDS]   glossary/{name}/ -> {stale[0]}{more}. "
+                  f"Run: py build_glossary_shards.py")
+            failed.append(f'glossary/{name}/')
+
+    index_note = ''
+    if scan_all and not args.no_index:
+        index = build_reverse_index(links_by_deck)
+        index_path = os.path.join(GLOSSARY_DIR, REFS_NAME)
+        written = write_reverse_index(index_path, index)
+        index_note = (f"VERIFY: Reverse index: {len(index)} glossary entries -> "
+                      f"{os.path.relpath(index_path, BASE_DIR)} "
+                      f"({'written' if written else 'unchanged'}, {os.path.getsize(index_path)} bytes)")
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print("")
+    print("=====================================================")
+    print(f"VERIFY: Links checked: {total_links} in {len(targets)} file(s), time: {elapsed_ms:.0f} ms")
+    if index_note:
+        print(index_note)
+    if failed:
+        unique_failed = sorted(set(failed))
+        print(f"FAIL:   Problems in: {len(unique_failed)} -> {', '.join(unique_failed)}")
+        print("=====================================================")
+        sys.exit(1)
+    print("VERIFY: All modal links resolve. Safe to commit.")
+    print("=====================================================")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# =============================================================================
+# PURPOSE
+#   Content companion of check_deck_ids.py. Decks grow by pasting generated
+#   cards through update_deck.py, and near-identical cards keep slipping in:
+#   sideA phrasings that differ by one word, or the same English sentence
+#   recorded again as a sideB variant of another card or deck. Each copy costs
+#   study time and an extra MP3. check_deck_ids.py only sees cardId clashes;
+#   this finds the texts themselves, within and across decks.
+#
+#   Texts compared (each kind only against the same kind):
+#     prompt    sideA (text / conversation), question (multipleChoice)
+#     sentence  every sideB item, correctAnswer (audioChoice)
+#   Variants inside ONE card (sideB[0] vs sideB[1]) are expected and ignored.
+#
+# HOW
+#   1. Texts are folded like the search index (lowercase, no accents, no
+#      punctuation) and identical texts are merged first.
+#   2. Every distinct text becomes a set of 5-byte shingles and a 128-value
+#      MinHash signature, computed with NumPy over all texts at once (no
+#      per-shingle Python loop).
+#   3. LSH banding: signatures are cut into bands, and only texts that share
+#      a whole band are compared, so candidates are found in near-linear time
+#      instead of all pairs (100k+ cards in seconds).
+#   4. Candidates are confirmed with the exact Jaccard similarity of their
+#      shingle sets, and linked pairs are merged into clusters.
+#
+#   NumPy is required (pip install numpy); without it the script says so and
+#   exits.
+#
+# USAGE
+#   py check_near_duplicates.py                    -> every deck in public/data
+#   py check_near_duplicates.py common_meeting.json
+#   py check_near_duplicates.py --threshold 0.7    -> Jaccard cut-off (default 0.8)
+#   py check_near_duplicates.py --cross-deck       -> only clusters spanning decks
+#   py check_near_duplicates.py --json report.json -> every cluster, machine-readable
+#
+# EXIT CODE
+#   0 = no cluster found.  1 = at least one cluster (or an unreadable deck).
+#   Near-duplicates can be deliberate, so this is a review list rather than a
+#   commit gate; it follows the same exit-code contract as the other checks.
+#
+# WHAT IT REPORTS
+#   [CLUSTER] n texts, similarity >= s, within <deck> / across k decks
+#             <deck> <cardId> <field>: <text>
+# =============================================================================
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:  # required; main() explains how to install it
+    np = None
+
+from build_search_index import normalize
+from check_deck_ids import load_deck, resolve_targets
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# Texts shorter than this (after folding) are too short to compare fuzzily.
+MIN_CHARS = 12
+SEED = 1
+PRINT_LIMIT = 30
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+# --- Texts ---
+
+def _side_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        if isinstance(value.get('text'), str):
+            return value['text']
+        parts = value.get('conversation')
+        if isinstance(parts, list):
+            return ' '.join(p['text'] for p in parts if isinstance(p, dict) and isinstance(p.get('text'), str))
+    return None
+
+
+def card_units(card):
+    """(kind, field, text) for every comparable text of one card."""
+    for field in ('sideA', 'question'):
+        text = _side_text(card.get(field))
+        if text:
+            yield 'prompt', field, text
+    side_b = card.get('sideB')
+    if isinstance(side_b, list):
+        for i, item in enumerate(side_b):
+            text = _side_text(item)
+            if text:
+                yield 'sentence', f'sideB[{i}]', text
+    if card.get('sentenceParts') is not None and isinstance(card.get('correctAnswer'), str):
+        yield 'sentence', 'correctAnswer', card['correctAnswer']
+
+
+def fold(text):
+    return NON_WORD_RE.sub(' ', normalize(text)).strip()
+
+
+def collect_texts(targets):
+    """Return ({(kind, folded): [member]}, failed). A member is
+    (deck file, cardId, field, original text)."""
+    texts = defaultdict(list)
+    failed = []
+    for path in targets:
+        name = os.path.basename(path)
+        deck, error = load_deck(path)
+        if deck is None:
+            if error:
+                print(f"FAIL:   [ERROR]   {name} -> {error}")
+                failed.append(name)
+            continue
+        for position, card in enumerate(deck['cards'], start=1):
+            if not isinstance(card, dict):
+                continue
+            card_id = card.get('cardId') or f'#{position}'
+            for kind, field, text in card_units(card):
+                folded = fold(text)
+                if len(folded) >= MIN_CHARS:
+                    texts[(kind, folded)].append((name, card_id, field, text))
+    return texts, failed
+
+
+# --- MinHash / LSH ---
+
+def shingles(folded):
+    """The shingle set of one folded text (used to confirm candidates)."""
+    data = folded.encode('utf-8')
+    return {data[i:i + SHINGLE_SIZE] for i in range(len(data) - SHINGLE_SIZE + 1)}
+
+
+def shingle_values(folded_texts):
+    """Every distinct shingle of every text as one sorted uint64 array of
+    (text index << 40 | 5-byte shingle), built without a per-shingle loop."""
+    encoded = [t.encode('utf-8') for t in folded_texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+    owner = np.repeat(np.arange(len(encoded), dtype=np.uint64), lengths)
+    ends = np.cumsum(lengths)
+    starts = np.flatnonzero(np.arange(len(data)) + SHINGLE_SIZE <= ends[owner.astype(np.int64)])
+    # 5 bytes fit in 40 bits: the shingle itself is its value, no hashing.
+    values = owner[starts] << np.uint64(40)
+    for k in range(SHINGLE_SIZE):
+        values |= data[starts + k] << np.uint64(8 * k)
+    values.sort()
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+def minhash(folded_texts):
+    """(n, NUM_PERM) uint32 signatures. Each 40-bit shingle is mixed down to
+    32 bits once (multiply-shift), then every permutation is the cheap
+    (a*x + b) mod 2**32 with a random odd `a`, applied in place over all
+    shingles of all texts, and reduced to the per-text minimum. Signatures
+    only pick candidates; similarity is confirmed exactly afterwards."""
+    rng = np.random.default_rng(SEED)
+    a = rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64).astype(np.uint32) | np.uint32(1)
+    b = rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64).astype(np.uint32)
+    values = shingle_values(folded_texts)
+    owners = (values >> np.uint64(40)).astype(np.int64)
+    firsts = np.searchsorted(owners, np.arange(len(folded_texts)))
+    mixed = (((values & np.uint64((1 << 40) - 1)) * np.uint64(0x9E3779B97F4A7C15))
+             >> np.uint64(32)).astype(np.uint32)
+    del values, owners
+
+    signatures = np.empty((NUM_PERM, len(folded_texts)), dtype=np.uint32)
+    hashed = np.empty_like(mixed)
+    for k in range(NUM_PERM):
+        np.multiply(mixed, a[k], out=hashed)
+        np.add(hashed, b[k], out=hashed)
+        signatures[k] = np.minimum.reduceat(hashed, firsts)
+    return np.ascontiguousarray(signatures.T)
+
+
+def choose_bands(threshold):
+    """(bands, rows) with bands * rows == NUM_PERM whose S-curve midpoint
+    (1/bands)**(1/rows) is the highest one still below the threshold minus a
+    margin, so pairs at the threshold are very likely to become candidates."""
+    best = (NUM_PERM, 1)
+    for rows in range(1, NUM_PERM + 1):
+        if NUM_PERM % rows == 0 and (rows / NUM_PERM) ** (1 / rows) <= threshold - 0.05:
+            best = (NUM_PERM // rows, rows)
+    return best
+
+
+def candidate_pairs(signatures, kinds, bands, rows):
+    """Unique (i, j) index pairs, i < j, of texts of the same kind that share
+    at least one band. A band is hashed to one uint64 per text; a hash
+    collision only adds a candidate, which the exact check then drops."""
+    rng = np.random.default_rng(SEED + 1)
+    mix = rng.integers(1, 1 << 63, rows + 1, dtype=np.uint64) | np.uint64(1)
+    kind_part = kinds.astype(np.uint64) * mix[-1]
+    found = []
+    for band in range(bands):
+        keys = (signatures[:, band * rows:(band + 1) * rows].astype(np.uint64) * mix[:rows]).sum(axis=1)
+        keys += kind_part
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        run = np.concatenate(([0], np.cumsum(sorted_keys[1:] != sorted_keys[:-1])))
+        # Members of one bucket are adjacent after sorting: pair every
+        # element with the ones 1, 2, ... places later while still in its run.
+        distance = 1
+        while distance < len(order):
+            same = np.flatnonzero(run[:-distance] == run[distance:])
+            if not len(same):
+                break
+            found.append(np.stack([order[same], order[same + distance]], axis=1))
+            distance += 1
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(found), axis=1)
+    return np.unique(pairs, axis=0)
+
+
+class _Clusters:
+    """Union-find over text indexes."""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        self.parent[self.find(i)] = self.find(j)
+
+
+def find_clusters(texts, threshold):
+    """Return [(similarity, [member])] clusters spanning 2+ cards, largest
+    first. similarity is the lowest confirmed pair Jaccard in the cluster
+    (1.0 for texts that fold to the same string)."""
+    keys = list(texts)
+    kind_ids = {kind: n for n, kind in enumerate(sorted({kind for kind, _folded in keys}))}
+    kinds = np.array([kind_ids[kind] for kind, _folded in keys], dtype=np.int64)
+
+    clusters = _Clusters(len(keys))
+    lowest = {}
+    if keys:
+        signatures = minhash([folded for _kind, folded in keys])
+        pairs = candidate_pairs(signatures, kinds, *choose_bands(threshold))
+        if len(pairs):
+            # Cheap MinHash estimate first, exact Jaccard only for survivors.
+            estimate = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+            for i, j in pairs[estimate >= threshold - 0.15].tolist():
+                a, b = shingles(keys[i][1]), shingles(keys[j][1])
+                similarity = len(a & b) / len(a | b)
+                if similarity >= threshold:
+                    lowest[(i, j)] = similarity
+                    clusters.union(i, j)
+
+    groups = defaultdict(list)
+    for i in range(len(keys)):
+        groups[clusters.find(i)].append(i)
+    similarity_of = defaultdict(lambda: 1.0)
+    for (i, _j), similarity in lowest.items():
+        root = clusters.find(i)
+        similarity_of[root] = min(similarity_of[root], similarity)
+
+    result = []
+    for root, indexes in groups.items():
+        members = [member for i in indexes for member in texts[keys[i]]]
+        if len({(deck, card_id) for deck, card_id, _field, _text in members}) > 1:
+            result.append((similarity_of[root], members))
+    result.sort(key=lambda c: (-len(c[1]), c[1][0][0], c[1][0][1]))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate card texts with MinHash/LSH.")
+    parser.add_argument('paths', nargs='*', help="Deck files (default: every deck in public/data).")
+    parser.add_argument('--threshold', type=float, default=0.8,
+                        help="Jaccard similarity of 5-byte shingles to report (default: 0.8).")
+    parser.add_argument('--cross-deck', action='store_true', help="Only report clusters spanning 2+ decks.")
+    parser.add_argument('--json', metavar='PATH', help="Also write every cluster as JSON.")
+    args = parser.parse_args()
+
+    if np is None:
+        print("FAIL:   NumPy is required for the MinHash signatures. Install it with:  pip install numpy")
+        sys.exit(1)
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold must be in (0, 1]")
+
+    started = time.perf_counter()
+    targets, _scan_all = resolve_targets(args.paths)
+    texts, failed = collect_texts(targets)
+    clusters = find_clusters(texts, args.threshold)
+    if args.cross_deck:
+        clusters = [c for c in clusters if len({m[0] for m in c[1]}) > 1]
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    print("=====================================================")
+    print("=== NEAR-DUPLICATE CHECK                          ===")
+    print("=====================================================")
+    for similarity, members in clusters[:PRINT_LIMIT]:
+        decks = sorted({m[0] for m in members})
+        where = f"within {decks[0]}" if len(decks) == 1 else f"across {len(decks)} decks"
+        print(f"FAIL:   [CLUSTER] {len(members)} texts, similarity >= {similarity:.2f}, {where}")
+        for deck, card_id, field, text in members:
+            print(f"          {deck:<32} {card_id:<16} {field:<13}: {text[:70]}")
+    if len(clusters) > PRINT_LIMIT:
+        print(f"          ... and {len(clusters) - PRINT_LIMIT} more cluster(s) (see --json)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'threshold': args.threshold,
+                       'clusters': [{'similarity': round(similarity, 4),
+                                     'members': [{'deck': d, 'cardId': c, 'field': fl, 'text': t}
+                                                 for d, c, fl, t in members]}
+                                    for similarity, members in clusters]},
+                      f, indent=2, ensure_ascii=False)
+
+    print("")
+    print("=====================================================")
+    print(f"VERIFY: Texts compared: {sum(len(m) for m in texts.values())} "
+          f"({len(texts)} distinct) in {len(targets)} file(s), time: {elapsed_ms:.0f} ms")
+    if args.json:
+        print(f"VERIFY: JSON report -> {args.json}")
+    if failed or clusters:
+        if clusters:
+            print(f"FAIL:   Near-duplicate clusters: {len(clusters)} "
+                  f"({sum(len(c[1]) for c in clusters)} texts)")
+        if failed:
+            print(f"FAIL:   Unreadable decks: {', '.join(failed)}")
+        print("=====================================================")
+        sys.exit(1)
+    print("VERIFY: No near-duplicate texts. Nothing to review.")
+    print("=====================================================")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+"""
+deck_backup.py
+
+Shared backup store for every script that rewrites a deck or glossary
+(update_deck.py, migrate_modal_links_qualified.py,
+migrate_glossary_add_description.py, remove_categories.py).
+
+Instead of a full timestamped copy per run, each backup is a snapshot:
+    - the file's bytes are cut into card-level chunks (one chunk per card
+      object in an indent=2 deck, one per entry in a glossary);
+    - chunks are keyed by content hash and stored zlib-compressed, once, in
+      append-only pack files;
+    - a snapshot is a small gzipped manifest listing its chunk hashes plus the
+      sha256 of the whole file, so `restore` rebuilds the exact original bytes
+      and verifies them.
+Editing one card costs one compressed card plus one manifest. Backing up an
+unchanged file is a no-op.
+
+Layout (created next to the file being backed up, as before):
+    <dir>/backups/index.json                   chunk hash -> [pack, offset, length]
+    <dir>/backups/packs/<ts>_<file>.pack       concatenated zlib chunks
+    <dir>/backups/snapshots/<file>/<ts>.json.gz
+
+Retention: after every snapshot only the newest DEFAULT_KEEP_LAST snapshots of
+that file are kept; chunks no longer referenced are garbage-collected.
+
+Usage:
+    py deck_backup.py list [deck]
+    py deck_backup.py restore <deck> <timestamp> [--output PATH]
+    py deck_backup.py prune [--keep N] [--days D]
+    py deck_backup.py import-legacy [--delete]   (convert old <ts>_<file> copies)
+
+<deck> is a file name (dummy.json), a bare name (dummy) or a path. Shard files
+of a sharded deck are listed as <name>.deck__<file> (e.g.
+common_meeting.deck__chunk_003.json).
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'public', 'data')
+GLOSSARY_DIR = os.path.join(DATA_DIR, 'glossary')
+
+BACKUP_DIR_NAME = 'backups'
+DEFAULT_KEEP_LAST = 30
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+
+# A chunk starts at every line that opens a top-level card/entry object:
+# "    {" inside an indent=2 "cards" array, or '  "key": {' in a glossary.
+CHUNK_START_RE = re.compile(rb'^(?: {4}\{| {2}"[^"\n]*": \{)\s*$', re.MULTILINE)
+# 16 hex chars of sha256 is plenty to tell chunks of one store apart; the full
+# sha256 of the rebuilt file is still checked on restore.
+CHUNK_ID_LEN = 16
+LEGACY_RE = re.compile(r'^(\d{8}_\d{6})_(.+\.json)$')
+
+
+# Files inside a sharded deck (see deck_shards.py) are backed up into the
+# store of the folder holding the .deck directory, as "<dir>__<file>".
+SHARD_DIR_SUFFIX = '.deck'
+SHARD_NAME_SEP = '__'
+
+
+def _owner_dir(path):
+    folder = os.path.dirname(os.path.abspath(path))
+    if folder.endswith(SHARD_DIR_SUFFIX):
+        return os.path.dirname(folder)
+    return folder
+
+
+def backup_dir_for(path):
+    return os.path.join(_owner_dir(path), BACKUP_DIR_NAME)
+
+
+def snapshot_name(path):
+    folder = os.path.dirname(os.path.abspath(path))
+    if folder.endswith(SHARD_DIR_SUFFIX):
+        return os.path.basename(folder) + SHARD_NAME_SEP + os.path.basename(path)
+    return os.path.basename(path)
+
+
+def original_path(folder, file_name):
+    """Inverse of snapshot_name: where a snapshot of `file_name` restores to."""
+    shard_dir, sep, inner = file_name.partition(SHARD_NAME_SEP)
+    if sep and shard_dir.endswith(SHARD_DIR_SUFFIX):
+        return os.path.join(folder, shard_dir, inner)
+    return os.path.join(folder, file_name)
+
+
+def split_chunks(data):
+    """Cut bytes at card/entry boundaries. b''.join(chunks) == data, always."""
+    starts = [m.start() for m in CHUNK_START_RE.finditer(data)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return [data[a:b] for a, b in zip(starts, starts[1:] + [len(data)])]
+
+
+def chunk_id(chunk):
+    return hashlib.sha256(chunk).hexdigest()[:CHUNK_ID_LEN]
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# --- Store primitives ---
+
+def _load_index(store):
+    try:
+        with open(os.path.join(store, 'index.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_index(store, index):
+    data = json.dumps(index, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    _write_atomic(os.path.join(store, 'index.json'), data)
+
+
+def _snapshot_dir(store, file_name):
+    return os.path.join(store, 'snapshots', file_name)
+
+
+def _read_manifest(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_pack(store, pack_name, chunks, index):
+    """Append-only pack of zlib chunks; records each chunk's span in index."""
+    blob = bytearray()
+    for cid, chunk in chunks:
+        compressed = zlib.compress(chunk, 9)
+        index[cid] = [pack_name, len(blob), len(compressed)]
+        blob += compressed
+    _write_atomic(os.path.join(store, 'packs', pack_name), bytes(blob))
+    return len(blob)
+
+
+def _read_chunk(store, index, cid, pack_cache):
+    pack_name, offset, length = index[cid]
+    if pack_name not in pack_cache:
+        with open(os.path.join(store, 'packs', pack_name), 'rb') as f:
+            pack_cache[pack_name] = f.read()
+    return zlib.decompress(pack_cache[pack_name][offset:offset + length])
+
+
+def list_snapshots(store, file_name=None):
+    """Return {file_name: [timestamp, ...]} sorted oldest first."""
+    root = os.path.join(store, 'snapshots')
+    if not os.path.isdir(root):
+        return {}
+    names = [file_name] if file_name else sorted(os.listdir(root))
+    found = {}
+    for name in names:
+        folder = os.path.join(root, name)
+        if not os.path.isdir(folder):
+            continue
+        stamps = sorted(f[:-len('.json.gz')] for f in os.listdir(folder)
+                        if f.endswith('.json.gz'))
+        if stamps:
+            found[name] = stamps
+    return found
+
+
+# --- Public API used by the writer scripts ---
+
+def snapshot(path, source=None, timestamp=None, keep_last=DEFAULT_KEEP_LAST, data=None):
+    """
+    Back up `path` into its store and return (timestamp, new_bytes_stored).
+    If the newest snapshot already has identical content nothing is written
+    and that snapshot's timestamp is returned with 0 new bytes.
+    """
+    if data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+    store = backup_dir_for(path)
+    file_name = snapshot_name(path)
+    digest = hashlib.sha256(data).hexdigest()
+
+    existing = list_snapshots(store, file_name).get(file_name, [])
+    if existing:
+        latest = _read_manifest(os.path.join(_snapshot_dir(store, file_name),
+                                             existing[-1] + '.json.gz'))
+        if latest['sha256'] == digest:
+            return existing[-1], 0
+
+    ts = timestamp or datetime.now().strftime(TIMESTAMP_FORMAT)
+    base_ts, n = ts, 1
+    while ts in existing:
+        n += 1
+        ts = f'{base_ts}_{n}'
+
+    index = _load_index(store)
+    chunks = split_chunks(data)
+    ids = [chunk_id(c) for c in chunks]
+    new_chunks = {}
+    for cid, chunk in zip(ids, chunks):
+        if cid not in index and cid not in new_chunks:
+            new_chunks[cid] = chunk
+
+    stored = 0
+    if new_chunks:
+        stored = _write_pack(store, f'{ts}_{file_name}.pack', new_chunks.items(), index)
+        _save_index(store, index)
+
+    manifest = {
+        'file': file_name,
+        'timestamp': ts,
+        'source': source,
+        'size': len(data),
+        'sha256': digest,
+        'chunks': ids,
+    }
+    manifest_bytes = gzip.compress(json.dumps(manifest, separators=(',', ':')).encode('utf-8'))
+    _write_atomic(os.path.join(_snapshot_dir(store, file_name), ts + '.json.gz'), manifest_bytes)
+    stored += len(manifest_bytes)
+
+    if keep_last:
+        prune(store, keep_last=keep_last, file_name=file_name)
+    return ts, stored
+
+
+def rebuild(store, file_name, timestamp):
+    """Return the exact original bytes of one snapshot (verified by sha256)."""
+    manifest = _read_manifest(os.path.join(_snapshot_dir(store, file_name), timestamp + '.json.gz'))
+    index = _load_index(store)
+    pack_cache = {}
+    data = b''.join(_read_chunk(store, index, cid, pack_cache) for cid in manifest['chunks'])
+    if hashlib.sha256(data).hexdigest() != manifest['sha256']:
+        raise ValueError(f"snapshot {file_name}@{timestamp} failed its sha256 check")
+    return data
+
+
+def prune(store, keep_last=None, keep_days=None, file_name=None):
+    """
+    Apply the retention policy, then drop chunks no snapshot references.
+    A snapshot survives if it is among the newest `keep_last` of its file OR
+    younger than `keep_days`. Returns the number of snapshots removed.
+    """
+    if keep_last is None and keep_days is None:
+        return 0
+    removed = 0
+    cutoff = (datetime.now() - timedelta(days=keep_days)).strftime(TIMESTAMP_FORMAT) \
+        if keep_days is not None else None
+    for name, stamps in list_snapshots(store, file_name).items():
+        for i, ts in enumerate(stamps):
+            if keep_last is not None and i >= len(stamps) - keep_last:
+                continue
+            if cutoff is not None and ts >= cutoff:
+                continue
+            os.remove(os.path.join(_snapshot_dir(store, name), ts + '.json.gz'))
+            removed += 1
+    if removed:
+        collect_garbage(store)
+    return removed
+
+
+def collect_garbage(store):
+    """Delete packs with no live chunks; repack packs that are mostly dead."""
+    live = set()
+    for name, stamps in list_snapshots(store).items():
+        for ts in stamps:
+            live.update(_read_manifest(os.path.join(_snapshot_dir(store, name),
+                                                    ts + '.json.gz'))['chunks'])
+
+    index = _load_index(store)
+    by_pack = {}
+    for cid, (pack_name, _offset, length) in index.items():
+        by_pack.setdefault(pack_name, []).append((cid, length))
+
+    pack_cache = {}
+    for pack_name, entries in by_pack.items():
+        live_entries = [cid for cid, _ in entries if cid in live]
+        dead_bytes = sum(length for cid, length in entries if cid not in live)
+        total_bytes = sum(length for _, length in entries)
+        if live_entries and dead_bytes * 2 < total_bytes:
+            continue
+        if live_entries:
+            chunks = [(cid, _read_chunk(store, index, cid, pack_cache)) for cid in live_entries]
+            _write_pack(store, 'gc_' + pack_name, chunks, index)
+        for cid, _ in entries:
+            if cid not in live:
+                del index[cid]
+        _save_index(store, index)
+        os.remove(os.path.join(store, 'packs', pack_name))
+        pack_cache.pop(pack_name, None)
+
+
+def store_size(store):
+    total = 0
+    for root, _dirs, files in os.walk(store):
+        for name in files:
+            if LEGACY_RE.match(name):
+                continue
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+# --- CLI ---
+
+def _known_stores():
+    return [os.path.join(DATA_DIR, BACKUP_DIR_NAME), os.path.join(GLOSSARY_DIR, BACKUP_DIR_NAME)]
+
+
+def _resolve_deck(deck):
+    """Return (store, file_name, original_path) for a CLI deck argument."""
+    file_name = os.path.basename(deck)
+    if not file_name.endswith('.json'):
+        file_name += '.json'
+    if os.path.dirname(deck):
+        path = os.path.abspath(deck if deck.endswith('.json') else deck + '.json')
+        return backup_dir_for(path), file_name, path
+    for folder in (DATA_DIR, GLOSSARY_DIR):
+        store = os.path.join(folder, BACKUP_DIR_NAME)
+        if file_name in list_snapshots(store, file_name):
+            return store, file_name, original_path(folder, file_name)
+    return os.path.join(DATA_DIR, BACKUP_DIR_NAME), file_name, original_path(DATA_DIR, file_name)
+
+
+def cmd_list(args):
+    stores = [_resolve_deck(args.deck)[0]] if args.deck else _known_stores()
+    file_name = _resolve_deck(args.deck)[1] if args.deck else None
+    for store in stores:
+        found = list_snapshots(store, file_name)
+        if not found:
+            continue
+        print(f"{os.path.relpath(store, BASE_DIR)}  ({store_size(store) / 1024:.1f} KB on disk)")
+        for name, stamps in found.items():
+            print(f"  {name}")
+            for ts in stamps:
+                manifest = _read_manifest(os.path.join(_snapshot_dir(store, name), ts + '.json.gz'))
+                source = manifest.get('source') or '-'
+                print(f"    {ts}  {manifest['size']:>9} bytes  {len(manifest['chunks']):>5} chunks  {source}")
+    return 0
+
+
+def cmd_restore(args):
+    store, file_name, original_path = _resolve_deck(args.deck)
+    stamps = list_snapshots(store, file_name).get(file_name, [])
+    matches = [ts for ts in stamps if ts.startswith(args.timestamp)]
+    if len(matches) != 1:
+        print(f"FAIL:   {len(matches)} snapshot(s) of {file_name} match '{args.timestamp}'. "
+              f"Use 'list {file_name}' to see them.")
+        return 1
+    data = rebuild(store, file_name, matches[0])
+    target = os.path.abspath(args.output) if args.output else original_path
+    if os.path.exists(target) and not args.output:
+        ts, _ = snapshot(target, source='deck_backup.restore')
+        print(f"DEBUG:  current {file_name} saved first as snapshot {ts}")
+    _write_atomic(target, data)
+    print(f"VERIFY: restored {file_name}@{matches[0]} -> {os.path.relpath(target, BASE_DIR)} "
+          f"({len(data)} bytes, sha256 verified)")
+    return 0
+
+
+def cmd_prune(args):
+    total = 0
+    for store in _known_stores():
+        total += prune(store, keep_last=args.keep, keep_days=args.days)
+    print(f"VERIFY: removed {total} snapshot(s).")
+    return 0
+
+
+def cmd_import_legacy(args):
+    """Fold old full-copy backups (<ts>_<file>.json) into the store."""
+    imported = 0
+    for store in _known_stores():
+        if not os.path.isdir(store):
+            continue
+        for name in sorted(os.listdir(store)):
+            match = LEGACY_RE.match(name)
+            if not match:
+                continue
+            ts, file_name = match.groups()
+            legacy_path = os.path.join(store, name)
+            with open(legacy_path, 'rb') as f:
+                data = f.read()
+            target = original_path(os.path.dirname(store), file_name)
+            snapshot(target, source='legacy', timestamp=ts, keep_last=None, data=data)
+            imported += 1
+            if args.delete:
+                os.remove(legacy_path)
+        print(f"{os.path.relpath(store, BASE_DIR)}: {store_size(store) / 1024:.1f} KB in the store")
+    print(f"VERIFY: imported {imported} legacy backup(s).")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Content-addressed deck/glossary backups.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('list', help="List snapshots (all files, or one deck).")
+    p.add_argument('deck', nargs='?')
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser('restore', help="Rebuild a snapshot's exact bytes.")
+    p.add_argument('deck')
+    p.add_argument('timestamp', help="Full timestamp or a unique prefix of it.")
+    p.add_argument('--output', help="Write here instead of over the original file.")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser('prune', help="Apply a retention policy to every store.")
+    p.add_argument('--keep', type=int, default=DEFAULT_KEEP_LAST,
+                   help=f"Newest snapshots kept per file (default {DEFAULT_KEEP_LAST}).")
+    p.add_argument('--days', type=int, help="Also keep anything younger than this.")
+    p.set_defaults(func=cmd_prune)
+
+    p = sub.add_parser('import-legacy', help="Convert old full-copy backups into snapshots.")
+    p.add_argument('--delete', action='store_true', help="Remove the old copies once imported.")
+    p.set_defaults(func=cmd_import_legacy)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
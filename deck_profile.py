@@ -0,0 +1,266 @@
+"""
+deck_profile.py
+
+Opt-in instrumentation shared by the deck scripts (check_deck_ids.py,
+update_deck.py, migrate.py, migrate_modal_links_qualified.py,
+migrate_glossary_add_description.py, remove_categories.py). It answers
+"where did the time go": parsing, the uniqueness pass, backups or json.dump.
+
+    with deck_profile.phase('parse', path):     per-phase wall time
+        ...
+    deck_profile.count(path, bytes_read=n, cards=m)   per-file counters
+
+Every script takes the same flags (add_arguments / start):
+    --profile                 print a per-phase / per-file table at exit
+    --profile-memory          also trace allocations (tracemalloc) and report
+                              the peak per phase; slows the run down 2-3x,
+                              so its timings are not comparable
+    --profile-out trace.json  write a Chrome trace-event file (open it in
+                              chrome://tracing or https://ui.perfetto.dev)
+Any of them turns profiling on. Off (the default), phase() hands back one
+shared no-op context manager and count() returns at once: no clock reads,
+no allocation.
+
+Work done in a process pool is profiled too: submit() wraps the call so the
+worker records its own phases and ships them back with the result; result()
+merges them. Worker events keep their pid, so they get their own track in the
+trace. Timestamps come from time.perf_counter(), which is one system-wide
+monotonic clock on Linux, macOS and Windows.
+
+The report is printed when the process exits (atexit), so scripts that end
+with sys.exit() still get it.
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+try:
+    import tracemalloc
+except ImportError:  # some embedded builds ship without it
+    tracemalloc = None
+
+_NULL = contextlib.nullcontext()
+_state = None
+
+
+class _Profile:
+    def __init__(self, origin, memory, out_path=None, label=None):
+        self.origin = origin
+        self.memory = memory and tracemalloc is not None
+        self.out_path = out_path
+        self.label = label or os.path.basename(sys.argv[0]) or 'python'
+        self.events = []
+        # (phase name) -> [calls, seconds, max seconds, peak bytes]
+        self.phases = defaultdict(lambda: [0, 0.0, 0.0, 0])
+        self.files = defaultdict(lambda: defaultdict(int))
+        self.peaks = []  # open phases: highest peak seen inside each
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def add_phase(self, name, seconds, peak):
+        entry = self.phases[name]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3] = max(entry[3], peak)
+
+    def merge(self, shipped):
+        events, phases, files = shipped
+        self.events.extend(events)
+        for name, (calls, seconds, longest, peak) in phases.items():
+            entry = self.phases[name]
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] = max(entry[2], longest)
+            entry[3] = max(entry[3], peak)
+        for path, counters in files.items():
+            for key, value in counters.items():
+                self.files[path][key] += value
+
+    def ship(self):
+        return (self.events, {k: list(v) for k, v in self.phases.items()},
+                {k: dict(v) for k, v in self.files.items()})
+
+
+def enabled():
+    return _state is not None
+
+
+def start(args=None, memory=False, out_path=None):
+    """Turn profiling on, from parsed add_arguments() flags or explicitly.
+    No-op (returns False) when none of the flags is set."""
+    global _state
+    if args is not None:
+        memory = memory or getattr(args, 'profile_memory', False)
+        out_path = out_path or getattr(args, 'profile_out', None)
+        if not (getattr(args, 'profile', False) or memory or out_path):
+            return False
+    if _state is None:
+        _state = _Profile(time.perf_counter(), memory, out_path)
+        atexit.register(finish)
+    return True
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', action='store_true',
+                       help="Print per-phase timings and per-file byte/card counters at exit.")
+    group.add_argument('--profile-memory', action='store_true',
+                       help="Also report the tracemalloc peak per phase (slower; implies --profile).")
+    group.add_argument('--profile-out', metavar='TRACE_JSON',
+                       help="Write a Chrome trace-event file (implies --profile).")
+
+
+class _Phase:
+    __slots__ = ('name', 'path', 'started')
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+
+    def __enter__(self):
+        if _state.memory:
+            _current, peak = tracemalloc.get_traced_memory()
+            if _state.peaks:
+                _state.peaks[-1] = max(_state.peaks[-1], peak)
+            _state.peaks.append(0)
+            tracemalloc.reset_peak()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ended = time.perf_counter()
+        peak = 0
+        if _state.memory:
+            peak = max(_state.peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if _state.peaks:
+                _state.peaks[-1] = max(_state.peaks[-1], peak)
+        seconds = ended - self.started
+        _state.add_phase(self.name, seconds, peak)
+        event = {'name': self.name, 'cat': 'phase', 'ph': 'X', 'pid': os.getpid(),
+                 'tid': threading.get_ident(), 'ts': round((self.started - _state.origin) * 1e6, 1),
+                 'dur': round(seconds * 1e6, 1)}
+        args = {}
+        if self.path:
+            args['file'] = os.path.basename(self.path)
+        if peak:
+            args['peak_kb'] = peak // 1024
+        if args:
+            event['args'] = args
+        _state.events.append(event)
+        return False
+
+
+def phase(name, path=None):
+    """Context manager timing one phase; `path` labels the event with its file."""
+    if _state is None:
+        return _NULL
+    return _Phase(name, path)
+
+
+def count(path, **amounts):
+    """Add to a file's counters, e.g. count(path, bytes_read=n, cards=m)."""
+    if _state is None:
+        return
+    counters = _state.files[os.path.basename(path) if path else '(all)']
+    for key, value in amounts.items():
+        counters[key] += value
+
+
+# --- Process pools ---
+
+def _run_in_worker(origin, memory, fn, args):
+    global _state
+    _state = _Profile(origin, memory)
+    try:
+        return fn(*args), _state.ship()
+    finally:
+        if _state.memory:
+            tracemalloc.stop()
+        _state = None
+
+
+def submit(pool, fn, *args):
+    """pool.submit(fn, *args); when profiling, the worker is profiled too."""
+    if _state is None:
+        return pool.submit(fn, *args)
+    return pool.submit(_run_in_worker, _state.origin, _state.memory, fn, args)
+
+
+def result(future):
+    """future.result() for a future from submit(), merging worker events."""
+    value = future.result()
+    if _state is None:
+        return value
+    value, shipped = value
+    _state.merge(shipped)
+    return value
+
+
+# --- Report ---
+
+def _trace(state, wall_us):
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'args': {'name': state.label}}]
+    for pid in sorted({e['pid'] for e in state.events} - {os.getpid()}):
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                       'args': {'name': f'{state.label} worker {pid}'}})
+    events.append({'name': state.label, 'cat': 'run', 'ph': 'X', 'pid': os.getpid(),
+                   'tid': threading.get_ident(), 'ts': 0, 'dur': round(wall_us, 1),
+                   'args': {'argv': sys.argv[1:]}})
+    events.extend(sorted(state.events, key=lambda e: e['ts']))
+    return {'traceEvents': events, 'displayTimeUnit': 'ms',
+            'otherData': {'files': {k: dict(v) for k, v in state.files.items()}}}
+
+
+def _size(n):
+    return f'{n / 1024:.0f} KB' if n < 10 * 1024 * 1024 else f'{n / 1024 / 1024:.1f} MB'
+
+
+def finish():
+    """Print the report and write the trace; called at exit by start()."""
+    global _state
+    state = _state
+    if state is None:
+        return
+    _state = None
+    wall = time.perf_counter() - state.origin
+
+    print("")
+    print("=====================================================")
+    print(f"=== PROFILE: {state.label:<37}===")
+    print("=====================================================")
+    print(f"DEBUG:  {'phase':<20} {'calls':>6} {'total':>10} {'share':>6} {'max':>9}"
+          + (f" {'peak mem':>10}" if state.memory else ''))
+    for name, (calls, seconds, longest, peak) in sorted(state.phases.items(), key=lambda kv: -kv[1][1]):
+        # Worker phases overlap in time, so shares can add up past 100%.
+        print(f"DEBUG:  {name:<20} {calls:>6} {seconds * 1000:>7.1f} ms {seconds / wall:>6.0%} "
+              f"{longest * 1000:>6.1f} ms" + (f" {_size(peak):>10}" if state.memory else ''))
+    if state.files:
+        keys = sorted({key for counters in state.files.values() for key in counters})
+        print("")
+        print(f"DEBUG:  {'file':<36}" + ''.join(f" {key:>13}" for key in keys))
+        for name, counters in sorted(state.files.items()):
+            print(f"DEBUG:  {name:<36}" + ''.join(
+                f" {(_size(counters[key]) if key.startswith('bytes') else counters[key]):>13}"
+                for key in keys))
+    if state.memory:
+        # Phases reset the tracemalloc peak, so the overall one is the max.
+        peak = max([entry[3] for entry in state.phases.values()] + [tracemalloc.get_traced_memory()[1]])
+        print(f"DEBUG:  tracemalloc peak (this process): {_size(peak)}")
+        tracemalloc.stop()
+    print(f"DEBUG:  wall time: {wall * 1000:.0f} ms")
+
+    if state.out_path:
+        try:
+            with open(state.out_path, 'w', encoding='utf-8') as f:
+                json.dump(_trace(state, wall * 1e6), f)
+            print(f"DEBUG:  Chrome trace written to {state.out_path}")
+        except OSError as e:
+            print(f"DEBUG:  Could not write trace {state.out_path} ({e})")
+    print("=====================================================")
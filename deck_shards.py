@@ -0,0 +1,294 @@
+"""
+deck_shards.py
+
+Sharded storage for very large decks (common_meeting.json: 1.5 MB, 1629
+cards). A sharded deck is a directory next to the other decks:
+
+    public/data/common_meeting.deck/
+        index.json       deck metadata + one light entry per card
+        chunk_000.json   {"cards": [...]}  full cards 0 .. chunkSize-1
+        chunk_001.json   ...
+
+index.json holds everything the deck list and the SRS scheduler need without
+downloading a single chunk:
+
+    {"format": "smartdeck-shards/1", "id": ..., "name": ..., "deckType": ...,
+     (every other top-level deck field except "cards"),
+     "chunkSize": 200, "chunks": ["chunk_000.json", ...],
+     "cards": [{"cardId": "mi_001", "chunk": 0, "sideA": "...", "preview": "..."}]}
+
+The heavy fields (sideB, note, content.value, options, ...) live only in the
+chunks and can be fetched lazily. Cards are assigned to chunks by position, so
+replacing a card rewrites only its own chunk (plus index.json when its sideA or
+preview changed).
+
+check_deck_ids.py and update_deck.py accept a .deck directory wherever they
+accept a deck file.
+
+Usage:
+    py deck_shards.py split common_meeting.json [--chunk-size 200] [--replace]
+    py deck_shards.py join common_meeting.deck [--replace]
+    py deck_shards.py info common_meeting.deck
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'public', 'data')
+
+SHARD_SUFFIX = '.deck'
+INDEX_NAME = 'index.json'
+FORMAT = 'smartdeck-shards/1'
+DEFAULT_CHUNK_SIZE = 200
+PREVIEW_LEN = 80
+
+
+def is_sharded(path):
+    # The suffix matters: a backup store (public/data/backups) has an
+    # index.json too.
+    return (path.rstrip('/\\').endswith(SHARD_SUFFIX) and os.path.isdir(path)
+            and os.path.isfile(os.path.join(path, INDEX_NAME)))
+
+
+def chunk_name(number):
+    return f'chunk_{number:03d}.json'
+
+
+def _dump(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _short(text):
+    text = ' '.join(str(text).split())
+    return text if len(text) <= PREVIEW_LEN else text[:PREVIEW_LEN - 3] + '...'
+
+
+def card_summary(card, chunk):
+    """The light index entry for one card, whatever its deckType."""
+    if not isinstance(card, dict):
+        return {'cardId': None, 'chunk': chunk, 'sideA': '', 'preview': ''}
+    side_a = card.get('sideA') or card.get('question')
+    parts = card.get('sentenceParts')
+    if side_a is None and isinstance(parts, dict):
+        side_a = f"{parts.get('prefix', '')}___{parts.get('suffix', '')}"
+    preview = ''
+    side_b = card.get('sideB')
+    if isinstance(side_b, list) and side_b and isinstance(side_b[0], dict):
+        preview = side_b[0].get('text', '')
+    elif card.get('correctAnswer'):
+        preview = card['correctAnswer']
+    return {'cardId': card.get('cardId'), 'chunk': chunk,
+            'sideA': _short(side_a or ''), 'preview': _short(preview)}
+
+
+# --- Read ---
+
+def load_index(deck_dir):
+    with open(os.path.join(deck_dir, INDEX_NAME), 'r', encoding='utf-8-sig') as f:
+        index = json.load(f)
+    if index.get('format') != FORMAT:
+        raise ValueError(f"unsupported shard format {index.get('format')!r}")
+    return index
+
+
+def load_chunk(deck_dir, name):
+    with open(os.path.join(deck_dir, name), 'r', encoding='utf-8-sig') as f:
+        chunk = json.load(f)
+    if not isinstance(chunk, dict) or not isinstance(chunk.get('cards'), list):
+        raise ValueError(f"{name} has no 'cards' list")
+    return chunk['cards']
+
+
+def load_sharded(deck_dir):
+    """Reassemble the full deck dict. Raises ValueError if index and chunks disagree."""
+    index = load_index(deck_dir)
+    cards = []
+    for name in index['chunks']:
+        cards.extend(load_chunk(deck_dir, name))
+    entries = index.get('cards', [])
+    if len(entries) != len(cards):
+        raise ValueError(f"index lists {len(entries)} cards but the chunks hold {len(cards)}")
+    for position, (entry, card) in enumerate(zip(entries, cards)):
+        card_id = card.get('cardId') if isinstance(card, dict) else None
+        if entry.get('cardId') != card_id or entry.get('chunk') != position // index['chunkSize']:
+            raise ValueError(f"index out of sync with chunks at card #{position + 1} "
+                             f"({entry.get('cardId')!r} vs {card_id!r})")
+    deck = {k: v for k, v in index.items() if k not in ('format', 'chunkSize', 'chunks', 'cards')}
+    deck['cards'] = cards
+    return deck
+
+
+def shard_files(deck_dir):
+    """index.json + every chunk file, in a stable order."""
+    index = load_index(deck_dir)
+    return [os.path.join(deck_dir, INDEX_NAME)] + [os.path.join(deck_dir, n) for n in index['chunks']]
+
+
+def stat_signature(deck_dir):
+    """(total size, newest mtime_ns) over the shard files, for cache keys."""
+    size, mtime_ns = 0, 0
+    for path in shard_files(deck_dir):
+        st = os.stat(path)
+        size += st.st_size
+        mtime_ns = max(mtime_ns, st.st_mtime_ns)
+    return size, mtime_ns
+
+
+def digest(deck_dir):
+    h = hashlib.sha1()
+    for path in shard_files(deck_dir):
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+# --- Write ---
+
+def write_sharded(deck, deck_dir, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write a whole deck as shards (used by split)."""
+    os.makedirs(deck_dir, exist_ok=True)
+    cards = deck['cards']
+    names = []
+    for number, start in enumerate(range(0, max(len(cards), 1), chunk_size)):
+        names.append(chunk_name(number))
+        _dump(os.path.join(deck_dir, names[-1]), {'cards': cards[start:start + chunk_size]})
+    index = {'format': FORMAT}
+    index.update({k: v for k, v in deck.items() if k != 'cards'})
+    index['chunkSize'] = chunk_size
+    index['chunks'] = names
+    index['cards'] = [card_summary(card, i // chunk_size) for i, card in enumerate(cards)]
+    _dump(os.path.join(deck_dir, INDEX_NAME), index)
+    # Drop chunks left over from a previous, larger split.
+    for name in os.listdir(deck_dir):
+        if name.startswith('chunk_') and name.endswith('.json') and name not in names:
+            os.remove(os.path.join(deck_dir, name))
+    return names
+
+
+def write_cards(deck_dir, deck, changed_positions, backup=None):
+    """
+    Persist in-place card replacements: rewrite only the chunks holding
+    `changed_positions` (0-based), and index.json only if an entry changed.
+    `backup(path)` is called on every file before it is overwritten.
+    Returns the list of files written.
+    """
+    index = load_index(deck_dir)
+    size = index['chunkSize']
+    cards = deck['cards']
+    if len(cards) != len(index['cards']):
+        raise ValueError("card count changed; re-split the deck instead")
+
+    written = []
+    for number in sorted({p // size for p in changed_positions}):
+        path = os.path.join(deck_dir, index['chunks'][number])
+        if backup:
+            backup(path)
+        _dump(path, {'cards': cards[number * size:(number + 1) * size]})
+        written.append(path)
+
+    index_changed = False
+    for position in changed_positions:
+        entry = card_summary(cards[position], position // size)
+        if index['cards'][position] != entry:
+            index['cards'][position] = entry
+            index_changed = True
+    if index_changed:
+        path = os.path.join(deck_dir, INDEX_NAME)
+        if backup:
+            backup(path)
+        _dump(path, index)
+        written.append(path)
+    return written
+
+
+# --- CLI ---
+
+def _resolve(arg):
+    if os.path.exists(arg):
+        return os.path.abspath(arg)
+    return os.path.join(DATA_DIR, os.path.basename(arg))
+
+
+def cmd_split(args):
+    src = _resolve(args.deck)
+    with open(src, 'r', encoding='utf-8-sig') as f:
+        deck = json.load(f)
+    if not isinstance(deck, dict) or not isinstance(deck.get('cards'), list):
+        print(f"FAIL:   {args.deck} is not a deck")
+        return 1
+    deck_dir = os.path.splitext(src)[0] + SHARD_SUFFIX
+    names = write_sharded(deck, deck_dir, args.chunk_size)
+    index_size = os.path.getsize(os.path.join(deck_dir, INDEX_NAME))
+    print(f"VERIFY: {os.path.basename(src)} -> {os.path.relpath(deck_dir, BASE_DIR)}: "
+          f"{len(deck['cards'])} cards in {len(names)} chunk(s), index {index_size} bytes "
+          f"(source {os.path.getsize(src)} bytes)")
+    if load_sharded(deck_dir)['cards'] != deck['cards']:
+        print("FAIL:   round-trip mismatch; source left in place")
+        return 1
+    if args.replace:
+        os.remove(src)
+        print(f"DEBUG:  removed {os.path.basename(src)}")
+    else:
+        print("DEBUG:  source kept; remove it (or use --replace) before committing, "
+              "otherwise both copies share one deck id")
+    return 0
+
+
+def cmd_join(args):
+    deck_dir = _resolve(args.deck)
+    deck = load_sharded(deck_dir)
+    out = deck_dir[:-len(SHARD_SUFFIX)] + '.json'
+    _dump(out, deck)
+    print(f"VERIFY: {os.path.relpath(deck_dir, BASE_DIR)} -> {os.path.relpath(out, BASE_DIR)} "
+          f"({len(deck['cards'])} cards)")
+    if args.replace:
+        for path in shard_files(deck_dir):
+            os.remove(path)
+        if not os.listdir(deck_dir):
+            os.rmdir(deck_dir)
+    return 0
+
+
+def cmd_info(args):
+    deck_dir = _resolve(args.deck)
+    index = load_index(deck_dir)
+    print(f"{index.get('id')}  {index.get('name')}  ({index.get('deckType')})")
+    print(f"  {len(index['cards'])} cards, chunkSize {index['chunkSize']}, "
+          f"index {os.path.getsize(os.path.join(deck_dir, INDEX_NAME))} bytes")
+    for name in index['chunks']:
+        print(f"  {name}  {os.path.getsize(os.path.join(deck_dir, name)):>9} bytes")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split decks into card chunks with a light index.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('split', help="deck.json -> deck.deck/ (index + chunks)")
+    p.add_argument('deck')
+    p.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    p.add_argument('--replace', action='store_true', help="Delete the source JSON afterwards.")
+    p.set_defaults(func=cmd_split)
+
+    p = sub.add_parser('join', help="deck.deck/ -> deck.json")
+    p.add_argument('deck')
+    p.add_argument('--replace', action='store_true', help="Delete the shards afterwards.")
+    p.set_defaults(func=cmd_join)
+
+    p = sub.add_parser('info', help="Show a sharded deck's layout")
+    p.add_argument('deck')
+    p.set_defaults(func=cmd_info)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+deck_splice.py
+
+Span-level writer for plain deck files. Instead of re-serializing a whole deck
+(common_meeting.json: 1.5 MB) to change one card, read_deck() records the byte
+span of every card object while parsing (see deck_stream.py), and write_cards()
+splices only the changed cards' freshly serialized text into the file. Every
+other byte stays as it was, so formatting drift elsewhere in a file (a
+trailing space, a different indent) never shows up in the git diff.
+
+A changed card is serialized like json.dump(deck, indent=2,
+ensure_ascii=False) would, re-indented to the column its old text started at.
+
+write_cards() falls back to a full rewrite (json.dump, indent=2) when the
+spans can't be trusted:
+    - the file changed on disk since read_deck() (size / mtime);
+    - cards were added or removed, or a top-level field other than "cards"
+      changed;
+    - a changed card sits on a single line (not an indent=2 layout);
+    - verify=True and the spliced result doesn't reparse to the deck.
+
+As with deck_shards.write_cards, only `changed_positions` are written: a card
+edited in memory but not listed keeps its old text. verify=True catches that.
+
+Usage (dry check, nothing is written):
+    py deck_splice.py verify [deck.json ...]   -> re-splice every card and
+                                                  compare with a full dump
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import deck_stream
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'public', 'data')
+INDENT = 2
+
+
+def dump_deck(deck):
+    """The full serialization every writer in the repo uses."""
+    return json.dumps(deck, indent=INDENT, ensure_ascii=False).encode('utf-8')
+
+
+def _fields_key(deck):
+    return json.dumps({k: v for k, v in deck.items() if k != 'cards'}, ensure_ascii=False)
+
+
+def read_deck(path):
+    """Parse a deck file in one streaming pass. Returns (data, spans); spans
+    is None when the file has no top-level "cards" array."""
+    st = os.stat(path)
+    data, cards, card_spans = {}, [], []
+    streamed = False
+    for kind, key, start, end, value in deck_stream.iter_deck(path):
+        if kind == 'card':
+            cards.append(value)
+            card_spans.append((start, end))
+        elif kind == 'array':
+            data['cards'] = cards  # keeps the file's key order
+            streamed = True
+        elif kind == 'document':
+            return value, None
+        else:
+            data[key] = value
+    if not streamed:
+        return data, None
+    return data, {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                  'fields': _fields_key(data), 'cards': card_spans}
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix='.tmp_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def stale_reason(path, deck, spans):
+    """Why the spans can't be used for `deck` at `path` (None = usable)."""
+    if not spans or spans.get('cards') is None:
+        return 'no span index'
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 'file is gone'
+    if (st.st_size, st.st_mtime_ns) != (spans['size'], spans['mtime_ns']):
+        return 'file changed on disk since it was read'
+    if len(deck['cards']) != len(spans['cards']):
+        return 'cards were added or removed'
+    if _fields_key(deck) != spans['fields']:
+        return 'top-level fields changed'
+    return None
+
+
+def card_text(card, column):
+    """A card as json.dump(deck, indent=2) writes it, when it starts at `column`."""
+    text = json.dumps(card, indent=INDENT, ensure_ascii=False)
+    return text.replace('\n', '\n' + ' ' * column).encode('utf-8')
+
+
+def splice(raw, deck, changed_positions, spans):
+    """Return (new bytes, new card spans, None) or (None, None, reason)."""
+    texts = {}
+    for position in set(changed_positions):
+        start, end = spans['cards'][position]
+        line_start = raw.rfind(b'\n', 0, start) + 1
+        if b'\n' not in raw[start:end] or raw[line_start:start].strip(b' '):
+            return None, None, f'card #{position + 1} is not in indent={INDENT} layout'
+        texts[position] = card_text(deck['cards'][position], start - line_start)
+
+    pieces, new_spans = [], []
+    last, shift = 0, 0
+    for position, (start, end) in enumerate(spans['cards']):
+        text = texts.get(position)
+        if text is None:
+            new_spans.append((start + shift, end + shift))
+            continue
+        pieces += [raw[last:start], text]
+        last = end
+        new_spans.append((start + shift, start + shift + len(text)))
+        shift += len(text) - (end - start)
+    pieces.append(raw[last:])
+    return b''.join(pieces), new_spans, None
+
+
+def verify_bytes(data, deck):
+    """Return (reparses to the deck, byte-identical to a full dump)."""
+    try:
+        same = json.loads(data.decode('utf-8-sig')) == deck
+    except ValueError:
+        same = False
+    return same, data == dump_deck(deck)
+
+
+def write_cards(path, deck, changed_positions, spans, verify=False):
+    """
+    Persist the cards at `changed_positions` (0-based). Splices them in place
+    when the spans are usable, otherwise rewrites the whole file. Returns
+    (mode, note): mode is 'spliced' or 'rewritten', note says why / how much.
+    `spans` is updated so later writes in the same run can splice again.
+    """
+    reason = stale_reason(path, deck, spans)
+    if reason is None:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        data, new_spans, reason = splice(raw, deck, changed_positions, spans)
+    if reason is None and verify:
+        same, identical = verify_bytes(data, deck)
+        if not same:
+            reason = 'verify: the spliced file does not reparse to the deck'
+    if reason is None:
+        _write_atomic(path, data)
+        st = os.stat(path)
+        spans.update(size=st.st_size, mtime_ns=st.st_mtime_ns, cards=new_spans)
+        note = f"{len(set(changed_positions))} card(s) spliced"
+        if verify:
+            note += ", reparse OK, " + ("identical to a full dump" if identical else
+                                        "untouched bytes differ from a full dump (kept as is)")
+        return 'spliced', note
+
+    data = dump_deck(deck)
+    _write_atomic(path, data)
+    if spans is not None:
+        spans['cards'] = None  # offsets are meaningless after a full rewrite
+    return 'rewritten', reason
+
+
+# --- CLI ---
+
+def cmd_verify(paths):
+    """Splice every card of every deck in memory and check the result."""
+    failed = 0
+    for path in paths:
+        name = os.path.basename(path)
+        try:
+            deck, spans = read_deck(path)
+        except ValueError as e:
+            print(f"FAIL:   [ERROR]   {name} -> {e}")
+            failed += 1
+            continue
+        if spans is None:
+            continue
+        with open(path, 'rb') as f:
+            raw = f.read()
+        data, new_spans, reason = splice(raw, deck, range(len(deck['cards'])), spans)
+        if reason:
+            print(f"DEBUG:  [FULL]    {name:<36} would be rewritten: {reason}")
+            continue
+        same, identical = verify_bytes(data, deck)
+        if not same:
+            print(f"FAIL:   [VERIFY]  {name:<36} spliced result does not reparse to the deck")
+            failed += 1
+            continue
+        drifted = sum(raw[s:e] != data[ns:ne] for (s, e), (ns, ne) in zip(spans['cards'], new_spans))
+        print(f"VERIFY: [OK]      {name:<36} {len(deck['cards']):>5} cards, reparse OK, "
+              f"{drifted} card(s) not in canonical form, file "
+              f"{'==' if raw == dump_deck(deck) else '!='} full dump")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Span-level deck writer: dry verification.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('verify', help="Re-splice every card in memory and compare with a full dump.")
+    p.add_argument('decks', nargs='*', help="Deck files (default: every deck in public/data).")
+    args = parser.parse_args(argv)
+
+    paths = [d if os.path.exists(d) else os.path.join(DATA_DIR, os.path.basename(d)) for d in args.decks]
+    if not paths:
+        paths = [os.path.join(DATA_DIR, n) for n in sorted(os.listdir(DATA_DIR)) if n.endswith('.json')]
+    return cmd_verify(paths)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+deck_stream.py
+
+Incremental reader for deck JSON files: yields the cards of the top-level
+"cards" array one at a time, with their byte offset, without ever holding the
+whole document (or the whole card list) in memory. Peak memory is one read
+block plus the largest single card / top-level value, whatever the deck size.
+
+Stdlib only: the file is read in blocks and each card is decoded by json's C
+decoder (JSONDecoder.raw_decode) straight from the window, so values are
+validated exactly as json.load would validate them; only the few separators
+between top-level members and cards are handled in Python.
+
+    for kind, key, start, end, value in iter_deck(path):
+        kind == 'card'     key = 1-based position in "cards", value = the card
+        kind == 'array'    key = 'cards': the streamed array starts at `start`
+                           (`end` is None: the array is still being read)
+        kind == 'field'    any other top-level member (or a "cards" that is
+                           not an array), value decoded
+        kind == 'document' the file is valid JSON but not an object
+
+start / end are the byte span of the value in the file (end exclusive).
+Malformed JSON raises ValueError with the byte offset. One difference from
+json.load: a second "cards" member is an error here (json.load keeps the last).
+
+Used by check_deck_ids.py and deck_splice.py.
+"""
+
+import json
+import re
+
+BLOCK_SIZE = 1 << 16
+BOM = b'\xef\xbb\xbf'
+
+NON_WS_RE = re.compile(r'[^ \t\n\r]')
+# A decode error this close to the end of the buffer may just mean the value
+# continues in the next block.
+TAIL_MARGIN = 16
+
+
+class _Reader:
+    """A sliding text window over a deck file. json's C raw_decode does the
+    parsing; the window only grows while one value straddles a refill.
+    Offsets handed out are absolute byte offsets in the file."""
+
+    def __init__(self, path, block_size):
+        with open(path, 'rb') as f:
+            bom = f.read(len(BOM)) == BOM
+        self.f = open(path, 'r', encoding='utf-8-sig', newline='')
+        self.block_size = block_size
+        self.decoder = json.JSONDecoder()
+        self.buf = self.f.read(block_size)
+        self.pos = 0
+        self.byte_pos = len(BOM) if bom else 0  # file offset of buf[pos]
+        self.eof = not self.buf
+
+    def close(self):
+        self.f.close()
+
+    def more(self):
+        data = self.f.read(self.block_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def advance(self, end):
+        self.byte_pos += len(self.buf[self.pos:end].encode('utf-8'))
+        self.pos = end
+
+    def error(self, message):
+        return ValueError(f"{message} at byte {self.byte_pos}")
+
+    def peek(self):
+        """Skip whitespace; return the next character, or '' at EOF."""
+        while True:
+            m = NON_WS_RE.search(self.buf, self.pos)
+            if m:
+                self.advance(m.start())
+                return self.buf[self.pos]
+            self.advance(len(self.buf))
+            if not self.more():
+                return ''
+
+    def expect(self, char, what):
+        if self.peek() != char:
+            raise self.error(f"Expecting {what}")
+        self.advance(self.pos + 1)
+
+    def value(self):
+        """Decode one JSON value at the cursor; return (start, end, value)
+        with start / end as absolute byte offsets."""
+        if not self.peek():
+            raise self.error("Expecting value")
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                truncated = e.pos >= len(self.buf) - TAIL_MARGIN or \
+                    e.msg.startswith('Unterminated string')
+                if truncated and not self.eof and self.more():
+                    continue
+                raise ValueError(f"{e.msg} at byte "
+                                 f"{self.byte_pos + len(self.buf[self.pos:e.pos].encode('utf-8'))}") from None
+            # A number near the end of the window may go on in the next block
+            # ("-250" of "-2500.0").
+            if end > len(self.buf) - TAIL_MARGIN and not self.eof and self.more():
+                continue
+            start = self.byte_pos
+            self.advance(end)
+            return start, self.byte_pos, value
+
+
+def iter_deck(path, block_size=BLOCK_SIZE):
+    """Yield (kind, key, start, end, value) events; see the module docstring."""
+    r = _Reader(path, block_size)
+    try:
+        if r.peek() != '{':
+            yield ('document', None) + r.value()
+        else:
+            r.advance(r.pos + 1)
+            streamed = False
+            if r.peek() == '}':
+                r.advance(r.pos + 1)
+            else:
+                while True:
+                    if r.peek() != '"':
+                        raise r.error("Expecting property name enclosed in double quotes")
+                    _start, _end, key = r.value()
+                    r.expect(':', "':' delimiter")
+                    if key == 'cards' and streamed:
+                        raise r.error("Duplicate 'cards' member")
+                    if key == 'cards' and r.peek() == '[':
+                        streamed = True
+                        yield 'array', key, r.byte_pos, None, None
+                        r.advance(r.pos + 1)
+                        position = 0
+                        if r.peek() == ']':
+                            r.advance(r.pos + 1)
+                        else:
+                            while True:
+                                position += 1
+                                yield ('card', position) + r.value()
+                                char = r.peek()
+                                if char == ']':
+                                    r.advance(r.pos + 1)
+                                    break
+                                if char != ',':
+                                    raise r.error("Expecting ',' delimiter")
+                                r.advance(r.pos + 1)
+                    else:
+                        yield ('field', key) + r.value()
+                    char = r.peek()
+                    if char == '}':
+                        r.advance(r.pos + 1)
+                        break
+                    if char != ',':
+                        raise r.error("Expecting ',' delimiter")
+                    r.advance(r.pos + 1)
+        if r.peek():
+            raise r.error("Extra data")
+    finally:
+        r.close()
@@ -0,0 +1,304 @@
+"""
+dedupe_audio.py
+
+Finds duplicated deck audio and, on request, folds it into a content-addressed
+shared store:
+
+    public/data/audio/_shared/<sha256[:16]>.mp3
+
+Two kinds of duplicates are reported:
+    - bytes: the same mp3 stored under several names (always safe to merge);
+    - text:  different recordings of the same normalized sentence (sideB /
+             conversation "text"), e.g. a phrase reused across cards or decks.
+
+Only files referenced by a deck are considered (unreferenced files are
+check_audio.py's [ORPHAN] report). Files are hashed in parallel threads.
+
+--apply merges every group into one shared file, rewrites every matching
+audioSrc in every deck (after a snapshot in the shared backup store, see
+deck_backup.py; only the touched cards are spliced in, see deck_splice.py)
+and removes the merged originals. Originals whose bytes differ
+from the shared file (--by text) are first moved under
+audio_backups/<timestamp>/, outside public/ so they are never deployed, next
+to a dedupe_log.json. The run ends with a check_deck_ids.py-style verification
+that every audio reference still resolves and every cardId is still unique.
+
+Usage:
+    py dedupe_audio.py                     -> report byte-identical duplicates
+    py dedupe_audio.py --by text           -> also same-sentence recordings
+    py dedupe_audio.py --apply [--by text]
+    py dedupe_audio.py --undo audio_backups/<timestamp>
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from check_audio import (SHARED_DIR, audit_deck, iter_audio_refs, rel_src,
+                         scan_audio_tree)
+from check_deck_ids import BASE_DIR, check_deck, load_deck, resolve_targets
+from deck_backup import original_path, rebuild
+from update_deck import read_deck_spans, save_deck_positions
+
+BACKUP_ROOT = os.path.join(BASE_DIR, 'audio_backups')
+LOG_NAME = 'dedupe_log.json'
+HASH_LEN = 16
+
+
+def normalize_text(text):
+    """Lowercase, strip accents and punctuation (apostrophes kept), squash spaces."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s']", ' ', text.lower().replace('’', "'"))
+    return ' '.join(text.split())
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return path, h.hexdigest()
+
+
+def hash_files(paths, threads):
+    """{abs path: sha256}. hashlib releases the GIL, so threads scale."""
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        return dict(pool.map(hash_file, sorted(paths)))
+
+
+def collect_refs(targets):
+    """Load every deck once, with the card spans deck_splice needs so --apply
+    rewrites only the touched cards. Returns (decks, spans, refs) where refs
+    is a list of (deck_path, abs audio path, text)."""
+    decks, spans, refs = {}, {}, []
+    for path in targets:
+        try:
+            deck, card_spans = read_deck_spans(path)
+        except (OSError, ValueError):
+            continue  # unreadable decks are reported by verify()
+        if not (isinstance(deck, dict) and isinstance(deck.get('cards'), list)):
+            continue
+        decks[path] = deck
+        spans[path] = card_spans
+        for card in deck['cards']:
+            if not isinstance(card, dict):
+                continue
+            for _json_path, src, text in iter_audio_refs(card):
+                abs_path = os.path.normpath(os.path.join(BASE_DIR, src))
+                refs.append((path, abs_path, text))
+    return decks, spans, refs
+
+
+def plan_groups(refs, hashes, by_text):
+    """
+    Decide a canonical content hash for every referenced file and return
+    {canonical hash: [member abs paths]} for groups of two or more files.
+    by_text merges recordings of the same sentence onto the most common hash
+    among them (ties: the hash of the first path in sort order).
+    """
+    canonical = {path: digest for path, digest in hashes.items()}
+    if by_text:
+        by_sentence = defaultdict(set)
+        for _deck, abs_path, text in refs:
+            if text and abs_path in hashes:
+                by_sentence[normalize_text(text)].add(abs_path)
+        for members in by_sentence.values():
+            if len(members) < 2:
+                continue
+            ordered = sorted(members)
+            counts = Counter(canonical[p] for p in ordered)
+            best = max(counts.values())
+            winner = next(canonical[p] for p in ordered if counts[canonical[p]] == best)
+            for p in ordered:
+                canonical[p] = winner
+
+    groups = defaultdict(list)
+    for path, digest in canonical.items():
+        groups[digest].append(path)
+    return {digest: sorted(paths) for digest, paths in groups.items() if len(paths) > 1}
+
+
+def shared_path(digest):
+    return os.path.join(SHARED_DIR, digest[:HASH_LEN] + '.mp3')
+
+
+def rewrite_audio_refs(node, mapping):
+    """Replace audioSrc values found in `mapping` in place; return the count."""
+    count = 0
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if isinstance(value, str) and key.lower().endswith('audiosrc') and value in mapping:
+                node[key] = mapping[value]
+                count += 1
+            elif isinstance(value, (dict, list)):
+                count += rewrite_audio_refs(value, mapping)
+    elif isinstance(node, list):
+        for value in node:
+            count += rewrite_audio_refs(value, mapping)
+    return count
+
+
+def apply_groups(groups, hashes, decks, spans):
+    """Materialize shared files, rewrite decks, remove originals. Returns the log."""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    backup_dir = os.path.join(BACKUP_ROOT, stamp)
+    os.makedirs(SHARED_DIR, exist_ok=True)
+
+    mapping, moved = {}, []
+    for digest, members in groups.items():
+        target = shared_path(digest)
+        if not os.path.exists(target):
+            source = next(p for p in members if hashes[p] == digest)
+            shutil.copy2(source, target)
+        for member in members:
+            mapping[rel_src(member)] = rel_src(target)
+            moved.append({'original': rel_src(member), 'shared': rel_src(target),
+                          'sha256': hashes[member],
+                          'backup': None if hashes[member] == digest else
+                          os.path.relpath(os.path.join(backup_dir, rel_src(member)), BASE_DIR)})
+
+    snapshots = []
+    for deck_path, deck in decks.items():
+        # Positions, not cardIds: a card without one, or sharing one with
+        # another card, still has its rewritten audioSrc written.
+        touched = [i for i, card in enumerate(deck['cards'])
+                   if isinstance(card, dict) and rewrite_audio_refs(card, mapping)]
+        if touched:
+            label = save_deck_positions(deck_path, deck, touched, source='dedupe_audio',
+                                        spans=spans[deck_path])
+            snapshots.extend(label.split(', '))
+            print(f"VERIFY: [REWROTE] {os.path.basename(deck_path):<36} {len(touched):>5} card(s)")
+
+    for entry in moved:
+        original = os.path.join(BASE_DIR, entry['original'])
+        if entry['backup']:
+            kept = os.path.join(BASE_DIR, entry['backup'])
+            os.makedirs(os.path.dirname(kept), exist_ok=True)
+            shutil.move(original, kept)
+        elif os.path.exists(original):
+            os.remove(original)
+
+    log = {'timestamp': stamp, 'deckSnapshots': snapshots, 'files': moved}
+    os.makedirs(backup_dir, exist_ok=True)
+    with open(os.path.join(backup_dir, LOG_NAME), 'w', encoding='utf-8') as f:
+        json.dump(log, f, indent=2, ensure_ascii=False)
+    print(f"DEBUG:  log + replaced originals: {os.path.relpath(backup_dir, BASE_DIR)}")
+    return log
+
+
+def verify(targets):
+    """check_deck_ids.py-style pass over the tree. Returns a list of failures;
+    run before and after --apply, so only problems the merge caused count."""
+    tree = scan_audio_tree(threads=16)
+    failures = []
+    for path in targets:
+        deck, error = load_deck(path)
+        if deck is None:
+            if error:
+                failures.append(f"{os.path.basename(path)}: {error}")
+            continue
+        duplicates, malformed = check_deck(deck)
+        _refs, missing, _naming = audit_deck(deck, tree)
+        if duplicates or malformed or missing:
+            failures.append(f"{os.path.basename(path)}: {len(duplicates)} dup, "
+                            f"{len(malformed)} malformed, {len(missing)} missing audio")
+    return failures
+
+
+def undo(backup_dir):
+    """Put every original file back and restore the deck snapshots."""
+    with open(os.path.join(backup_dir, LOG_NAME), 'r', encoding='utf-8') as f:
+        log = json.load(f)
+    for entry in log['files']:
+        original = os.path.join(BASE_DIR, entry['original'])
+        os.makedirs(os.path.dirname(original), exist_ok=True)
+        if entry['backup']:
+            shutil.move(os.path.join(BASE_DIR, entry['backup']), original)
+        else:
+            shutil.copy2(os.path.join(BASE_DIR, entry['shared']), original)
+    for label in log['deckSnapshots']:
+        file_name, _, stamp = label.rpartition('@')
+        target = original_path(os.path.join(BASE_DIR, 'public', 'data'), file_name)
+        data = rebuild(os.path.join(BASE_DIR, 'public', 'data', 'backups'), file_name, stamp)
+        with open(target, 'wb') as f:
+            f.write(data)
+        print(f"VERIFY: restored {file_name}@{stamp}")
+    print(f"VERIFY: {len(log['files'])} audio file(s) put back. Shared copies in "
+          f"{rel_src(SHARED_DIR)} are left for check_audio.py --strict to flag.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report and merge duplicated deck audio.")
+    parser.add_argument('--by', choices=('bytes', 'text'), default='bytes',
+                        help="bytes: identical files only; text: also same normalized sentence.")
+    parser.add_argument('--apply', action='store_true', help="Merge into audio/_shared and rewrite decks.")
+    parser.add_argument('--undo', metavar='BACKUP_DIR', help="Revert one --apply run.")
+    parser.add_argument('--threads', type=int, default=min(32, (os.cpu_count() or 1) * 4))
+    args = parser.parse_args(argv)
+
+    if args.undo:
+        undo(args.undo)
+        return 0
+
+    started = time.perf_counter()
+    targets, _scan_all = resolve_targets([])
+    decks, spans, refs = collect_refs(targets)
+    tree = scan_audio_tree(args.threads)
+    sizes = {os.path.join(folder, name): size
+             for folder, files in tree.items() for name, size in files.items()}
+    # Zero-byte files all share one hash but are broken recordings, not duplicates.
+    referenced = {abs_path for _deck, abs_path, _text in refs if sizes.get(abs_path)}
+    hashes = hash_files(referenced, args.threads)
+    hashed_ms = (time.perf_counter() - started) * 1000
+
+    groups = plan_groups(refs, hashes, args.by == 'text')
+    identical = sum(1 for members in groups.values() if len({hashes[p] for p in members}) == 1)
+    # Every group keeps exactly one file: the first member holding the canonical bytes.
+    reclaim = sum(sum(sizes[p] for p in members) - sizes[next(p for p in members if hashes[p] == d)]
+                  for d, members in groups.items())
+
+    print("=====================================================")
+    print("=== DECK AUDIO DEDUPLICATION                      ===")
+    print("=====================================================")
+    for digest, members in sorted(groups.items(), key=lambda kv: -len(kv[1]))[:15]:
+        kind = 'bytes' if len({hashes[p] for p in members}) == 1 else 'text '
+        print(f"  [{kind}] {digest[:HASH_LEN]}  {len(members)} files: "
+              f"{', '.join(rel_src(p).split('/audio/')[-1] for p in members[:3])}"
+              f"{' ...' if len(members) > 3 else ''}")
+    if len(groups) > 15:
+        print(f"  ... and {len(groups) - 15} more group(s)")
+    print("")
+    print(f"VERIFY: {len(referenced)} referenced files hashed in {hashed_ms:.0f} ms "
+          f"({sum(sizes[p] for p in referenced) / 1024 / 1024:.1f} MB)")
+    print(f"VERIFY: {len(groups)} duplicate group(s) ({identical} byte-identical), "
+          f"{sum(len(m) for m in groups.values())} files -> {len(groups)} shared")
+    print(f"VERIFY: Reclaimable: {reclaim / 1024 / 1024:.2f} MB")
+
+    if not args.apply or not groups:
+        if groups:
+            print("DEBUG:  Report only. Re-run with --apply to merge.")
+        return 0
+
+    baseline = set(verify(targets))
+    apply_groups(groups, hashes, decks, spans)
+    failures = [f for f in verify(targets) if f not in baseline]
+    for failure in failures:
+        print(f"FAIL:   {failure}")
+    if failures:
+        return 1
+    print("VERIFY: All cardIds unique and all audio references resolve.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,437 @@
+"""
+diff_deck.py
+
+Structural diff of two versions of a deck, aligned by cardId instead of by
+line, so reordered cards and re-indented files produce no noise.
+
+A version can be:
+    public/data/dummy.json          a file (or a sharded .deck directory)
+    dummy.json                      a bare name, resolved in public/data
+    dummy.json@20250101_120000      a snapshot in the backup store (a unique
+                                    timestamp prefix is enough; also @latest,
+                                    @-1 = latest, @-2 = the one before, ...),
+                                    i.e. the labels update_deck.py prints;
+                                    old full-copy backups/<ts>_<file> count
+                                    as snapshots too
+    HEAD~3:public/data/dummy.json   a git revision (git show); a bare name
+    HEAD~3:dummy.json               after the colon also resolves in public/data
+With a single version, it is compared with the current file of that deck;
+for a legacy copy like public/data/backups/20250101_120000_dummy.json that is
+public/data/dummy.json.
+
+How: both versions are indexed by cardId in one pass each. A card equal to
+its twin (one C-level == of the two parsed cards, cheaper than hashing both)
+is unchanged and never looked at again; the rest get a field-level diff.
+Lists (sideB variants, options, conversation) are aligned by item
+fingerprint (sha1 of the canonical JSON), so an inserted variant is one [+]
+line, not a cascade of changes. Reordering is reported as "moved" for the
+cards outside the longest run kept in order. Linear in the number of cards
+(plus an n log n pass for moves): 100k cards diff in about 1 s once parsed.
+
+Impacts, for the scripts that act on a diff:
+    audio.regenerate   clips whose spoken text changed (or that are new / got
+                       a new path): the text is the sibling "text", or the
+                       card field the audio key stands for (see
+                       analyze_audio.spoken_text)
+    audio.orphaned     clips no longer referenced by the new version
+    srs.reset          cards whose learned content changed (sideA, sideB,
+                       question, correctAnswer, options, sentenceParts): their
+                       smart-decks-v3-srs-<deckId> record no longer fits
+    srs.drop           removed cards: their SRS / metrics records are orphans
+    srs.new            added cards (no record yet)
+Only cosmetic fields changed (note, hint, category, content, ...) -> no SRS
+impact.
+
+Usage:
+    py diff_deck.py dummy.json@latest                 -> last backup vs now
+    py diff_deck.py HEAD:public/data/dummy.json       -> last commit vs now
+    py diff_deck.py old.json new.json --json -        -> machine-readable
+    py diff_deck.py dummy.json@-2 dummy.json@-1 --json diff.json
+
+Exit code, like diff: 0 = same cards, 1 = differences, 2 = a version could
+not be loaded.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from bisect import bisect_left
+
+import deck_backup
+import deck_shards
+from analyze_audio import spoken_text
+from check_audio import iter_audio_refs
+from check_deck_ids import BASE_DIR, DATA_DIR
+
+DIFF_FORMAT = 'smartdeck-deck-diff/1'
+# Fields whose change alters what the learner is graded on.
+SRS_FIELDS = {'sideA', 'sideB', 'question', 'correctAnswer', 'options', 'sentenceParts'}
+SHOW_CHARS = 70
+
+
+# --- Loading a version ---
+
+def _deck_path(name):
+    """A path as given, else a bare name inside public/data."""
+    candidate = name if os.path.isabs(name) else os.path.join(BASE_DIR, name)
+    if os.path.exists(candidate) or os.path.dirname(name):
+        return os.path.abspath(candidate)
+    return os.path.join(DATA_DIR, name if name.endswith(('.json', '.deck')) else name + '.json')
+
+
+def _legacy_copies(store, file_name):
+    """{timestamp: path} of the old full-copy backups <ts>_<file> of one file."""
+    copies = {}
+    if os.path.isdir(store):
+        for name in os.listdir(store):
+            match = deck_backup.LEGACY_RE.match(name)
+            if match and match.group(2) == file_name:
+                copies[match.group(1)] = os.path.join(store, name)
+    return copies
+
+
+def _current_path(path):
+    """The live deck a file stands for: a legacy backups/<ts>_<file> copy maps
+    back to <file> next to the backups folder; anything else is itself."""
+    store = os.path.dirname(path)
+    match = deck_backup.LEGACY_RE.match(os.path.basename(path))
+    if match and os.path.basename(store) == deck_backup.BACKUP_DIR_NAME:
+        return deck_backup.original_path(os.path.dirname(store), match.group(2))
+    return path
+
+
+def _load_backup(name, stamp):
+    path = _deck_path(name)
+    store = deck_backup.backup_dir_for(path)
+    file_name = deck_backup.snapshot_name(path)
+    snapshots = deck_backup.list_snapshots(store, file_name).get(file_name, [])
+    legacy = _legacy_copies(store, file_name)
+    stamps = sorted(set(snapshots) | set(legacy))
+    if stamp == 'latest':
+        stamp = '-1'
+    if stamp.lstrip('-').isdigit() and stamp.startswith('-'):
+        if len(stamps) < -int(stamp):
+            raise ValueError(f"{file_name} has {len(stamps)} snapshot(s), no {stamp}")
+        matches = [stamps[int(stamp)]]
+    else:
+        matches = [ts for ts in stamps if ts.startswith(stamp)]
+    if len(matches) != 1:
+        hint = (f"{len(legacy)} of its backups are legacy <ts>_{file_name} copies that list skips; "
+                f"py deck_backup.py import-legacy folds them in" if legacy else '')
+        raise ValueError(f"{len(matches)} snapshot(s) of {file_name} match '{stamp}' "
+                         f"(see: py deck_backup.py list {file_name}{'; ' + hint if hint else ''})")
+    if matches[0] in snapshots:
+        data = deck_backup.rebuild(store, file_name, matches[0])
+    else:
+        with open(legacy[matches[0]], 'rb') as f:
+            data = f.read()
+    return json.loads(data.decode('utf-8-sig')), f"{file_name}@{matches[0]}", path
+
+
+def _load_git(rev, name):
+    path = _deck_path(name)
+    rel = os.path.relpath(path, BASE_DIR).replace(os.sep, '/')
+    try:
+        shown = subprocess.run(['git', 'show', f'{rev}:{rel}'], cwd=BASE_DIR,
+                               capture_output=True, timeout=60)
+    except OSError as e:
+        raise ValueError(f"git is not available ({e})")
+    if shown.returncode != 0:
+        raise ValueError(shown.stderr.decode('utf-8', 'replace').strip() or f"git show {rev}:{rel} failed")
+    return json.loads(shown.stdout.decode('utf-8-sig')), f"{rev}:{rel}", path
+
+
+def load_version(spec):
+    """Return (deck, label, current path of that deck) for one version spec."""
+    path = _deck_path(spec)
+    if os.path.exists(path):
+        if deck_shards.is_sharded(path):
+            deck = deck_shards.load_sharded(path)
+        else:
+            with open(path, 'r', encoding='utf-8-sig') as f:
+                deck = json.load(f)
+        label = os.path.relpath(path, BASE_DIR).replace(os.sep, '/')
+        path = _current_path(path)
+    elif '@' in spec:
+        deck, label, path = _load_backup(*spec.rsplit('@', 1))
+    elif ':' in spec:
+        deck, label, path = _load_git(*spec.split(':', 1))
+    else:
+        raise ValueError(f"not found: {spec}")
+    if not isinstance(deck, dict) or not isinstance(deck.get('cards'), list):
+        raise ValueError(f"{label} is not a deck (no 'cards' array)")
+    return deck, label, path
+
+
+# --- Fingerprints ---
+
+def fingerprint(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, ensure_ascii=False,
+                                   separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def index_cards(cards):
+    """{key: (position, card)}. A repeated cardId is keyed 'id#2', 'id#3' ...
+    so it still lines up with its twin in the other version."""
+    index, seen = {}, defaultdict(int)
+    for position, card in enumerate(cards):
+        card_id = card.get('cardId') if isinstance(card, dict) else None
+        base = card_id if isinstance(card_id, str) and card_id else f'(no cardId #{position + 1})'
+        seen[base] += 1
+        key = base if seen[base] == 1 else f'{base}#{seen[base]}'
+        index[key] = (position, card)
+    return index
+
+
+# --- Field-level diff ---
+
+def diff_values(old, new, path=''):
+    """Yield {'path', 'change', 'old', 'new'} for every difference."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in list(old) + [k for k in new if k not in old]:
+            child = f'{path}.{key}' if path else key
+            if key not in new:
+                yield {'path': child, 'change': 'removed', 'old': old[key], 'new': None}
+            elif key not in old:
+                yield {'path': child, 'change': 'added', 'old': None, 'new': new[key]}
+            elif old[key] != new[key]:
+                yield from diff_values(old[key], new[key], child)
+    elif isinstance(old, list) and isinstance(new, list):
+        yield from diff_lists(old, new, path)
+    elif old != new:
+        yield {'path': path, 'change': 'changed', 'old': old, 'new': new}
+
+
+def diff_lists(old, new, path):
+    """Align items by fingerprint: identical items match wherever they moved;
+    what is left pairs up by index (edited in place) or is added / removed."""
+    pool = defaultdict(list)
+    for i, item in enumerate(old):
+        pool[fingerprint(item)].append(i)
+    matched_old, unmatched_new = set(), []
+    order = []
+    for j, item in enumerate(new):
+        spots = pool.get(fingerprint(item))
+        if spots:
+            i = spots.pop(0)
+            matched_old.add(i)
+            order.append(i)
+        else:
+            unmatched_new.append(j)
+    unmatched_old = [i for i in range(len(old)) if i not in matched_old]
+
+    leftover_old = set(unmatched_old)
+    for j in unmatched_new:
+        if j in leftover_old:
+            leftover_old.discard(j)
+            yield from diff_values(old[j], new[j], f'{path}[{j}]')
+        else:
+            yield {'path': f'{path}[{j}]', 'change': 'added', 'old': None, 'new': new[j]}
+    for i in sorted(leftover_old):
+        yield {'path': f'{path}[{i}]', 'change': 'removed', 'old': old[i], 'new': None}
+    if order != sorted(order):
+        yield {'path': path, 'change': 'reordered', 'old': None, 'new': None}
+
+
+def moved_keys(common, old_index, new_index):
+    """Cards outside the longest subsequence that kept its relative order."""
+    keys = sorted(common, key=lambda k: new_index[k][0])
+    seq = [old_index[k][0] for k in keys]
+    tails, tail_at, parent = [], [], [-1] * len(seq)
+    for i, value in enumerate(seq):
+        spot = bisect_left(tails, value)
+        if spot == len(tails):
+            tails.append(value)
+            tail_at.append(i)
+        else:
+            tails[spot] = value
+            tail_at[spot] = i
+        parent[i] = tail_at[spot - 1] if spot else -1
+    kept = set()
+    i = tail_at[-1] if tail_at else -1
+    while i >= 0:
+        kept.add(i)
+        i = parent[i]
+    return [keys[i] for i in range(len(keys)) if i not in kept]
+
+
+# --- Impacts ---
+
+def audio_refs(card):
+    """{src: spoken text} for every audio reference of a card."""
+    if not isinstance(card, dict):
+        return {}
+    return {src: spoken_text(card, json_path, text) for json_path, src, text in iter_audio_refs(card)}
+
+
+def diff_decks(old_deck, new_deck):
+    """The whole structural diff as a JSON-serialisable dict."""
+    old_index, new_index = index_cards(old_deck['cards']), index_cards(new_deck['cards'])
+    added = [k for k in new_index if k not in old_index]
+    removed = [k for k in old_index if k not in new_index]
+    common = [k for k in new_index if k in old_index]
+    modified = {}
+    for key in common:
+        if old_index[key][1] != new_index[key][1]:
+            modified[key] = list(diff_values(old_index[key][1], new_index[key][1]))
+    moved = moved_keys(common, old_index, new_index)
+
+    old_fields = {k: v for k, v in old_deck.items() if k != 'cards'}
+    new_fields = {k: v for k, v in new_deck.items() if k != 'cards'}
+
+    regenerate, orphaned = [], []
+    srs_reset = []
+    for key in added:
+        for src, text in audio_refs(new_index[key][1]).items():
+            regenerate.append({'cardId': key, 'src': src, 'text': text, 'reason': 'new card'})
+    for key in removed:
+        for src in audio_refs(old_index[key][1]):
+            orphaned.append({'cardId': key, 'src': src})
+    for key, changes in modified.items():
+        old_refs, new_refs = audio_refs(old_index[key][1]), audio_refs(new_index[key][1])
+        for src, text in new_refs.items():
+            if src not in old_refs:
+                regenerate.append({'cardId': key, 'src': src, 'text': text, 'reason': 'new audio path'})
+            elif old_refs[src] != text:
+                regenerate.append({'cardId': key, 'src': src, 'text': text, 'reason': 'text changed'})
+        for src in old_refs:
+            if src not in new_refs:
+                orphaned.append({'cardId': key, 'src': src})
+        if any(c['path'].split('.')[0].split('[')[0] in SRS_FIELDS for c in changes):
+            srs_reset.append(key)
+    if orphaned:
+        # A clip still used by another card of the new version is not an orphan.
+        still_used = {src for _pos, card in new_index.values() for src in audio_refs(card)}
+        orphaned = [o for o in orphaned if o['src'] not in still_used]
+
+    return {
+        'format': DIFF_FORMAT,
+        'summary': {'added': len(added), 'removed': len(removed), 'modified': len(modified),
+                    'moved': len(moved), 'unchanged': len(common) - len(modified)},
+        'deckFields': list(diff_values(old_fields, new_fields)),
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+        'moved': [{'cardId': k, 'from': old_index[k][0] + 1, 'to': new_index[k][0] + 1} for k in moved],
+        'audio': {'regenerate': regenerate, 'orphaned': orphaned},
+        'srs': {'reset': srs_reset, 'drop': removed, 'new': added},
+    }
+
+
+# --- Output ---
+
+def _show(value):
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    text = text.replace('\n', '\\n')
+    return repr(text[:SHOW_CHARS] + '...') if len(text) > SHOW_CHARS else repr(text)
+
+
+def _clip(old, new):
+    """For two long strings, just the part that differs (plus some context)."""
+    if not (isinstance(old, str) and isinstance(new, str)) or max(len(old), len(new)) <= SHOW_CHARS:
+        return old, new
+    start = 0
+    while start < min(len(old), len(new)) and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < min(len(old), len(new)) - start and old[-1 - end] == new[-1 - end]:
+        end += 1
+    context = 15
+    lo = max(0, start - context)
+    prefix = '...' if lo else ''
+    return (prefix + old[lo:len(old) - end + context] + ('...' if end > context else ''),
+            prefix + new[lo:len(new) - end + context] + ('...' if end > context else ''))
+
+
+def print_change(change, indent='            '):
+    kind, path = change['change'], change['path'] or '(value)'
+    if kind == 'changed':
+        old, new = _clip(change['old'], change['new'])
+        print(f"{indent}~ {path}: {_show(old)} -> {_show(new)}")
+    elif kind == 'added':
+        print(f"{indent}+ {path}: {_show(change['new'])}")
+    elif kind == 'removed':
+        print(f"{indent}- {path}: {_show(change['old'])}")
+    else:
+        print(f"{indent}= {path}: same items, new order")
+
+
+def print_diff(result, old_label, new_label, old_deck, new_deck, elapsed_ms):
+    print("=====================================================")
+    print("=== DECK DIFF (by cardId)                         ===")
+    print("=====================================================")
+    print(f"old: {old_label} ({old_deck.get('id')}, {len(old_deck['cards'])} cards)")
+    print(f"new: {new_label} ({new_deck.get('id')}, {len(new_deck['cards'])} cards)")
+    print("")
+    for change in result['deckFields']:
+        print_change(change, indent='DECK      ')
+    for key in result['added']:
+        print(f"ADDED     {key}")
+    for key in result['removed']:
+        print(f"REMOVED   {key}")
+    for key, changes in result['modified'].items():
+        print(f"MODIFIED  {key}")
+        for change in changes:
+            print_change(change)
+    for move in result['moved']:
+        print(f"MOVED     {move['cardId']} (#{move['from']} -> #{move['to']})")
+
+    audio, srs = result['audio'], result['srs']
+    if audio['regenerate'] or audio['orphaned'] or srs['reset']:
+        print("")
+    for item in audio['regenerate']:
+        print(f"AUDIO     regenerate {item['src']} ({item['reason']}) <- {_show(item['text'])}")
+    for item in audio['orphaned']:
+        print(f"AUDIO     orphaned   {item['src']}")
+    if srs['reset']:
+        print(f"SRS       reset: {', '.join(srs['reset'])}")
+
+    s = result['summary']
+    print("")
+    print("=====================================================")
+    print(f"VERIFY: {s['added']} added, {s['removed']} removed, {s['modified']} modified, "
+          f"{s['moved']} moved, {s['unchanged']} unchanged ({elapsed_ms:.0f} ms)")
+    print(f"VERIFY: audio to regenerate: {len(audio['regenerate'])}, orphaned: {len(audio['orphaned'])}; "
+          f"SRS to reset: {len(srs['reset'])}, to drop: {len(srs['drop'])}")
+    print("=====================================================")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Structural diff of two deck versions, by cardId.")
+    parser.add_argument('old', help="File, name@timestamp (backup) or rev:path (git).")
+    parser.add_argument('new', nargs='?', help="Same forms (default: the current file of OLD's deck).")
+    parser.add_argument('--json', metavar='PATH', help="Write the machine-readable diff ('-' = stdout).")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        old_deck, old_label, current_path = load_version(args.old)
+        new_deck, new_label, _path = load_version(args.new or current_path)
+    except (OSError, ValueError) as e:
+        print(f"FAIL:   {e}")
+        return 2
+    result = diff_decks(old_deck, new_deck)
+    result['old'] = {'source': old_label, 'deckId': old_deck.get('id'), 'cards': len(old_deck['cards'])}
+    result['new'] = {'source': new_label, 'deckId': new_deck.get('id'), 'cards': len(new_deck['cards'])}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if args.json == '-':
+        json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+        print("")
+    else:
+        print_diff(result, old_label, new_label, old_deck, new_deck, elapsed_ms)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+            print(f"VERIFY: Diff written to {args.json}")
+    s = result['summary']
+    return 1 if (s['added'] or s['removed'] or s['modified'] or s['moved'] or result['deckFields']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""
+migrate.py
+
+Single-pass migration engine. Each deck / glossary file is parsed once, the
+selected transforms run over it in order, and the file is written (after a
+snapshot in the shared backup store, see deck_backup.py) only if at least one
+transform changed something. In a deck only the changed cards are rewritten,
+spliced into the file as update_deck.py does (deck_splice.py); glossaries are
+re-serialized whole.
+
+Transforms are registered with @transform and must be idempotent: running one
+on an already-migrated file changes nothing. Registered today:
+
+    modal_links_qualified   decks     **[N]** -> **[er:N]** / **[pv:N]**
+                                      (rewrite_card from migrate_modal_links_qualified.py)
+    glossary_description    glossary  add `description: ""` to every entry
+                                      (migrate_glossary_add_description.py)
+    remove_categories       decks     drop card 'category' fields; scoped to
+                                      the file remove_categories.py targets
+
+A per-file record of applied migrations lives in .migrations_state.json
+(git-ignored), keyed by size + mtime + sha1 of the file as left by the engine.
+A file whose record already lists every selected transform, and whose bytes
+did not change since, is skipped without being parsed. Any edit to the file
+invalidates its record, and the (idempotent) chain simply runs again.
+
+Usage:
+    py migrate.py --list
+    py migrate.py                                  -> every transform
+    py migrate.py modal_links_qualified glossary_description
+    py migrate.py remove_categories --files dev_workflow.json
+    py migrate.py --dry-run --jobs 4 --force
+    py migrate.py --force --profile-out trace.json   -> per-phase timings +
+                                                        Chrome trace (see
+                                                        deck_profile.py)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import deck_profile
+import deck_splice
+from deck_backup import snapshot
+from migrate_glossary_add_description import add_description_to_entry
+from migrate_glossary_add_description import FILES as DESCRIPTION_FILES
+from migrate_modal_links_qualified import deck_alias, rewrite_card
+from remove_categories import strip_categories
+from remove_categories import target_file as CATEGORY_TARGET
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'public', 'data')
+GLOSSARY_DIR = os.path.join(DATA_DIR, 'glossary')
+STATE_PATH = os.path.join(BASE_DIR, '.migrations_state.json')
+
+SKIP_FILENAMES = {'deck_unlock_codes.json', 'glossary_manifest.json'}
+
+# name -> {'func': f(data) -> changes, 'kind': 'deck' | 'glossary', 'files': set | None}
+TRANSFORMS = {}
+
+
+def transform(name, kind, files=None):
+    """Register an idempotent transform. `files` limits it to those basenames
+    unless the user names files explicitly with --files."""
+    def register(func):
+        TRANSFORMS[name] = {'func': func, 'kind': kind,
+                            'files': set(files) if files else None,
+                            'doc': (func.__doc__ or '').strip()}
+        return func
+    return register
+
+
+@transform('modal_links_qualified', kind='deck')
+def qualify_modal_links(deck):
+    """Qualify **[N]** modal links with the deck's glossary alias."""
+    alias = deck_alias(deck.get('id'))
+    return sum(rewrite_card(card, alias) for card in deck['cards'] if isinstance(card, dict))
+
+
+@transform('glossary_description', kind='glossary', files=DESCRIPTION_FILES)
+def add_glossary_descriptions(glossary):
+    """Insert an empty internal `description` into every glossary entry."""
+    changed = 0
+    for key, entry in glossary.items():
+        if isinstance(entry, dict):
+            new_entry, was_changed = add_description_to_entry(entry)
+            if was_changed:
+                glossary[key] = new_entry  # same key, so file order is kept
+                changed += 1
+    return changed
+
+
+@transform('remove_categories', kind='deck', files=[os.path.basename(CATEGORY_TARGET)])
+def remove_card_categories(deck):
+    """Remove the 'category' field from every card."""
+    return strip_categories(deck['cards'])
+
+
+# --- State ---
+
+def load_state():
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def fingerprint(path, data=None):
+    st = os.stat(path)
+    if data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+            'sha1': hashlib.sha1(data).hexdigest()}
+
+
+def is_up_to_date(path, record, names):
+    """True if `record` already covers `names` and the file is unchanged."""
+    if not record or not set(names) <= set(record.get('applied', [])):
+        return False
+    st = os.stat(path)
+    if st.st_size != record['size']:
+        return False
+    if st.st_mtime_ns == record['mtime_ns']:
+        return True
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest() == record['sha1']
+
+
+# --- Engine ---
+
+def write_atomic(path, data):
+    """Write via a temp file + os.replace, so a crash never leaves half a file."""
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def plan(selected, explicit_files):
+    """Return [(path, kind, [transform names])] for every file with work."""
+    candidates = []
+    for folder, kind in ((DATA_DIR, 'deck'), (GLOSSARY_DIR, 'glossary')):
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if name.endswith('.json') and name not in SKIP_FILENAMES and os.path.isfile(path):
+                candidates.append((path, kind))
+
+    jobs = []
+    for path, kind in candidates:
+        name = os.path.basename(path)
+        if explicit_files and name not in explicit_files:
+            continue
+        chain = [t for t in selected
+                 if TRANSFORMS[t]['kind'] == kind
+                 and (explicit_files or TRANSFORMS[t]['files'] is None
+                      or name in TRANSFORMS[t]['files'])]
+        if chain:
+            jobs.append((path, kind, chain))
+    return jobs
+
+
+def _card_texts(deck):
+    return [json.dumps(card, ensure_ascii=False) for card in deck['cards']]
+
+
+def serialize_deck(path, deck, before, spans):
+    """New file bytes for a transformed deck: the changed cards spliced into
+    the original text, or a full dump when the spans can't be used.
+    Returns (bytes, note)."""
+    after = _card_texts(deck)
+    changed = [i for i, (old, new) in enumerate(zip(before, after)) if old != new]
+    reason = deck_splice.stale_reason(path, deck, spans)
+    if reason is None:
+        with open(path, 'rb') as f:
+            data, _spans, reason = deck_splice.splice(f.read(), deck, changed, spans)
+        if reason is None:
+            return data, f'{len(changed)} card(s) spliced'
+    return deck_splice.dump_deck(deck), f'rewritten: {reason}'
+
+
+def run_chain(path, kind, chain):
+    """Parse once, run every transform, re-serialize only if something changed.
+    Returns (counts, new_bytes_or_None, error, write note). Runs inside the
+    process pool, so it never writes: the parent backs up and writes serially."""
+    spans = None
+    try:
+        with deck_profile.phase('parse', path):
+            if kind == 'deck':
+                data, spans = deck_splice.read_deck(path)
+            else:
+                with open(path, 'r', encoding='utf-8-sig') as f:
+                    data = json.load(f)
+    except Exception as e:
+        return {}, None, f'parse error: {e}', None
+    if deck_profile.enabled():
+        deck_profile.count(path, bytes_read=os.path.getsize(path))
+
+    if kind == 'deck' and not (isinstance(data, dict) and isinstance(data.get('cards'), list)):
+        return {}, None, None, None  # not a deck file
+    if kind == 'glossary' and not isinstance(data, dict):
+        return {}, None, 'not a dict', None
+
+    before = _card_texts(data) if kind == 'deck' else None
+    counts = {}
+    for name in chain:
+        with deck_profile.phase(name, path):
+            counts[name] = TRANSFORMS[name]['func'](data)
+    if not any(counts.values()):
+        return counts, None, None, None
+    with deck_profile.phase('serialize', path):
+        if kind == 'deck':
+            new_bytes, note = serialize_deck(path, data, before, spans)
+        else:
+            new_bytes, note = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'), 'rewritten'
+    return counts, new_bytes, None, note
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run registered deck/glossary migrations in one pass.")
+    parser.add_argument('transforms', nargs='*', help="Transforms to run (default: all).")
+    parser.add_argument('--list', action='store_true', help="List registered transforms.")
+    parser.add_argument('--files', nargs='+', help="Only these file names (overrides transform scoping).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--dry-run', action='store_true', help="Report changes without writing.")
+    parser.add_argument('--force', action='store_true', help="Ignore the applied-migrations record.")
+    deck_profile.add_arguments(parser)
+    args = parser.parse_args(argv)
+    deck_profile.start(args)
+
+    if args.list:
+        for name, info in TRANSFORMS.items():
+            scope = ', '.join(sorted(info['files'])) if info['files'] else 'all'
+            print(f"{name:<24} {info['kind']:<9} files: {scope:<36} {info['doc']}")
+        return 0
+
+    selected = args.transforms or list(TRANSFORMS)
+    unknown = [t for t in selected if t not in TRANSFORMS]
+    if unknown:
+        print(f"FAIL:   unknown transform(s): {', '.join(unknown)}. Use --list.")
+        return 1
+
+    started = time.perf_counter()
+    state = {} if args.force else load_state()
+    todo, skipped = [], 0
+    with deck_profile.phase('plan'):
+        for path, kind, chain in plan(selected, set(args.files or [])):
+            key = os.path.relpath(path, BASE_DIR).replace(os.sep, '/')
+            record = state.get(key)
+            if is_up_to_date(path, record, chain):
+                skipped += 1
+                continue
+            # Transforms recorded against these exact bytes still hold afterwards.
+            prior = record['applied'] if is_up_to_date(path, record, []) else []
+            todo.append((key, path, kind, chain, prior))
+
+    if len(todo) > 1 and args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(todo))) as pool:
+            futures = [deck_profile.submit(pool, run_chain, path, kind, chain)
+                       for _key, path, kind, chain, _ in todo]
+            results = [deck_profile.result(future) for future in futures]
+    else:
+        results = [run_chain(path, kind, chain) for _key, path, kind, chain, _ in todo]
+
+    written = failed = 0
+    for (key, path, _kind, chain, prior), (counts, new_bytes, error, note) in zip(todo, results):
+        if error:
+            print(f"FAIL:   {key} -> {error}")
+            failed += 1
+            continue
+        summary = ', '.join(f'{name}={n}' for name, n in counts.items()) or 'not a deck'
+        if new_bytes is not None and not args.dry_run:
+            with deck_profile.phase('backup', path):
+                ts, _stored = snapshot(path, source='migrate')
+            with deck_profile.phase('write', path):
+                write_atomic(path, new_bytes)
+            deck_profile.count(path, bytes_written=len(new_bytes))
+            written += 1
+            print(f"VERIFY: {key}: {summary} ({note}; backup: {os.path.basename(path)}@{ts})")
+        elif new_bytes is not None:
+            print(f"DEBUG:  {key}: {summary} (dry run, not written)")
+            continue
+        else:
+            print(f"DEBUG:  {key}: {summary} (unchanged)")
+
+        if not args.dry_run:
+            with deck_profile.phase('fingerprint', path):
+                state[key] = dict(fingerprint(path, new_bytes),
+                                  applied=sorted(set(prior) | set(chain)))
+
+    if not args.dry_run:
+        with deck_profile.phase('state.save'):
+            save_state(state)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"VERIFY: {len(todo)} file(s) processed, {written} written, {skipped} skipped "
+          f"(already migrated), {elapsed_ms:.0f} ms")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,30 +9,31 @@ LLM in the minified Modal Catalog (ImprovementService.handleExport) so the model
 can pick the right modal when the user asks "add an appropriate modal to this card".
 
 Idempotent: entries that already have a `description` key are left alone.
-Backups land in public/data/glossary/backups/<timestamp>_<file>.
+Backups are snapshots in the shared store public/data/glossary/backups/
+(see deck_backup.py).
 
 Usage:
     py migrate_glossary_add_description.py
+    py migrate_glossary_add_description.py --profile   -> timings per phase/file
+                                                          (see deck_profile.py)
 """
 
+import argparse
 import json
 import os
-import shutil
 from collections import OrderedDict
-from datetime import datetime
+
+import deck_profile
+from deck_backup import snapshot
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 GLOSSARY_DIR = os.path.join(BASE_DIR, 'public', 'data', 'glossary')
-BACKUP_DIR = os.path.join(GLOSSARY_DIR, 'backups')
 FILES = ['english_rules.json', 'phrasal_verbs.json']
 
 
 def backup(src_path):
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-    dst = os.path.join(BACKUP_DIR, f'{ts}_{os.path.basename(src_path)}')
-    shutil.copy2(src_path, dst)
-    return dst
+    ts, _stored = snapshot(src_path, source='migrate_glossary_add_description')
+    return f'{os.path.basename(src_path)}@{ts}'
 
 
 def add_description_to_entry(entry):
@@ -50,8 +51,10 @@ def add_description_to_entry(entry):
 
 
 def migrate_file(path):
-    with open(path, 'r', encoding='utf-8') as f:
+    with deck_profile.phase('parse', path), open(path, 'r', encoding='utf-8') as f:
         data = json.load(f, object_pairs_hook=OrderedDict)
+    if deck_profile.enabled():
+        deck_profile.count(path, bytes_read=os.path.getsize(path), entries=len(data))
 
     if not isinstance(data, dict):
         print(f'  skip (not a dict): {path}')
@@ -60,26 +63,33 @@ def migrate_file(path):
     touched = 0
     total = len(data)
     new_data = OrderedDict()
-    for key, entry in data.items():
-        if isinstance(entry, dict):
-            new_entry, changed = add_description_to_entry(entry)
-            if changed:
-                touched += 1
-            new_data[key] = new_entry
-        else:
-            new_data[key] = entry
+    with deck_profile.phase('rewrite', path):
+        for key, entry in data.items():
+            if isinstance(entry, dict):
+                new_entry, changed = add_description_to_entry(entry)
+                if changed:
+                    touched += 1
+                new_data[key] = new_entry
+            else:
+                new_data[key] = entry
 
     if touched == 0:
         print(f'{os.path.basename(path)}: 0 / {total} entries needed update; file unchanged.')
         return
 
-    backup_path = backup(path)
-    with open(path, 'w', encoding='utf-8') as f:
+    with deck_profile.phase('backup', path):
+        backup_path = backup(path)
+    with deck_profile.phase('write', path), open(path, 'w', encoding='utf-8') as f:
         json.dump(new_data, f, indent=2, ensure_ascii=False)
-    print(f'{os.path.basename(path)}: added description to {touched} / {total} entries (backup: {os.path.relpath(backup_path, BASE_DIR)})')
+    if deck_profile.enabled():
+        deck_profile.count(path, bytes_written=os.path.getsize(path), entries_updated=touched)
+    print(f'{os.path.basename(path)}: added description to {touched} / {total} entries (backup: {backup_path})')
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Add an empty 'description' to every glossary entry.")
+    deck_profile.add_arguments(parser)
+    deck_profile.start(parser.parse_args())
     for name in FILES:
         path = os.path.join(GLOSSARY_DIR, name)
         if not os.path.exists(path):
@@ -13,23 +13,28 @@ Fields rewritten per card:
     - card['content']['value']   (multipleChoice / audioChoice decks)
 
 Skips public/data/glossary/, public/data/backups/, deck_unlock_codes.json,
-.bak files, and audio folders. Backups land in public/data/backups/<ts>_<file>.
+.bak files, and audio folders. Backups are snapshots in the shared store
+public/data/backups/ (see deck_backup.py).
 
 Idempotent: if a file has no unqualified `**[N]**` left, it's untouched.
+Only the rewritten cards are spliced into the file (see deck_splice.py).
 
 Usage:
     py migrate_modal_links_qualified.py
+    py migrate_modal_links_qualified.py --profile   -> timings per phase/file
+                                                       (see deck_profile.py)
 """
 
-import json
+import argparse
 import os
 import re
-import shutil
-from datetime import datetime
+
+import deck_profile
+import deck_splice
+from deck_backup import snapshot
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'public', 'data')
-BACKUP_DIR = os.path.join(DATA_DIR, 'backups')
 
 SKIP_FILENAMES = {'deck_unlock_codes.json'}
 SKIP_DIR_NAMES = {'glossary', 'backups', 'audio'}
@@ -42,11 +47,8 @@ def deck_alias(deck_id):
 
 
 def backup(src_path):
-    os.makedirs(BACKUP_DIR, exist_ok=True)
-    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-    dst = os.path.join(BACKUP_DIR, f'{ts}_{os.path.basename(src_path)}')
-    shutil.copy2(src_path, dst)
-    return dst
+    ts, _stored = snapshot(src_path, source='migrate_modal_links_qualified')
+    return f'{os.path.basename(src_path)}@{ts}'
 
 
 def rewrite_string(s, alias):
@@ -80,8 +82,8 @@ def rewrite_card(card, alias):
 
 def migrate_deck_file(path):
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            deck = json.load(f)
+        with deck_profile.phase('parse', path):
+            deck, spans = deck_splice.read_deck(path)
     except Exception as exc:
         print(f'SKIP (parse error): {os.path.relpath(path, BASE_DIR)} -> {exc}')
         return
@@ -89,29 +91,39 @@ def migrate_deck_file(path):
     if not isinstance(deck, dict) or not isinstance(deck.get('cards'), list):
         return  # not a deck file
 
+    if deck_profile.enabled():
+        deck_profile.count(path, bytes_read=os.path.getsize(path), cards=len(deck['cards']))
     alias = deck_alias(deck.get('id'))
     total_replacements = 0
-    cards_touched = 0
-    for card in deck['cards']:
-        if not isinstance(card, dict):
-            continue
-        n = rewrite_card(card, alias)
-        if n:
-            total_replacements += n
-            cards_touched += 1
+    touched = []
+    with deck_profile.phase('rewrite', path):
+        for position, card in enumerate(deck['cards']):
+            if not isinstance(card, dict):
+                continue
+            n = rewrite_card(card, alias)
+            if n:
+                total_replacements += n
+                touched.append(position)
 
     rel = os.path.relpath(path, BASE_DIR)
     if total_replacements == 0:
         print(f'{rel} [alias={alias}]: no unqualified markup found.')
         return
 
-    backup_path = backup(path)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(deck, f, indent=2, ensure_ascii=False)
-    print(f'{rel} [alias={alias}]: rewrote {total_replacements} occurrence(s) across {cards_touched} card(s). backup: {os.path.relpath(backup_path, BASE_DIR)}')
+    with deck_profile.phase('backup', path):
+        backup_path = backup(path)
+    with deck_profile.phase('write', path):
+        mode, _note = deck_splice.write_cards(path, deck, touched, spans)
+    if deck_profile.enabled():
+        deck_profile.count(path, bytes_written=os.path.getsize(path), cards_rewritten=len(touched))
+    print(f'{rel} [alias={alias}]: rewrote {total_replacements} occurrence(s) across {len(touched)} card(s) '
+          f'({mode}). backup: {backup_path}')
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Qualify **[N]** modal links in every deck of public/data.")
+    deck_profile.add_arguments(parser)
+    deck_profile.start(parser.parse_args())
     for entry in sorted(os.listdir(DATA_DIR)):
         full = os.path.join(DATA_DIR, entry)
         if os.path.isdir(full):
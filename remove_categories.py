@@ -1,9 +1,23 @@
-import json
+import argparse
 import os
 
+import deck_profile
+import deck_splice
+from deck_backup import snapshot
+
 # Configuration: Updated target file
 target_file = 'public/data/phrasal_verbs_audio_choice.json'
 
+def strip_categories(cards):
+    """Drop the 'category' field from every card in place; return how many had one."""
+    count = 0
+    for card in cards:
+        if isinstance(card, dict) and "category" in card:
+            del card["category"]
+            count += 1
+    return count
+
+
 def remove_categories():
     if not os.path.exists(target_file):
         print(f"Error: File not found at {target_file}")
@@ -12,27 +26,44 @@ def remove_categories():
     print(f"Processing {target_file}...")
 
     try:
-        with open(target_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with deck_profile.phase('parse', target_file):
+            data, spans = deck_splice.read_deck(target_file)
+        if deck_profile.enabled():
+            deck_profile.count(target_file, bytes_read=os.path.getsize(target_file))
 
-        if "cards" not in data:
+        if spans is None:
             print("Error: JSON structure invalid (missing 'cards' array).")
             return
 
-        count = 0
-        for card in data["cards"]:
-            if "category" in card:
-                del card["category"]
-                count += 1
+        with deck_profile.phase('rewrite', target_file):
+            positions = [i for i, card in enumerate(data["cards"])
+                         if isinstance(card, dict) and "category" in card]
+            count = strip_categories(data["cards"])
 
-        with open(target_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if count == 0:
+            print("Nothing to do: no card has a 'category' field.")
+            return
 
-        print(f"Success! Removed 'category' from {count} cards.")
+        with deck_profile.phase('backup', target_file):
+            ts, _stored = snapshot(target_file, source='remove_categories')
+        with deck_profile.phase('write', target_file):
+            deck_splice.write_cards(target_file, data, positions, spans)
+        if deck_profile.enabled():
+            deck_profile.count(target_file, bytes_written=os.path.getsize(target_file),
+                               cards_updated=count)
+
+        print(f"Success! Removed 'category' from {count} cards. (backup: {os.path.basename(target_file)}@{ts})")
         print("VERIFY: Check your JSON file to confirm the changes.")
 
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def main():
+    parser = argparse.ArgumentParser(description="Remove the 'category' field from every card.")
+    deck_profile.add_arguments(parser)
+    deck_profile.start(parser.parse_args())
+    remove_categories()
+
+
 if __name__ == "__main__":
-    remove_categories()
\ No newline at end of file
+    main()
@@ -0,0 +1,556 @@
+"""
+simulate_srs.py
+
+Forecasts the daily study load of the spaced-repetition mode: what adding
+1,600 cards to a deck, or switching difficulty to "high", does to the number
+of reviews per day. The scheduling rules are a port of
+src/services/SrsService.js (grade(), fuzzDays(), _partition()) with the same
+constants; keep the two in sync (--parity checks it against the JS engine).
+
+Two ports of SrsService.grade() live here:
+    grade()         scalar, record for record: the reference
+    grade_arrays()  the same rules over NumPy arrays, used by the simulator
+
+The simulator runs every deck for --users Monte-Carlo users x --days days as
+array operations over a (users, cards) state table. Each simulated day is one
+study session, as the app builds it:
+    learning / relearning cards, then due review cards (oldest first, up to
+    maxReviewsPerDay), then the "review ahead" top-up up to
+    minReviewsPerDay, then up to newPerDay new cards in deck order;
+    cards still in (re)learning after a grade are re-queued until they leave
+    it, exactly like SrsSession._advance().
+Grades are drawn per grading with --again / --review-again / --easy.
+
+Output is the per-day forecast (new cards introduced, reviews, lapses, total
+gradings, and the review backlog left over by the cap) as mean and p90 over
+the simulated users: weekly averages on the console, every day with --csv /
+--json.
+
+NumPy is required for the simulation. --parity needs Node.js (it runs
+SrsService.js itself) and runs without NumPy, checking only the scalar port
+when NumPy is missing:
+    1. grade() against SrsService.grade() in node, on the same records,
+       grades, difficulties, timestamps and Math.random() values;
+    2. grade_arrays() against the same SrsService.grade() results.
+Starting records are random ones plus real smart-decks-v3-srs-<deckId>
+records from a localStorage export: by default srs_parity_export.json (a
+small committed export of two decks studied for several weeks, taken mid-
+session so relearning records are in it), or the file given with --records.
+An export is {"smart-decks-v3-srs-<deckId>": {"<cardId>": record}}, values
+possibly still JSON strings as localStorage holds them, or a plain
+{"<cardId>": record} map; other smart-decks-v3-* keys are ignored.
+
+Usage:
+    py simulate_srs.py common_meeting.json
+    py simulate_srs.py common_meeting.json --add 1600 --days 365
+    py simulate_srs.py dummy.json --difficulty high --users 500 --csv load.csv
+    py simulate_srs.py --parity
+    py simulate_srs.py --parity --records my_export.json
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:  # required for the simulation; --parity runs without it
+    np = None
+
+from check_deck_ids import BASE_DIR, load_deck, resolve_targets
+
+SRS_SERVICE_JS = os.path.join(BASE_DIR, 'src', 'services', 'SrsService.js')
+SRS_KEY_PREFIX = 'smart-decks-v3-srs-'
+SRS_OTHER_PREFIXES = ('smart-decks-v3-srs-settings-', 'smart-decks-v3-srs-daily-')
+PARITY_RECORDS_PATH = os.path.join(BASE_DIR, 'srs_parity_export.json')
+
+# --- SrsService constants (v1) ---
+DAY_MS = 24 * 60 * 60 * 1000
+LEARNING_STEPS_MIN = [1, 10]
+RELEARN_STEPS_MIN = [10]
+GRADUATE_DAYS = 1
+EASY_GRADUATE_DAYS = 4
+START_EASE = 2.5
+MIN_EASE = 1.3
+EASE_AGAIN = -0.20
+EASE_EASY = 0.15
+EASY_BONUS = 1.3
+LAPSE_MULT = 0.5
+MAX_INTERVAL_DAYS = 365
+
+# StorageService.loadSrsSettings() defaults.
+DEFAULT_SETTINGS = {'newPerDay': 10, 'maxReviewsPerDay': 40, 'minReviewsPerDay': 15, 'difficulty': 'normal'}
+
+GRADES = ('again', 'good', 'easy')
+STATES = ('new', 'learning', 'review', 'relearning')
+NEW, LEARNING, REVIEW, RELEARNING = range(4)
+AGAIN, GOOD, EASY = range(3)
+# A session re-queues (re)learning cards until they leave it; this bounds the
+# loop if --again is set absurdly close to 1.
+MAX_PASSES = 200
+
+
+def difficulty_modifier(difficulty):
+    return {'high': 0.75, 'low': 1.3}.get(difficulty, 1.0)
+
+
+def js_round(x):
+    """Math.round: halves go up (floor(x + 0.5) loses precision near .5)."""
+    r = math.floor(x)
+    return r + 1 if x - r >= 0.5 else r
+
+
+def start_of_day_ms(now):
+    """Local midnight at or before `now`, like new Date(now).setHours(0,0,0,0)."""
+    d = datetime.fromtimestamp(now // 1000).replace(hour=0, minute=0, second=0)
+    return int(d.timestamp()) * 1000
+
+
+def fuzz_days(days, rand):
+    if days < 2:
+        return days
+    if days < 7:
+        spread = max(1, days * 0.25)
+    elif days < 20:
+        spread = days * 0.15
+    else:
+        spread = days * 0.05
+    delta = js_round((rand() * 2 - 1) * spread)
+    return max(1, days + delta)
+
+
+def new_record():
+    return {'state': 'new', 'due': 0, 'interval': 0, 'ease': START_EASE, 'reps': 0, 'lapses': 0, 'stepIndex': 0}
+
+
+def grade(existing, grade, difficulty, now, rand=random.random):
+    """SrsService.grade(): returns (record, introduced_new, review_done)."""
+    mod = difficulty_modifier(difficulty)
+    was_new = not existing or existing['state'] == 'new'
+    was_review = bool(existing) and existing['state'] == 'review'
+    r = dict(existing) if existing else new_record()
+
+    def clamp_days(days):
+        return min(MAX_INTERVAL_DAYS, max(1, js_round(days)))
+
+    def set_interval(days):
+        r['interval'] = clamp_days(days)
+        r['due'] = start_of_day_ms(now) + fuzz_days(r['interval'], rand) * DAY_MS
+
+    def schedule_min(minutes):
+        return now + minutes * 60 * 1000
+
+    state = 'learning' if r['state'] == 'new' else r['state']
+
+    if state == 'learning':
+        if grade == 'again':
+            r.update(state='learning', stepIndex=0, due=schedule_min(LEARNING_STEPS_MIN[0]))
+        elif grade == 'easy':
+            r.update(state='review', stepIndex=0, reps=r['reps'] + 1)
+            set_interval(EASY_GRADUATE_DAYS * mod)
+        else:
+            step = r['stepIndex'] + 1
+            if step >= len(LEARNING_STEPS_MIN):
+                r.update(state='review', stepIndex=0, reps=r['reps'] + 1)
+                set_interval(GRADUATE_DAYS * mod)
+            else:
+                r.update(state='learning', stepIndex=step, due=schedule_min(LEARNING_STEPS_MIN[step]))
+    elif state == 'relearning':
+        if grade == 'again':
+            r.update(state='relearning', stepIndex=0, due=schedule_min(RELEARN_STEPS_MIN[0]))
+        else:
+            step = r['stepIndex'] + 1
+            if grade == 'easy' or step >= len(RELEARN_STEPS_MIN):
+                r.update(state='review', stepIndex=0, reps=r['reps'] + 1)
+                set_interval((r['interval'] or 1) * mod)
+            else:
+                r.update(state='relearning', stepIndex=step, due=schedule_min(RELEARN_STEPS_MIN[step]))
+    else:
+        if grade == 'again':
+            r['lapses'] += 1
+            r['ease'] = max(MIN_EASE, r['ease'] + EASE_AGAIN)
+            r['interval'] = clamp_days((r['interval'] or 1) * LAPSE_MULT)
+            r.update(state='relearning', stepIndex=0, due=schedule_min(RELEARN_STEPS_MIN[0]))
+        elif grade == 'easy':
+            r['ease'] = r['ease'] + EASE_EASY
+            r['reps'] += 1
+            set_interval((r['interval'] or 1) * r['ease'] * EASY_BONUS * mod)
+        else:
+            r['reps'] += 1
+            set_interval((r['interval'] or 1) * r['ease'] * mod)
+
+    return r, was_new, was_review
+
+
+# --- Vectorized port ---
+
+def _round_arrays(x):
+    floor = np.floor(x)
+    return floor + (x - floor >= 0.5)
+
+
+def _clamp_days(days):
+    return np.minimum(MAX_INTERVAL_DAYS, np.maximum(1, _round_arrays(days))).astype(np.int32)
+
+
+def fuzz_arrays(days, rand):
+    """fuzzDays() over an int array, with one uniform draw per element."""
+    spread = np.where(days < 7, np.maximum(1, days * 0.25), np.where(days < 20, days * 0.15, days * 0.05))
+    fuzzed = np.maximum(1, days + _round_arrays((rand * 2 - 1) * spread)).astype(np.int32)
+    return np.where(days < 2, days, fuzzed)
+
+
+def grade_arrays(cards, grades, mod):
+    """grade() over arrays. `cards` is a dict of equal-length arrays (state,
+    step, interval, ease, reps, lapses); they are updated in place. Returns
+    the mask of cards that got a day-level interval (setInterval in the JS),
+    whose due date is then fuzz_arrays(interval)."""
+    state, step, interval, ease = cards['state'], cards['step'], cards['interval'], cards['ease']
+    learning = (state == NEW) | (state == LEARNING)
+    relearning = state == RELEARNING
+    review = state == REVIEW
+    again, good, easy = grades == AGAIN, grades == GOOD, grades == EASY
+    base = np.maximum(interval, 1)  # (r.interval || 1)
+
+    next_step = step + 1
+    learn_graduate = learning & (easy | (good & (next_step >= len(LEARNING_STEPS_MIN))))
+    learn_step = learning & good & ~learn_graduate
+    relearn_graduate = relearning & ~again & (easy | (next_step >= len(RELEARN_STEPS_MIN)))
+    relearn_step = relearning & ~again & ~relearn_graduate
+    lapse = review & again
+    review_pass = review & ~again
+
+    new_ease = np.where(lapse, np.maximum(MIN_EASE, ease + EASE_AGAIN),
+                        np.where(review & easy, ease + EASE_EASY, ease))
+    new_interval = np.select(
+        [learning & easy, learn_graduate, relearn_graduate, lapse, review & easy, review & good],
+        [_clamp_days(np.full(len(state), EASY_GRADUATE_DAYS * mod)),
+         _clamp_days(np.full(len(state), GRADUATE_DAYS * mod)),
+         _clamp_days(base * mod),
+         _clamp_days(base * LAPSE_MULT),
+         _clamp_days(base * new_ease * EASY_BONUS * mod),
+         _clamp_days(base * new_ease * mod)],
+        interval)
+    graduated = learn_graduate | relearn_graduate | review_pass
+
+    cards['state'] = np.select([learning & ~learn_graduate, graduated, relearning | lapse],
+                               [LEARNING, REVIEW, RELEARNING], state).astype(state.dtype)
+    # A passed review keeps its stepIndex, as in the JS.
+    cards['step'] = np.select([learn_step | relearn_step, review_pass], [next_step, step], 0).astype(step.dtype)
+    cards['interval'] = new_interval.astype(interval.dtype)
+    cards['ease'] = new_ease
+    cards['reps'] = cards['reps'] + graduated
+    cards['lapses'] = cards['lapses'] + lapse
+    return graduated
+
+
+# --- Simulation ---
+
+def _first_n_per_row(mask, key, n):
+    """Per row, the `n[row]` masked cells with the smallest key (ties in
+    column order, like the JS stable sort)."""
+    chosen = np.zeros_like(mask)
+    counts = mask.sum(axis=1)
+    take_all = counts <= n
+    chosen[take_all] = mask[take_all]
+    rows = np.flatnonzero(~take_all & (n > 0))
+    if len(rows):
+        keys = np.where(mask[rows], key[rows], np.iinfo(np.int64).max)
+        order = np.argsort(keys, axis=1, kind='stable')
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.arange(mask.shape[1])[None, :].repeat(len(rows), 0), axis=1)
+        chosen[rows] = mask[rows] & (ranks < n[rows, None])
+    return chosen
+
+
+def simulate(card_count, settings, days, users, probs, rng):
+    """Simulate one deck. Returns {metric: (users, days) int array}."""
+    mod = difficulty_modifier(settings['difficulty'])
+    shape = (users, card_count)
+    table = {'state': np.full(shape, NEW, dtype=np.int8), 'step': np.zeros(shape, dtype=np.int8),
+             'interval': np.zeros(shape, dtype=np.int32), 'ease': np.full(shape, START_EASE),
+             'reps': np.zeros(shape, dtype=np.int32), 'lapses': np.zeros(shape, dtype=np.int32)}
+    due = np.zeros(shape, dtype=np.int64)
+    out = {name: np.zeros((users, days), dtype=np.int32)
+           for name in ('new', 'reviews', 'lapses', 'gradings', 'backlog')}
+    new_cap = np.full(users, settings['newPerDay'])
+    review_cap = np.full(users, settings['maxReviewsPerDay'])
+
+    for day in range(days):
+        state = table['state']
+        learning = (state == LEARNING) | (state == RELEARNING)
+        is_review = state == REVIEW
+        due_review = is_review & (due <= day)
+        chosen = _first_n_per_row(due_review, due, review_cap)
+        already = learning.sum(axis=1) + chosen.sum(axis=1)
+        remaining = review_cap - chosen.sum(axis=1)
+        shortfall = np.minimum(np.maximum(0, settings['minReviewsPerDay'] - already), remaining)
+        ahead = _first_n_per_row(is_review & (due > day), due, shortfall)
+        fresh = (state == NEW) & (np.cumsum(state == NEW, axis=1) <= new_cap[:, None])
+
+        session = learning | chosen | ahead | fresh
+        rows, cols = np.nonzero(session)
+        cards = {name: values[rows, cols] for name, values in table.items()}
+        out['new'][:, day] = fresh.sum(axis=1)
+        out['backlog'][:, day] = due_review.sum(axis=1) - chosen.sum(axis=1)
+
+        active = np.arange(len(rows))
+        for _ in range(MAX_PASSES):
+            if not len(active):
+                break
+            current = {name: values[active] for name, values in cards.items()}
+            was_review = current['state'] == REVIEW
+            draw = rng.random(len(active))
+            p_again = np.where(was_review, probs['review_again'], probs['again'])
+            grades = np.where(draw < p_again, AGAIN, np.where(draw < p_again + probs['easy'], EASY, GOOD))
+            scheduled = grade_arrays(current, grades, mod)
+            for name, values in current.items():
+                cards[name][active] = values
+            user = rows[active]
+            np.add.at(out['gradings'][:, day], user, 1)
+            np.add.at(out['reviews'][:, day], user[was_review], 1)
+            np.add.at(out['lapses'][:, day], user[was_review & (grades == AGAIN)], 1)
+            due[rows[active[scheduled]], cols[active[scheduled]]] = \
+                day + fuzz_arrays(current['interval'][scheduled], rng.random(int(scheduled.sum())))
+            active = active[(current['state'] == LEARNING) | (current['state'] == RELEARNING)]
+
+        for name, values in cards.items():
+            table[name][rows, cols] = values
+    return out
+
+
+def summarize(totals, days):
+    """Per-day mean / p90 over users: [{day, <metric>, <metric>_p90}]."""
+    rows = []
+    for day in range(days):
+        row = {'day': day + 1}
+        for name, values in totals.items():
+            row[name] = round(float(values[:, day].mean()), 2)
+            row[name + '_p90'] = int(np.percentile(values[:, day], 90))
+        rows.append(row)
+    return rows
+
+
+# --- Parity with SrsService.js ---
+
+NODE_HARNESS = r"""
+const fs = require('fs');
+const [srcPath, casesPath] = process.argv.slice(1);
+eval(fs.readFileSync(srcPath, 'utf8') + '\nglobalThis.SrsService = SrsService;');
+let pending = [];
+Math.random = () => {
+    if (!pending.length) throw new Error('more Math.random() calls than the Python port made');
+    return pending.shift();
+};
+const results = JSON.parse(fs.readFileSync(casesPath, 'utf8')).map(c => {
+    pending = c.random.slice();
+    const out = SrsService.grade(c.record, c.grade, c.difficulty, c.now);
+    return { record: out.record, introducedNew: out.introducedNew, reviewDone: out.reviewDone,
+             randomLeft: pending.length };
+});
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+def load_recorded(path):
+    """Records from a localStorage export (see the module docstring)."""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        data = json.load(f)
+    maps = [v for k, v in data.items()
+            if k.startswith(SRS_KEY_PREFIX) and not k.startswith(SRS_OTHER_PREFIXES)] or [data]
+    records = []
+    for records_map in maps:
+        if isinstance(records_map, str):  # exported as the raw localStorage string
+            records_map = json.loads(records_map)
+        records += [r for r in records_map.values() if isinstance(r, dict) and r.get('state') in STATES]
+    return records
+
+
+def parity_cases(recorded, count, rng):
+    """(record, grade, difficulty, now, random values) combinations."""
+    starts = [None] + recorded
+    while len(starts) < count:
+        state = rng.choice(STATES)
+        starts.append({'state': state, 'due': 0, 'interval': rng.choice([0, 1, 2, 3, 6, 7, 19, 20, rng.randint(0, 400)]),
+                       'ease': rng.choice([START_EASE, MIN_EASE, round(rng.uniform(1.3, 3.5), 2), rng.uniform(1.3, 3.5)]),
+                       'reps': rng.randint(0, 30), 'lapses': rng.randint(0, 10),
+                       'stepIndex': rng.randint(0, len(LEARNING_STEPS_MIN if state != 'relearning'
+                                                        else RELEARN_STEPS_MIN) - 1)})
+    # Timestamps across two years, so DST switches and month ends are hit.
+    base = int(datetime(2025, 1, 1).timestamp()) * 1000
+    cases = []
+    for record in starts:
+        for name in GRADES:
+            cases.append({'record': record, 'grade': name, 'difficulty': rng.choice(['low', 'normal', 'high']),
+                          'now': base + rng.randint(0, 2 * 365 * DAY_MS),
+                          'random': [rng.choice([0.0, 0.5, 0.999999, 0.25, rng.random()])]})
+    return cases
+
+
+def run_parity(recorded_path, count, seed):
+    rng = random.Random(seed)
+    recorded = load_recorded(recorded_path)
+    cases = parity_cases(recorded, count, rng)
+    print(f"DEBUG:  {len(cases)} case(s): {len(recorded)} recorded record(s) from "
+          f"{os.path.basename(recorded_path)} + random ones, x 3 grades")
+    failed = 0
+
+    node = shutil.which('node')
+    if node is None:
+        print("FAIL:   Node.js is required for the JS parity check (https://nodejs.org)")
+        return 1
+    with tempfile.TemporaryDirectory() as tmp:
+        cases_path = os.path.join(tmp, 'cases.json')
+        with open(cases_path, 'w', encoding='utf-8') as f:
+            json.dump(cases, f)
+        run = subprocess.run([node, '-e', NODE_HARNESS, SRS_SERVICE_JS, cases_path],
+                             capture_output=True, text=True)
+    if run.returncode:
+        print(f"FAIL:   node exited with {run.returncode}: {run.stderr.strip()[-500:]}")
+        return 1
+    expected = json.loads(run.stdout)
+
+    for case, js in zip(cases, expected):
+        pending = list(case['random'])
+        record, was_new, was_review = grade(case['record'], case['grade'], case['difficulty'], case['now'],
+                                            lambda: pending.pop(0))
+        mine = {'record': record, 'introducedNew': was_new, 'reviewDone': was_review, 'randomLeft': len(pending)}
+        if mine != js:
+            failed += 1
+            if failed <= 10:
+                print(f"FAIL:   [JS]      {case['grade']} on {case['record']} ({case['difficulty']}, "
+                      f"now={case['now']}):\n          js={js}\n          py={mine}")
+    print(f"{'FAIL:  ' if failed else 'VERIFY:'} [JS]      grade() vs SrsService.grade(): "
+          f"{len(cases) - failed}/{len(cases)} identical")
+
+    if np is None:
+        print("DEBUG:  NumPy is not installed: grade_arrays() parity skipped (pip install numpy)")
+        return 1 if failed else 0
+
+    started = [case['record'] or new_record() for case in cases]
+    cards = {'state': np.array([STATES.index(r['state']) for r in started], dtype=np.int8),
+             'step': np.array([r['stepIndex'] for r in started], dtype=np.int8),
+             'interval': np.array([r['interval'] for r in started], dtype=np.int32),
+             'ease': np.array([r['ease'] for r in started], dtype=np.float64),
+             'reps': np.array([r['reps'] for r in started], dtype=np.int32),
+             'lapses': np.array([r['lapses'] for r in started], dtype=np.int32)}
+    mods = np.array([difficulty_modifier(case['difficulty']) for case in cases])
+    grades = np.array([GRADES.index(case['grade']) for case in cases])
+    rand = np.array([case['random'][0] for case in cases])
+    vector_failed = 0
+    for mod in np.unique(mods):
+        subset = mods == mod
+        part = {name: values[subset] for name, values in cards.items()}
+        scheduled = grade_arrays(part, grades[subset], float(mod))
+        fuzzed = np.where(scheduled, fuzz_arrays(part['interval'], rand[subset]), 0)
+        for n, i in enumerate(np.flatnonzero(subset)):
+            js = expected[i]['record']
+            got = {'state': STATES[part['state'][n]], 'stepIndex': int(part['step'][n]),
+                   'interval': int(part['interval'][n]), 'ease': float(part['ease'][n]),
+                   'reps': int(part['reps'][n]), 'lapses': int(part['lapses'][n])}
+            want = {k: js[k] for k in got}
+            if scheduled[n]:
+                got['due'] = start_of_day_ms(cases[i]['now']) + int(fuzzed[n]) * DAY_MS
+                want['due'] = js['due']
+            if got != want:
+                vector_failed += 1
+                if vector_failed <= 10:
+                    print(f"FAIL:   [ARRAYS]  {cases[i]['grade']} on {cases[i]['record']}:\n"
+                          f"          js={want}\n          np={got}")
+    print(f"{'FAIL:  ' if vector_failed else 'VERIFY:'} [ARRAYS]  grade_arrays() vs SrsService.grade(): "
+          f"{len(cases) - vector_failed}/{len(cases)} identical")
+    return 1 if failed or vector_failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Forecast the daily SRS load of decks (SrsService.js rules).")
+    parser.add_argument('decks', nargs='*', help="Deck files (bare names resolve inside public/data).")
+    parser.add_argument('--add', type=int, default=0, help="Extra new cards appended to each deck.")
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--users', type=int, default=200, help="Monte-Carlo users (default: 200).")
+    parser.add_argument('--difficulty', choices=['low', 'normal', 'high'], default=DEFAULT_SETTINGS['difficulty'])
+    parser.add_argument('--new-per-day', type=int, default=DEFAULT_SETTINGS['newPerDay'])
+    parser.add_argument('--max-reviews', type=int, default=DEFAULT_SETTINGS['maxReviewsPerDay'])
+    parser.add_argument('--min-reviews', type=int, default=DEFAULT_SETTINGS['minReviewsPerDay'])
+    parser.add_argument('--again', type=float, default=0.25, help="P(again) while (re)learning.")
+    parser.add_argument('--review-again', type=float, default=0.10, help="P(again) on a review card.")
+    parser.add_argument('--easy', type=float, default=0.10, help="P(easy) on any grading.")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--csv', metavar='PATH', help="Write every day's forecast as CSV.")
+    parser.add_argument('--json', metavar='PATH', help="Write every day's forecast as JSON.")
+    parser.add_argument('--parity', action='store_true', help="Check the ports against SrsService.js in node.")
+    parser.add_argument('--records', metavar='PATH', default=PARITY_RECORDS_PATH,
+                        help="With --parity: exported smart-decks-v3-srs-* records "
+                             "(default: srs_parity_export.json).")
+    parser.add_argument('--cases', type=int, default=2000, help="With --parity: starting records to try.")
+    args = parser.parse_args(argv)
+
+    if args.parity:
+        return run_parity(args.records, args.cases, args.seed)
+    if not args.decks:
+        parser.error("give at least one deck (or --parity)")
+    if np is None:
+        print("FAIL:   NumPy is required for the simulation. Install it with:  pip install numpy")
+        return 1
+    if max(args.again, args.review_again) + args.easy > 1:
+        parser.error("--again / --review-again plus --easy must not exceed 1")
+
+    settings = {'newPerDay': args.new_per_day, 'maxReviewsPerDay': args.max_reviews,
+                'minReviewsPerDay': min(args.min_reviews, args.max_reviews), 'difficulty': args.difficulty}
+    probs = {'again': args.again, 'review_again': args.review_again, 'easy': args.easy}
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+
+    totals = None
+    targets, _scan_all = resolve_targets(args.decks)
+    for path in targets:
+        deck, error = load_deck(path)
+        if deck is None:
+            print(f"FAIL:   {os.path.basename(path)} -> {error or 'not a deck'}")
+            return 1
+        count = len(deck['cards']) + args.add
+        print(f"DEBUG:  {os.path.basename(path)}: {count} cards ({len(deck['cards'])} + {args.add} added)")
+        result = simulate(count, settings, args.days, args.users, probs, rng)
+        totals = result if totals is None else {k: totals[k] + result[k] for k in totals}
+
+    rows = summarize(totals, args.days)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"\n  Settings: {settings}, P(again) {args.again} learning / {args.review_again} review, "
+          f"P(easy) {args.easy}")
+    print(f"  {'days':<10}{'new':>8}{'reviews':>10}{'(p90)':>7}{'lapses':>9}{'gradings':>10}{'(p90)':>7}{'backlog':>9}")
+    for first in range(0, args.days, 7):
+        week = rows[first:first + 7]
+
+        def avg(key):
+            return sum(r[key] for r in week) / len(week)
+
+        print(f"  {f'{first + 1}-{first + len(week)}':<10}{avg('new'):>8.1f}{avg('reviews'):>10.1f}"
+              f"{avg('reviews_p90'):>7.0f}{avg('lapses'):>9.1f}{avg('gradings'):>10.1f}"
+              f"{avg('gradings_p90'):>7.0f}{avg('backlog'):>9.1f}")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'probabilities': probs, 'users': args.users,
+                       'decks': [os.path.basename(p) for p in targets], 'added': args.add, 'days': rows},
+                      f, indent=2)
+    print(f"\nVERIFY: {args.users} users x {args.days} days simulated in {elapsed_ms:.0f} ms "
+          f"(per-day mean; p90 over users; backlog = due reviews left over by maxReviewsPerDay)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -204,7 +204,7 @@ revealFeedback() {
         if (modalMatch) {
             const [, alias, modalId] = modalMatch;
             const glossaryName = GlossaryService.aliasToName(alias);
-            const glossary = glossaryName ? GlossaryService.getCachedGlossary(glossaryName) : null;
+            const glossary = glossaryName ? GlossaryService.getCachedGlossary(glossaryName, modalId) : null;
 
             if (glossary && glossary[modalId]) {
                 const termTitle = glossary[modalId].title;
@@ -221,7 +221,7 @@ revealFeedback() {
         // 2. Inline modal links **[alias:id]** -> clickable titles
         contentText = contentText.replace(/\*\*\[([a-z]{1,8}):(\d+)\]\*\*/g, (match, alias, termId) => {
             const glossaryName = GlossaryService.aliasToName(alias);
-            const glossary = glossaryName ? GlossaryService.getCachedGlossary(glossaryName) : null;
+            const glossary = glossaryName ? GlossaryService.getCachedGlossary(glossaryName, termId) : null;
             if (glossary && glossary[termId]) {
                 const termTitle = glossary[termId].title;
                 return `<a href="#" class="glossary-term glossary-term-chip" data-term-key="${alias}:${termId}"><i class="fas fa-book-open glossary-term-chip-icon"></i><span>${termTitle}</span></a>`;
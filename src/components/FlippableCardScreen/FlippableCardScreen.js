@@ -186,7 +186,7 @@ populateCard() {
                     // Alias resolves to a glossary file via GlossaryService.GLOSSARY_ALIASES.
                     formattedPara = formattedPara.replace(/\*\*\[([a-z]{1,8}):(\d+)\]\*\*/g, (match, alias, termId) => {
                         const glossaryName = GlossaryService.aliasToName(alias);
-                        const glossary = glossaryName ? GlossaryService.getCachedGlossary(glossaryName) : null;
+                        const glossary = glossaryName ? GlossaryService.getCachedGlossary(glossaryName, termId) : null;
                         if (glossary && glossary[termId]) {
                             const termTitle = glossary[termId].title;
                             return `<a href="#" class="glossary-term glossary-term-chip" data-term-key="${alias}:${termId}"><i class="fas fa-book-open glossary-term-chip-icon"></i><span>${termTitle}</span></a>`;
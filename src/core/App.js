@@ -130,12 +130,12 @@ class App {
         await this.glossaryScreen.init();
 
 
-        await GlossaryService.loadGlossary('english_rules');
-        console.log("DEBUG: [App] setupComponents -> Glossaries pre-loaded.");
-        await GlossaryService.loadGlossary('english_rules');
-        await GlossaryService.loadGlossary('phrasal_verbs');
-        await GlossaryService.loadGlossary('miscellaneous');
-        console.log("DEBUG: [App] setupComponents -> All glossaries pre-loaded.")
+        // Only the light indexes (titles for the modal chips); an entry's content
+        // is fetched on demand by GlossaryService.getTerm.
+        await GlossaryService.loadIndex('english_rules');
+        await GlossaryService.loadIndex('phrasal_verbs');
+        await GlossaryService.loadIndex('miscellaneous');
+        console.log("DEBUG: [App] setupComponents -> All glossary indexes pre-loaded.")
     }
     /**
      * Handles the request to show an informational modal for a glossary term.
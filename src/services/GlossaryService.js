@@ -1,6 +1,12 @@
 //src\services\GlossaryService.js
 class GlossaryService {
     static cachedGlossaries = {};
+    // Light per-glossary indexes {id: {title, description, bytes}} and single
+    // entries fetched from the shards written by build_glossary_shards.py
+    // (check_modal_links.py fails while they are stale). An id the index
+    // doesn't list falls back to the full glossary file.
+    static cachedIndexes = {};
+    static cachedTerms = {};
 
     // Short aliases used in card markup (**[alias:id]**) and in modal-improvement
     // storage keys. To add a new glossary: drop the JSON in public/data/glossary/
@@ -46,28 +52,88 @@ class GlossaryService {
         }
     }
 
+    /**
+     * Loads the light index of a glossary (titles + descriptions, no content) and caches it.
+     * Falls back to the full glossary when the index can't be loaded.
+     * @param {string} glossaryName - The name of the glossary (e.g., 'english_rules').
+     * @returns {Promise<object|null>} A promise that resolves with {id: {title, description, bytes}},
+     *     or with the full glossary after a fallback.
+     */
+    static async loadIndex(glossaryName) {
+        if (this.cachedGlossaries[glossaryName]) {
+            return this.cachedGlossaries[glossaryName];
+        }
+        if (this.cachedIndexes[glossaryName]) {
+            return this.cachedIndexes[glossaryName];
+        }
+
+        console.log(`DEBUG: [GlossaryService] Fetching glossary index: ${glossaryName}`);
+        try {
+            const response = await fetch(`public/data/glossary/${glossaryName}/index.json`);
+            if (!response.ok) {
+                throw new Error(`Glossary index not found: ${glossaryName}/index.json`);
+            }
+            const data = await response.json();
+            this.cachedIndexes[glossaryName] = data.entries;
+            return data.entries;
+        } catch (error) {
+            console.error(`DEBUG: [GlossaryService] Failed to load glossary index '${glossaryName}', loading the full glossary:`, error);
+            return await this.loadGlossary(glossaryName);
+        }
+    }
+
     /**
      * Synchronously retrieves a glossary from the cache. ONLY use this if you are sure
-     * the glossary has been pre-loaded elsewhere (e.g., in App.js).
+     * the glossary (or its index) has been pre-loaded elsewhere (e.g., in App.js).
+     * When only the index is loaded, entries carry title/description but no content.
+     * Pass the term being rendered: if the index doesn't list it (added after the shards
+     * were built), the full glossary is loaded in the background and used from then on.
      * @param {string} glossaryName - The name of the glossary.
+     * @param {string} [termKey] - The term about to be looked up, if any.
      * @returns {object|null} The cached glossary object or null if not in cache.
      */
-    static getCachedGlossary(glossaryName) {
+    static getCachedGlossary(glossaryName, termKey) {
         if (this.cachedGlossaries[glossaryName]) {
             return this.cachedGlossaries[glossaryName];
         }
+        const index = this.cachedIndexes[glossaryName];
+        if (index) {
+            if (termKey !== undefined && !index[termKey]) {
+                console.warn(`[GlossaryService] getCachedGlossary -> '${glossaryName}' index has no '${termKey}' (stale shards?). Loading the full glossary.`);
+                this.loadGlossary(glossaryName);
+            }
+            return index;
+        }
         console.warn(`[GlossaryService] getCachedGlossary -> Glossary '${glossaryName}' not found in cache. It may not have been pre-loaded.`);
         return null;
     }
 
 
     /**
-     * Retrieves a specific term from a loaded glossary.
+     * Retrieves a specific term. Uses the full glossary when it is already cached,
+     * otherwise fetches only the term's shard (a few KB), falling back to the full file
+     * when the index doesn't list the term (added after the shards were built).
      * @param {string} glossaryName - The name of the glossary.
      * @param {string} termKey - The key of the term to retrieve.
      * @returns {Promise<object|null>} The term object {title, content} or null if not found.
      */
     static async getTerm(glossaryName, termKey) {
+        const cacheKey = `${glossaryName}/${termKey}`;
+        const index = this.cachedIndexes[glossaryName];
+        if (!this.cachedGlossaries[glossaryName] && !(index && !index[termKey])) {
+            if (this.cachedTerms[cacheKey]) {
+                return this.cachedTerms[cacheKey];
+            }
+            try {
+                const response = await fetch(`public/data/glossary/${glossaryName}/${termKey}.json`);
+                if (response.ok) {
+                    this.cachedTerms[cacheKey] = await response.json();
+                    return this.cachedTerms[cacheKey];
+                }
+            } catch (error) {
+                console.warn(`DEBUG: [GlossaryService] No shard for '${cacheKey}', loading the full glossary.`, error);
+            }
+        }
         const glossary = await this.loadGlossary(glossaryName);
         if (glossary && glossary[termKey]) {
             return glossary[termKey];
@@ -97,4 +163,28 @@ class GlossaryService {
             return null; // Return null on error
         }
     }
+
+    /**
+     * Returns the cards that link to one glossary entry, from the reverse index
+     * generated by check_modal_links.py (glossary_refs.json).
+     * @param {string} glossaryName - The name of the glossary (e.g., 'english_rules').
+     * @param {string} termKey - The key of the term.
+     * @returns {Promise<Object>} {deckId: [cardId, ...]}; empty if none or on error.
+     */
+    static async getCardReferences(glossaryName, termKey) {
+        if (!this.cardReferences) {
+            try {
+                const response = await fetch('public/data/glossary/glossary_refs.json');
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                this.cardReferences = await response.json();
+            } catch (error) {
+                console.error("DEBUG: [GlossaryService] Failed to load glossary references:", error);
+                return {};
+            }
+        }
+        const alias = this.nameToAlias(glossaryName);
+        return (alias && this.cardReferences[`${alias}:${termKey}`]) || {};
+    }
 }
\ No newline at end of file
@@ -471,7 +471,7 @@ ${JSON.stringify(modalImprovements, null, 2)}
 
 #### E. 🚀 Next Steps
 - **Step 1:** Save Card JSON to \`corrections.json\`.
-- **Step 2:** (If Modals Changed) Copy each JSON block from Part 2 directly into the glossary file shown in its label (e.g. the block under \`📁 english_rules.json\` → paste into \`public/data/glossary/english_rules.json\`). The IDs in Part 2 are already in the correct format for the file.
+- **Step 2:** (If Modals Changed) Copy each JSON block from Part 2 directly into the glossary file shown in its label (e.g. the block under \`📁 english_rules.json\` → paste into \`public/data/glossary/english_rules.json\`). The IDs in Part 2 are already in the correct format for the file. Then run \`py build_glossary_shards.py\` so the app sees the new modals (\`py check_modal_links.py\` fails until you do).
 - **Step 3:** Run update command:
 \`\`\`bash
 ${correctCommand}
@@ -1,12 +1,177 @@
 """ update_deck.py """
 #PARA PROCESOS CUSTOM, CREAR OTRO SCRIPT
+#
+# Single deck / single input file (original mode):
+#   py update_deck.py --deck-file public/data/git_deck.json --input-file improved.json
+#
+# Batch mode: many improvement files, possibly targeting several decks, one
+# load + one write per deck. --input takes files, directories and globs:
+#   py update_deck.py --input improvements/ "llm_out/*.json" --dry-run
+#   py update_deck.py --input improvements/
+#
+# An improvement file is either a plain array of cards, or an object with an
+# explicit target deck:  {"deck": "common_meeting.json", "cards": [...]}
+# ("deck" may be the file name or the deck's top-level "id"). Cards in a plain
+# array are routed to the deck that already holds their cardId; ids found in no
+# deck are reported as unknown under the deck owning their prefix (mi_001 -> mi).
+#
+# Sharded decks (public/data/<name>.deck/, see deck_shards.py) work anywhere a
+# deck file does; only the chunks holding updated cards are rewritten.
+#
+# Plain deck files are not re-serialized either: only the updated cards' text
+# is spliced into the file (deck_splice.py), every other byte is kept. Add
+# --verify-write to reparse each result and compare it with a full dump.
+#
+# --profile prints where the time went (parse, apply, backup, write) and the
+# bytes / cards per deck; --profile-out trace.json writes a Chrome trace
+# (see deck_profile.py).
 
 import json
 import argparse
+import glob
 import os
-from datetime import datetime
+import re
+import tempfile
+from collections import defaultdict
 
-def update_deck_file(deck_file_path, input_file_path):
+import deck_profile
+import deck_shards
+import deck_splice
+from deck_backup import snapshot, snapshot_name
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'public', 'data')
+
+# cardId prefix = everything before the trailing numeric counter (mi_001 -> mi).
+CARD_ID_PREFIX_RE = re.compile(r'^(.*?)[_-]?\d+$')
+
+
+def card_id_prefix(card_id):
+    match = CARD_ID_PREFIX_RE.match(card_id)
+    return match.group(1) if match and match.group(1) else card_id
+
+
+def build_card_index(cards):
+    """Map cardId -> position. The first occurrence wins, as the old scan did."""
+    index = {}
+    for i, card in enumerate(cards):
+        if isinstance(card, dict) and 'cardId' in card:
+            index.setdefault(card['cardId'], i)
+    return index
+
+
+def backup_deck(deck_file_path, source='update_deck'):
+    """Snapshot the deck into the shared backup store (see deck_backup.py).
+    Returns a '<file>@<timestamp>' label usable with `deck_backup.py restore`."""
+    with deck_profile.phase('backup', deck_file_path):
+        timestamp, _stored = snapshot(deck_file_path, source=source)
+    return f"{snapshot_name(deck_file_path)}@{timestamp}"
+
+
+def write_deck_atomic(deck_file_path, deck):
+    """Serialize next to the target and rename over it, so a crash mid-write
+    never leaves a truncated deck behind."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(deck_file_path)),
+                                    prefix='.tmp_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(deck, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, deck_file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_deck_spans(deck_file_path):
+    """Load a deck file or a sharded deck directory. Returns (deck, spans):
+    the card spans deck_splice needs, None for a sharded deck."""
+    with deck_profile.phase('parse', deck_file_path):
+        if deck_shards.is_sharded(deck_file_path):
+            deck, spans = deck_shards.load_sharded(deck_file_path), None
+        else:
+            deck, spans = deck_splice.read_deck(deck_file_path)
+    if deck_profile.enabled() and not deck_shards.is_sharded(deck_file_path):
+        cards = deck.get('cards') if isinstance(deck, dict) else None
+        deck_profile.count(deck_file_path, bytes_read=os.path.getsize(deck_file_path),
+                           cards=len(cards) if isinstance(cards, list) else 0)
+    return deck, spans
+
+
+def save_deck(deck_file_path, deck, index, updated_ids, source='update_deck',
+              spans=None, verify=False):
+    """Back up and write the deck; returns the backup label(s), ', '-joined.
+    With `spans` (from read_deck_spans) only the updated cards are spliced in."""
+    positions = [index[card_id] for card_id in updated_ids]
+    return save_deck_positions(deck_file_path, deck, positions, source, spans, verify)
+
+
+def save_deck_positions(deck_file_path, deck, positions, source='update_deck',
+                        spans=None, verify=False):
+    """save_deck for callers that know the changed cards' positions in
+    deck['cards'] (cards without a cardId, or with a duplicated one, included)."""
+    deck_profile.count(deck_file_path, cards_updated=len(positions))
+    if deck_shards.is_sharded(deck_file_path):
+        labels = []
+        def backup(path):
+            labels.append(backup_deck(path, source))
+        with deck_profile.phase('write', deck_file_path):
+            deck_shards.write_cards(deck_file_path, deck, positions, backup=backup)
+        return ', '.join(labels)
+    backup_path = backup_deck(deck_file_path, source)
+    with deck_profile.phase('write', deck_file_path):
+        if spans is None:
+            write_deck_atomic(deck_file_path, deck)
+        else:
+            mode, note = deck_splice.write_cards(deck_file_path, deck, positions, spans, verify)
+            print(f"Write: {mode} '{os.path.basename(deck_file_path)}' ({note})")
+    if deck_profile.enabled():
+        deck_profile.count(deck_file_path, bytes_written=os.path.getsize(deck_file_path))
+    return backup_path
+
+
+def apply_improvements(cards, index, improved_cards, verbose=True):
+    """
+    Replace cards in place using a prebuilt cardId -> index map.
+    Returns (updated_ids, unknown_ids, duplicate_ids, missing_id_positions).
+    When the same cardId appears more than once in the improvements, the last
+    one wins. Improved cards without a 'cardId' are skipped; their 1-based
+    positions in improved_cards are returned as missing_id_positions.
+    """
+    updated, unknown, duplicates, missing = [], [], [], []
+    seen = set()
+
+    for position, improved_card in enumerate(improved_cards, start=1):
+        card_id = improved_card.get('cardId') if isinstance(improved_card, dict) else None
+        if not card_id:
+            missing.append(position)
+            if verbose:
+                print(f"Warning: Improved card #{position} has no 'cardId'. Skipping.")
+            continue
+
+        index_to_update = index.get(card_id)
+        if index_to_update is None:
+            unknown.append(card_id)
+            if verbose:
+                print(f"Warning: Card ID '{card_id}' from input file not found in the original deck. Skipping.")
+            continue
+
+        if card_id in seen:
+            duplicates.append(card_id)
+        else:
+            seen.add(card_id)
+            updated.append(card_id)
+
+        # Remove the 'review_request' object before updating
+        improved_card.pop('review_request', None)
+        cards[index_to_update] = improved_card
+        if verbose:
+            print(f"Updated card: {card_id}")
+
+    return updated, unknown, duplicates, missing
+
+
+def update_deck_file(deck_file_path, input_file_path, dry_run=False, verify_write=False):
     """
     Updates a deck JSON file with improved cards from an input JSON file.
     It finds cards by 'cardId' and replaces them. It also creates a backup.
@@ -20,81 +185,201 @@ def update_deck_file(deck_file_path, input_file_path):
         print(f"Error: Input file not found at '{input_file_path}'")
         return
 
-    # --- 2. Create a backup ---
+    # --- 2. Load data ---
     try:
-        backup_dir = os.path.join(os.path.dirname(deck_file_path), 'backups')
-        os.makedirs(backup_dir, exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        deck_filename = os.path.basename(deck_file_path)
-        backup_path = os.path.join(backup_dir, f"{timestamp}_{deck_filename}")
-        with open(deck_file_path, 'r', encoding='utf-8') as f:
-            original_content = f.read()
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            f.write(original_content)
-        print(f"Successfully created backup at '{backup_path}'")
-    except Exception as e:
-        print(f"Error creating backup: {e}")
-        return
-
-    # --- 3. Load data ---
-    try:
-        with open(deck_file_path, 'r', encoding='utf-8') as f:
-            original_deck = json.load(f)
-        with open(input_file_path, 'r', encoding='utf-8') as f:
+        original_deck, spans = read_deck_spans(deck_file_path)
+        with deck_profile.phase('read_input', input_file_path), \
+                open(input_file_path, 'r', encoding='utf-8') as f:
             improved_cards_list = json.load(f)
-    except json.JSONDecodeError as e:
+    except ValueError as e:  # JSONDecodeError, or a deck_stream parse error
         print(f"Error decoding JSON from files: {e}")
         return
     except Exception as e:
         print(f"Error reading files: {e}")
         return
 
-    # --- 4. Process and update ---
+    if isinstance(improved_cards_list, dict):
+        improved_cards_list = improved_cards_list.get('cards', [])
+
+    # --- 3. Process and update ---
     original_cards = original_deck.get("cards", [])
     if not original_cards:
         print("Warning: The original deck has no 'cards' array.")
         return
 
-    # Create a map for efficient lookup
-    original_cards_map = {card['cardId']: card for card in original_cards if 'cardId' in card}
-    updated_count = 0
+    with deck_profile.phase('index', deck_file_path):
+        index = build_card_index(original_cards)
+    with deck_profile.phase('apply', deck_file_path):
+        updated, unknown, duplicates, missing = apply_improvements(
+            original_cards, index, improved_cards_list, verbose=not dry_run)
 
-    for improved_card in improved_cards_list:
-        card_id = improved_card.get('cardId')
-        if not card_id:
-            print(f"Warning: Skipping an improved card because it has no 'cardId'. Content: {improved_card}")
-            continue
-
-        if card_id in original_cards_map:
-            # Find the index in the original list to preserve order
-            index_to_update = next((i for i, card in enumerate(original_cards) if card.get('cardId') == card_id), None)
-            
-            if index_to_update is not None:
-                # Remove the 'review_request' object before updating
-                if 'review_request' in improved_card:
-                    del improved_card['review_request']
-                
-                original_cards[index_to_update] = improved_card
-                updated_count += 1
-                print(f"Updated card: {card_id}")
-            else:
-                 print(f"Logic Error: Card ID '{card_id}' was in map but not found in original list.")
-        else:
-            print(f"Warning: Card ID '{card_id}' from input file not found in the original deck. Skipping.")
+    if dry_run:
+        print_summary({deck_file_path: (updated, unknown, duplicates, missing)})
+        return
 
-    # --- 5. Save the final result ---
-    if updated_count > 0:
-        original_deck["cards"] = original_cards
+    # --- 4. Backup + save the final result ---
+    if updated:
         try:
-            with open(deck_file_path, 'w', encoding='utf-8') as f:
-                json.dump(original_deck, f, indent=2, ensure_ascii=False)
-            print(f"\nUpdate complete. Successfully updated {updated_count} card(s) in '{deck_file_path}'.")
+            backup_path = save_deck(deck_file_path, original_deck, index, updated,
+                                    spans=spans, verify=verify_write)
+            print(f"Successfully created backup '{backup_path}' (restore with deck_backup.py)")
+            print(f"\nUpdate complete. Successfully updated {len(updated)} card(s) in '{deck_file_path}'.")
         except Exception as e:
             print(f"Error writing the updated deck file: {e}")
     else:
         print("\nNo cards were updated.")
 
 
+# --- Batch mode ---
+
+def expand_inputs(patterns):
+    """Files, directories (every *.json inside) and globs -> sorted unique paths."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.json'))
+        elif any(ch in pattern for ch in '*?['):
+            matches = glob.glob(pattern, recursive=True)
+        else:
+            matches = [pattern] if os.path.exists(pattern) else []
+        if not matches:
+            print(f"Warning: '{pattern}' matched no improvement files.")
+        paths.extend(os.path.abspath(p) for p in matches)
+    return sorted(set(paths))
+
+
+def load_improvement_file(path):
+    """Return (explicit_deck_or_None, cards)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return None, data
+    if isinstance(data, dict) and isinstance(data.get('cards'), list):
+        return data.get('deck'), data['cards']
+    raise ValueError("expected an array of cards or {\"deck\": ..., \"cards\": [...]}")
+
+
+def load_decks(data_dir):
+    """Parse every deck (file or sharded directory) in data_dir once.
+    Returns ({path: deck}, {path: card spans or None})."""
+    decks, spans = {}, {}
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if not deck_shards.is_sharded(path) and (not name.endswith('.json') or not os.path.isfile(path)):
+            continue
+        try:
+            data, card_spans = read_deck_spans(path)
+        except Exception as e:
+            print(f"Warning: Skipping unreadable file '{name}': {e}")
+            continue
+        if isinstance(data, dict) and isinstance(data.get('cards'), list):
+            decks[path] = data
+            spans[path] = card_spans
+    return decks, spans
+
+
+def route_improvements(input_paths, decks, indexes):
+    """
+    Group improved cards by target deck path, preserving input order.
+    Returns (routed, unrouted) where routed is {deck_path: [cards]}.
+    """
+    by_name = {}
+    owner = {}
+    prefix_owner = {}
+    for path, deck in decks.items():
+        by_name[os.path.basename(path)] = path
+        by_name[os.path.splitext(os.path.basename(path))[0]] = path  # also strips .deck
+        if deck.get('id'):
+            by_name.setdefault(deck['id'], path)
+        for card_id in indexes[path]:
+            owner.setdefault(card_id, path)
+            if isinstance(card_id, str):
+                prefix_owner.setdefault(card_id_prefix(card_id), path)
+
+    routed = defaultdict(list)
+    unrouted = []
+    for input_path in input_paths:
+        try:
+            explicit, cards = load_improvement_file(input_path)
+        except Exception as e:
+            print(f"Error reading improvement file '{input_path}': {e}")
+            continue
+
+        if explicit is not None:
+            target = by_name.get(explicit) or by_name.get(os.path.basename(str(explicit)))
+            if target is None:
+                print(f"Error: '{input_path}' targets unknown deck '{explicit}'. Skipping file.")
+                continue
+            routed[target].extend(cards)
+            continue
+
+        for card in cards:
+            card_id = card.get('cardId') if isinstance(card, dict) else None
+            target = None
+            if isinstance(card_id, str):
+                target = owner.get(card_id) or prefix_owner.get(card_id_prefix(card_id))
+            if target is None:
+                unrouted.append(card_id)
+            else:
+                routed[target].append(card)
+    return routed, unrouted
+
+
+def print_summary(summary):
+    print("\n=== Per-deck summary ===")
+    for deck_path, (updated, unknown, duplicates, missing) in sorted(summary.items()):
+        print(f"{os.path.basename(deck_path):<36} updated: {len(updated):>4}  "
+              f"unknown: {len(unknown):>4}  duplicate: {len(duplicates):>4}"
+              + (f"  no cardId: {len(missing):>4}" if missing else ''))
+        if unknown:
+            print(f"    unknown ids:   {', '.join(map(str, unknown))}")
+        if duplicates:
+            print(f"    duplicate ids: {', '.join(sorted(set(map(str, duplicates))))}")
+        if missing:
+            print(f"    no cardId:     improved card(s) {', '.join(f'#{p}' for p in missing)}")
+
+
+def update_decks_batch(input_patterns, data_dir=DATA_DIR, dry_run=False, verify_write=False):
+    """Apply every improvement file in one load/serialize cycle per deck."""
+    input_paths = expand_inputs(input_patterns)
+    if not input_paths:
+        print("Error: No improvement files to process.")
+        return
+
+    decks, spans = load_decks(data_dir)
+    with deck_profile.phase('index'):
+        indexes = {path: build_card_index(deck['cards']) for path, deck in decks.items()}
+    with deck_profile.phase('route'):
+        routed, unrouted = route_improvements(input_paths, decks, indexes)
+    print(f"Loaded {len(input_paths)} improvement file(s) targeting {len(routed)} deck(s).")
+
+    summary = {}
+    for deck_path, improved_cards in routed.items():
+        deck = decks[deck_path]
+        with deck_profile.phase('apply', deck_path):
+            summary[deck_path] = apply_improvements(
+                deck['cards'], indexes[deck_path], improved_cards, verbose=False)
+
+    print_summary(summary)
+    if unrouted:
+        print(f"\nWarning: {len(unrouted)} card(s) match no deck: "
+              f"{', '.join(map(str, unrouted))}")
+
+    if dry_run:
+        print("\nDry run: no files were written.")
+        return
+
+    for deck_path, (updated, _unknown, _duplicates, _missing) in sorted(summary.items()):
+        if not updated:
+            continue
+        try:
+            backup_path = save_deck(deck_path, decks[deck_path], indexes[deck_path], updated,
+                                    spans=spans[deck_path], verify=verify_write)
+            print(f"Wrote {len(updated)} card(s) to '{deck_path}' (backup: '{backup_path}').")
+        except Exception as e:
+            print(f"Error writing '{deck_path}': {e}")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Update a SmartDeck JSON file with improved cards.",
@@ -102,14 +387,41 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--deck-file",
-        required=True,
         help="Path to the original deck JSON file to be updated (e.g., public/data/git_deck.json)."
     )
     parser.add_argument(
         "--input-file",
-        required=True,
         help="Path to the JSON file containing the array of improved cards."
     )
+    parser.add_argument(
+        "--input",
+        nargs='+',
+        help="Batch mode: improvement files, directories or globs. Cards are routed\n"
+             "to their decks in public/data and each deck is written once."
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=DATA_DIR,
+        help="Deck directory used by batch mode (default: public/data)."
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the per-deck summary (updated / unknown / duplicate ids) without writing."
+    )
+    parser.add_argument(
+        "--verify-write",
+        action="store_true",
+        help="Reparse every spliced deck and compare it with a full dump; falls back\n"
+             "to a full rewrite if the spliced file does not match the deck."
+    )
+    deck_profile.add_arguments(parser)
 
     args = parser.parse_args()
-    update_deck_file(args.deck_file, args.input_file)
\ No newline at end of file
+    deck_profile.start(args)
+    if args.input:
+        update_decks_batch(args.input, args.data_dir, args.dry_run, args.verify_write)
+    elif args.deck_file and args.input_file:
+        update_deck_file(args.deck_file, args.input_file, args.dry_run, args.verify_write)
+    else:
+        parser.error("use --deck-file with --input-file, or --input for batch mode")
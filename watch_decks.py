@@ -0,0 +1,321 @@
+# =============================================================================
+# PURPOSE
+#   Long-running companion of check_deck_ids.py and check_modal_links.py for
+#   the editing loop (paste LLM output -> update_deck.py -> check -> reload).
+#   Loads every deck in public/data and the modal-link glossaries ONCE, then
+#   polls their size + mtime (no external service, no watchdog package). When
+#   a file changes only that file is re-parsed, and the checks run against
+#   the in-memory state of every other deck:
+#
+#     [DUP] / [MISSING]   cardId uniqueness        (check_deck_ids.check_cards)
+#     [DECKID]            two deck files sharing one top-level "id"
+#     [XDUP]              one cardId used in two deck files (update_deck.py
+#                         routing, glossary_refs.json and the search index
+#                         all key on cardId, so ids are unique across decks)
+#     [DANGLING] [ALIAS]  modal links vs. glossaries (check_modal_links.scan_deck)
+#     [LEGACY]
+#
+#   A glossary change re-resolves the links of every deck from memory, with
+#   no deck re-read. Sharded decks (<name>.deck/, see deck_shards.py) are
+#   watched through their index + chunk files.
+#
+# MALFORMED SAVES
+#   An editor or a half-finished paste can leave a file that is not valid
+#   JSON for a moment. Such a save is reported as [PARSE] and the LAST GOOD
+#   version of that file stays in memory, so the other decks keep being
+#   checked against it; the next valid save replaces it. A file that changes
+#   again while it is being read is simply re-read on the next poll.
+#
+# USAGE
+#   py watch_decks.py                       -> watch public/data (Ctrl+C stops)
+#   py watch_decks.py --interval 0.2        -> poll period in seconds
+#   py watch_decks.py --once                -> load, report, exit (0 / 1), like
+#                                              the two checkers in one run
+#
+#   Nothing is written: the reverse index glossary_refs.json stays the job of
+#   check_modal_links.py.
+# =============================================================================
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import deck_shards
+from check_deck_ids import DATA_DIR, check_cards, load_deck
+from check_modal_links import GLOSSARY_ALIASES, GLOSSARY_DIR, scan_deck
+
+DEFAULT_INTERVAL = 0.5
+
+
+def deck_paths(data_dir):
+    """Every candidate deck in data_dir: *.json files and sharded .deck dirs."""
+    paths = []
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                paths.append(entry.path)
+            elif entry.is_dir() and deck_shards.is_sharded(entry.path):
+                paths.append(entry.path)
+    return sorted(paths)
+
+
+def signature(path):
+    """(size, mtime_ns), or None if the file (or a shard) is gone or broken."""
+    try:
+        if os.path.isdir(path):
+            return deck_shards.stat_signature(path)
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except (OSError, ValueError):
+        return None
+
+
+def read_glossary(path):
+    """(set of entry ids, error). A missing glossary is an error too."""
+    try:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        return None, str(e)
+    if not isinstance(data, dict):
+        return None, 'not a JSON object'
+    return set(data), None
+
+
+class DeckWatcher:
+    """In-memory state of every deck and glossary, refreshed file by file."""
+
+    def __init__(self, data_dir=DATA_DIR, glossary_dir=GLOSSARY_DIR):
+        self.data_dir = data_dir
+        self.glossary_paths = {alias: os.path.join(glossary_dir, name + '.json')
+                               for alias, name in GLOSSARY_ALIASES.items()}
+        self.signatures = {}    # path -> (size, mtime_ns) of the version held
+        self.decks = {}         # path -> last good deck (None: not a deck)
+        self.results = {}       # path -> check result of that deck
+        self.parse_errors = {}  # path -> error of the newest, unreadable save
+        self.glossary_ids = {}  # alias -> set of ids (last good), None if never read
+        self.card_ids = {}      # path -> set of cardIds of the deck held
+        self.card_owners = defaultdict(set)  # cardId -> paths of the decks using it
+
+    # --- Loading ---
+
+    def _load_glossary(self, alias, path):
+        ids, error = read_glossary(path)
+        if error is None:
+            self.glossary_ids[alias] = ids
+            self.parse_errors.pop(path, None)
+        else:
+            self.glossary_ids.setdefault(alias, None)
+            self.parse_errors[path] = error
+
+    def _load_deck(self, path):
+        deck, error = load_deck(path)
+        if error is not None:
+            # Keep the last good version; only remember that the save is bad.
+            self.parse_errors[path] = error
+            return
+        self.parse_errors.pop(path, None)
+        self.decks[path] = deck
+        self.results[path] = self.check(deck) if deck is not None else None
+        self._index_card_ids(path, deck)
+
+    def _index_card_ids(self, path, deck):
+        """Move `path`'s entries in the cardId -> decks map to `deck`'s ids."""
+        new_ids = set()
+        if deck is not None:
+            new_ids = {card['cardId'] for card in deck['cards']
+                       if isinstance(card, dict) and isinstance(card.get('cardId'), str)}
+        old_ids = self.card_ids.get(path, set())
+        for card_id in old_ids - new_ids:
+            owners = self.card_owners[card_id]
+            owners.discard(path)
+            if not owners:
+                del self.card_owners[card_id]
+        for card_id in new_ids - old_ids:
+            self.card_owners[card_id].add(path)
+        if new_ids:
+            self.card_ids[path] = new_ids
+        else:
+            self.card_ids.pop(path, None)
+
+    def _drop(self, path):
+        self._index_card_ids(path, None)
+        for table in (self.signatures, self.decks, self.results, self.parse_errors):
+            table.pop(path, None)
+
+    def poll(self):
+        """Re-read whatever changed since the last poll.
+        Returns (changed deck paths, removed paths, glossaries_changed)."""
+        changed, removed, glossaries_changed, relink = [], [], False, False
+
+        for alias, path in self.glossary_paths.items():
+            before = signature(path)
+            if before == self.signatures.get(path) and alias in self.glossary_ids:
+                continue
+            old_ids = self.glossary_ids.get(alias)
+            self._load_glossary(alias, path)
+            if signature(path) == before:  # not rewritten while we read it
+                self.signatures[path] = before
+            glossaries_changed = True
+            relink = relink or self.glossary_ids[alias] != old_ids
+
+        current = deck_paths(self.data_dir) if os.path.isdir(self.data_dir) else []
+        known = set(self.decks) | set(self.parse_errors)
+        for path in known - set(current) - set(self.glossary_paths.values()):
+            self._drop(path)
+            removed.append(path)
+        for path in current:
+            before = signature(path)
+            if before is None or before == self.signatures.get(path):
+                continue
+            self._load_deck(path)
+            if signature(path) == before:
+                self.signatures[path] = before
+            changed.append(path)
+
+        if relink:
+            # Links of every deck are re-resolved from memory; no deck is re-read.
+            fresh = set(changed)
+            for path, deck in self.decks.items():
+                if deck is not None and path not in fresh:
+                    self.results[path] = self.check(deck)
+        return changed, sorted(removed), glossaries_changed
+
+    # --- Checks ---
+
+    def check(self, deck):
+        cards = ((index + 1, None, card) for index, card in enumerate(deck['cards']))
+        duplicates, malformed, _offsets, unique_count, card_count = check_cards(cards)
+        links, link_problems = scan_deck(deck, self.glossary_ids)
+        return {'deck_id': deck.get('id', '(no id)'), 'card_count': card_count,
+                'unique_count': unique_count, 'duplicates': duplicates,
+                'malformed': malformed, 'link_count': len(links) + len(link_problems),
+                'link_problems': link_problems}
+
+    def deck_id_collisions(self):
+        owners = defaultdict(list)
+        for path, result in self.results.items():
+            if result is not None and result['deck_id'] != '(no id)':
+                owners[result['deck_id']].append(os.path.basename(path))
+        return {deck_id: sorted(files) for deck_id, files in owners.items() if len(files) > 1}
+
+    def card_id_collisions(self):
+        """{cardId: sorted deck file names} for every cardId used by 2+ decks."""
+        return {card_id: sorted(os.path.basename(p) for p in paths)
+                for card_id, paths in self.card_owners.items() if len(paths) > 1}
+
+    def problem_files(self):
+        """Names of every file currently failing, for the summary line."""
+        failing = {os.path.basename(p) for p in self.parse_errors}
+        failing.update(os.path.basename(p) for p, r in self.results.items()
+                       if r and (r['duplicates'] or r['malformed'] or r['link_problems']))
+        for files in self.deck_id_collisions().values():
+            failing.update(files)
+        for files in self.card_id_collisions().values():
+            failing.update(files)
+        failing.update(f'glossary/{GLOSSARY_ALIASES[a]}.json'
+                       for a, ids in self.glossary_ids.items() if ids is None)
+        return sorted(failing)
+
+    # --- Report ---
+
+    def print_file(self, path):
+        name = os.path.basename(path)
+        if path in self.parse_errors:
+            kept = 'keeping the last good version' if self.decks.get(path) else 'no good version yet'
+            print(f"FAIL:   [PARSE]   {name} -> {self.parse_errors[path]} ({kept})")
+        result = self.results.get(path)
+        if result is None:
+            if path not in self.parse_errors:
+                print(f"DEBUG:  [SKIP]    {name} has no 'cards' array. Not a deck.")
+            return
+        problems = result['duplicates'] or result['malformed'] or result['link_problems']
+        status = "FAIL:   [PROBLEM]" if problems else "VERIFY: [OK]     "
+        print(f"{status} {name:<36} {result['card_count']:>5} cards, "
+              f"{result['unique_count']} unique cardIds, {result['link_count']} links")
+        for card_id, spots in sorted(result['duplicates'].items()):
+            print(f"          [DUP]      '{card_id}' used {len(spots)} times "
+                  f"-> cards {', '.join(f'#{p}' for p in spots)}")
+        for position, reason in result['malformed']:
+            print(f"          [MISSING]  card #{position} -> {reason}")
+        for kind, card_id, field, markup in result['link_problems']:
+            print(f"          [{kind}]{' ' * (10 - len(kind))}{card_id} {field} -> {markup}")
+
+    def print_summary(self, elapsed_ms):
+        for deck_id, files in sorted(self.deck_id_collisions().items()):
+            print(f"FAIL:   [DECKID]  deck id '{deck_id}' is shared by: {', '.join(files)}")
+        for card_id, files in sorted(self.card_id_collisions().items()):
+            print(f"FAIL:   [XDUP]    cardId '{card_id}' is used in: {', '.join(files)}")
+        for path, error in sorted(self.parse_errors.items()):
+            if path in self.glossary_paths.values():
+                print(f"FAIL:   [PARSE]   glossary/{os.path.basename(path)} -> {error} "
+                      f"(keeping the last good version)")
+        decks = sum(1 for r in self.results.values() if r is not None)
+        failing = self.problem_files()
+        if failing:
+            print(f"FAIL:   {decks} decks, problems in {len(failing)} -> {', '.join(failing)} "
+                  f"({elapsed_ms:.0f} ms)")
+        else:
+            print(f"VERIFY: {decks} decks, all cardIds unique (across decks too), all modal links resolve "
+                  f"({elapsed_ms:.0f} ms)")
+        return not failing
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Watch public/data and re-check decks as they change.")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f"Seconds between polls (default: {DEFAULT_INTERVAL}).")
+    parser.add_argument('--once', action='store_true',
+                        help="Load and check everything once, then exit (1 on problems).")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Deck directory (default: public/data).")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if not os.path.isdir(args.data_dir):
+        print(f"DEBUG: Data directory not found at {args.data_dir}")
+        sys.exit(1)
+    glossary_dir = GLOSSARY_DIR if args.data_dir == DATA_DIR else os.path.join(args.data_dir, 'glossary')
+    watcher = DeckWatcher(args.data_dir, glossary_dir)
+
+    print("=====================================================")
+    print("=== DECK WATCH (cardIds + deck ids + modal links) ===")
+    print("=====================================================")
+    started = time.perf_counter()
+    changed, _removed, _glossaries = watcher.poll()
+    for path in changed:
+        if watcher.results.get(path) is not None or path in watcher.parse_errors:
+            watcher.print_file(path)
+    print("")
+    clean = watcher.print_summary((time.perf_counter() - started) * 1000)
+    if args.once:
+        sys.exit(0 if clean else 1)
+
+    print(f"DEBUG:  Watching {args.data_dir} every {args.interval:g} s. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(args.interval)
+            started = time.perf_counter()
+            changed, removed, glossaries_changed = watcher.poll()
+            if not (changed or removed or glossaries_changed):
+                continue
+            print("")
+            print(f"--- {time.strftime('%H:%M:%S')} ---")
+            if glossaries_changed:
+                print("DEBUG:  Glossary changed: links of every deck re-checked from memory.")
+            for path in removed:
+                print(f"DEBUG:  [GONE]    {os.path.basename(path)} was removed.")
+            for path in changed:
+                watcher.print_file(path)
+            watcher.print_summary((time.perf_counter() - started) * 1000)
+    except KeyboardInterrupt:
+        print("\nDEBUG:  Stopped.")
+
+
+if __name__ == "__main__":
+    main()